@@ -0,0 +1,180 @@
+# # analyze.py
+# Batch analysis of FEN positions with a pool of Stockfish processes. Positions are read as a stream (one FEN per line,
+# from a file or stdin) and one JSON line per position is written as soon as its search completes.
+# Usage: python analyze.py positions.fen -o results.jsonl --depth 18 --engines 8
+#        cat positions.fen | python analyze.py - -o results.jsonl --movetime 500 --resume
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from chess_board import ChessBoard
+from stockfish_player import EnginePool, find_stockfish
+
+PENDING_PER_ENGINE = 2  # positions read ahead per engine; bounds memory use on huge inputs
+DEFAULT_MOVETIME = 1000  # milliseconds per position when no limit is given
+
+logger = logging.getLogger(__name__)
+
+
+# Yield (index, fen) for every non-empty, non-comment input line; index counts those lines from 0
+def read_positions(stream):
+    index = 0
+    for line in stream:
+        fen = line.split('#', 1)[0].strip()
+        if fen:
+            yield index, fen
+            index += 1
+
+
+# Indices already analysed in a partially written output file; a truncated last line is cut off.
+# Records with an error do not count, so --resume retries them (the new record is appended after the old one)
+def completed_indices(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            f.truncate(end)  # the last record was cut off mid-write
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+                if 'error' not in record:
+                    done.add(record['index'])
+            except (ValueError, KeyError, TypeError):
+                logger.warning("Skipping unreadable output line: %r", line[:80])
+    return done
+
+
+# Raise ValueError unless fen describes 8 full ranks, one king per side and a side to move
+def check_fen(fen):
+    fields = fen.split()
+    ranks = fields[0].split('/') if fields else []
+    if len(ranks) != 8 or any(sum(int(ch) if ch.isdigit() else 1 for ch in rank) != 8 for rank in ranks):
+        raise ValueError('board must have 8 ranks of 8 squares')
+    if fields[0].count('K') != 1 or fields[0].count('k') != 1:
+        raise ValueError('each side needs exactly one king')
+    if len(fields) < 2 or fields[1] not in ('w', 'b'):
+        raise ValueError('side to move must be w or b')
+
+
+# Analyse one position on an engine leased from the pool
+def analyse_position(pool, index, fen, limits, timeout):
+    record = {'index': index, 'fen': fen}
+
+    # Check the FEN before it reaches the engine: a broken position can crash Stockfish
+    try:
+        check_fen(fen)
+        board = ChessBoard(fen, cache_size=0)
+        valid_moves = board.get_valid_moves()
+    except (ValueError, IndexError, KeyError) as e:
+        record['error'] = f"invalid FEN: {e}"
+        return record
+    if not valid_moves:
+        record.update(bestmove=None, result='checkmate' if board.checkmate else 'stalemate')
+        return record
+
+    with pool.lease() as ai:
+        analysis = ai.analyse(fen, timeout=timeout, **limits)
+    if analysis is None:
+        record['error'] = 'engine failed'
+    else:
+        record.update(analysis)
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyse FEN positions with Stockfish and write JSONL results')
+    parser.add_argument('input', help="file with one FEN per line, or '-' for stdin")
+    parser.add_argument('-o', '--output', default='-', help="JSONL output file, or '-' for stdout (default)")
+    parser.add_argument('--depth', type=int, help='search depth limit')
+    parser.add_argument('--nodes', type=int, help='node limit')
+    parser.add_argument('--movetime', type=int, help=f'milliseconds per position (default {DEFAULT_MOVETIME} '
+                                                     f'when no other limit is given)')
+    parser.add_argument('--timeout', type=float, default=120, help='seconds before a depth/nodes search is stopped')
+    parser.add_argument('--engines', type=int, default=os.cpu_count(), help='Stockfish processes (default: CPU count)')
+    parser.add_argument('--skill', type=int, default=20, help='Stockfish skill level (0-20)')
+    parser.add_argument('--resume', action='store_true', help='skip positions already in the output file')
+    parser.add_argument('--stockfish', help='path to the Stockfish executable')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=os.environ.get('CHESS_LOG_LEVEL', 'WARNING').upper(),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    limits = {'depth': args.depth, 'nodes': args.nodes, 'move_time': args.movetime}
+    if not any(value is not None for value in limits.values()):
+        limits['move_time'] = DEFAULT_MOVETIME
+    if args.resume and args.output == '-':
+        parser.error('--resume needs an output file')
+
+    path = args.stockfish or find_stockfish()
+    if not path:
+        print("Stockfish not found (set STOCKFISH_PATH or pass --stockfish)", file=sys.stderr)
+        return 1
+
+    done = completed_indices(args.output) if args.resume else set()
+    source = sys.stdin if args.input == '-' else open(args.input)
+    pool = EnginePool(path, size=args.engines, skill_level=args.skill)
+    if not pool.engines:
+        print(f"Stockfish at {path} could not be started", file=sys.stderr)
+        pool.close()
+        return 1
+
+    # Opened only once the engines run, so a failed start leaves an earlier output file untouched
+    try:
+        output = sys.stdout if args.output == '-' else open(args.output, 'a' if args.resume else 'w')
+    except OSError as e:
+        print(f"Cannot write {args.output}: {e}", file=sys.stderr)
+        pool.close()
+        return 1
+
+    start_time = time.perf_counter()
+    written = failed = 0
+
+    # Write finished records as they come in (not in input order); a failed analysis becomes an error record
+    def write_finished(futures):
+        nonlocal written, failed
+        for future in futures:
+            index, fen = submitted.pop(future)
+            try:
+                record = future.result()
+            except Exception as e:
+                logger.exception("Analysis of position %s failed", index)
+                record = {'index': index, 'fen': fen, 'error': f"analysis failed: {e}"}
+            output.write(json.dumps(record) + '\n')
+            output.flush()
+            written += 1
+            failed += 'error' in record
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(pool.engines)) as executor:
+            pending = set()
+            submitted = {}  # future -> (index, fen)
+            for index, fen in read_positions(source):
+                if index in done:
+                    continue
+                future = executor.submit(analyse_position, pool, index, fen, limits, args.timeout)
+                submitted[future] = (index, fen)
+                pending.add(future)
+                if len(pending) >= len(pool.engines) * PENDING_PER_ENGINE:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    write_finished(finished)
+            write_finished(wait(pending).done)
+    finally:
+        pool.close()
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"{written} positions analysed in {elapsed:.1f}s ({len(done)} skipped, {failed} failed)", file=sys.stderr)
+    return 0 if not failed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
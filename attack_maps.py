@@ -0,0 +1,142 @@
+# # attack_maps.py
+# ChessBoard with per-side attack counts kept up to date by make_move_code / undo_move, so "is this square attacked"
+# is a table lookup: in_check (drawn every frame by main.py), castling checks and king moves out of check read the
+# counts instead of scanning the board. Select it with chess_board.create_board('attackmap'). The plain ChessBoard
+# pays nothing for this: the counts and their updates only exist in this subclass.
+from array import array
+from chess_board import (BISHOP_RAYS, ChessBoard, DIMENSION, KING_TARGETS, KNIGHT_TARGETS, MOVE_CACHE_SIZE,
+                         MOVE_CASTLE, MOVE_EN_PASSANT, MOVE_FLAGS, MOVE_PROMOTION, PAWN_CAPTURES, ROOK_RAYS)
+
+
+class AttackMapChessBoard(ChessBoard):
+
+    def __init__(self, fen=None, cache_size=MOVE_CACHE_SIZE):
+        self.attack_counts = None  # {color: [row][col] -> number of that color's pieces attacking the square}
+        super().__init__(fen, cache_size)
+        self.attack_counts = self.build_attack_counts()
+
+    def load_fen(self, fen):
+        super().load_fen(fen)
+        self.attack_counts = self.build_attack_counts()
+
+    # Make a move given as a code: the attacks around the squares it changes are lifted, then added back
+    def make_move_code(self, code, move=None):
+        changed_squares = self.get_changed_squares(code)
+        sliders = self.lift_attacks(changed_squares)
+        super().make_move_code(code, move)
+        self.restore_attacks(changed_squares, sliders)
+
+    def undo_move(self):
+        if len(self.history) != 0:
+            changed_squares = self.get_changed_squares(self.history[-1][0])
+            sliders = self.lift_attacks(changed_squares)
+            super().undo_move()
+            self.restore_attacks(changed_squares, sliders)
+
+    # Table lookup, also behind in_check; only valid while the board matches the counts (en passant and king
+    # moves in check use scan_square_attacked_by on a temporarily changed board)
+    def square_attacked_by(self, row, col, attacking_color):
+        return self.attack_counts[attacking_color][row][col] > 0
+
+    # Out of check no attacker's ray passes through the king, so the counts are exact for its destinations.
+    # In check the king is lifted and the board scanned, as in ChessBoard
+    def get_safe_king_moves(self, king_row, king_col, enemy_color, in_check, moves):
+        if in_check:
+            super().get_safe_king_moves(king_row, king_col, enemy_color, in_check, moves)
+            return
+        enemy_attacks = self.attack_counts[enemy_color]
+        king_moves = array('H')
+        self.get_king_moves_no_castle(king_row, king_col, king_moves)
+        for code in king_moves:
+            end_sq = code >> 6 & 63
+            if enemy_attacks[end_sq >> 3][end_sq & 7] == 0:
+                moves.append(code)
+
+    # Squares whose content changes when the move code is made or undone
+    @staticmethod
+    def get_changed_squares(code):
+        start_row, start_col = divmod(code & 63, 8)
+        end_row, end_col = divmod(code >> 6 & 63, 8)
+        squares = [(start_row, start_col), (end_row, end_col)]
+        if code < MOVE_PROMOTION:
+            flags = code & MOVE_FLAGS
+            if flags == MOVE_EN_PASSANT:
+                squares.append((start_row, end_col))
+            elif flags == MOVE_CASTLE:
+                if end_col > start_col:
+                    squares += [(end_row, end_col + 1), (end_row, end_col - 1)]
+                else:
+                    squares += [(end_row, end_col - 2), (end_row, end_col + 1)]
+        return squares
+
+    # Squares attacked by the piece on (r, c), sliders stopping at (and including) the first blocker
+    def get_attacked_squares(self, r, c, piece):
+        kind = piece[1]
+        if kind == 'P':
+            return PAWN_CAPTURES[piece[0]][r][c]
+        if kind == 'N':
+            return KNIGHT_TARGETS[r][c]
+        if kind == 'K':
+            return KING_TARGETS[r][c]
+        board = self.board
+        squares = []
+        rays = ROOK_RAYS[r][c] if kind == 'R' else BISHOP_RAYS[r][c] if kind == 'B' else \
+            ROOK_RAYS[r][c] + BISHOP_RAYS[r][c]
+        for ray in rays:
+            for sq in ray:
+                squares.append(sq)
+                if board[sq[0]][sq[1]] != '--':
+                    break
+        return squares
+
+    # Sliders of either color whose ray reaches (r, c)
+    def get_sliders_seeing(self, r, c):
+        board = self.board
+        sliders = []
+        for rays, kinds in ((ROOK_RAYS[r][c], 'RQ'), (BISHOP_RAYS[r][c], 'BQ')):
+            for ray in rays:
+                for sr, sc in ray:
+                    piece = board[sr][sc]
+                    if piece != '--':
+                        if piece[1] in kinds:
+                            sliders.append((sr, sc))
+                        break
+        return sliders
+
+    # Add (delta=1) or remove (delta=-1) the attacks of the piece on (r, c) from the attack counts
+    def update_attack_counts(self, r, c, delta):
+        piece = self.board[r][c]
+        if piece == '--':
+            return
+        counts = self.attack_counts[piece[0]]
+        for ar, ac in self.get_attacked_squares(r, c, piece):
+            counts[ar][ac] += delta
+
+    # Build the attack counts of both sides from scratch
+    def build_attack_counts(self):
+        self.attack_counts = {'w': [[0] * DIMENSION for _ in range(DIMENSION)],
+                              'b': [[0] * DIMENSION for _ in range(DIMENSION)]}
+        for r in range(DIMENSION):
+            for c in range(DIMENSION):
+                self.update_attack_counts(r, c, 1)
+        return self.attack_counts
+
+    # Before the board changes: remove the attacks of pieces on changed squares and of sliders looking at them.
+    # The same sliders see the changed squares afterwards, so they are returned for restore_attacks
+    def lift_attacks(self, changed_squares):
+        sliders = set()
+        for r, c in changed_squares:
+            sliders.update(self.get_sliders_seeing(r, c))
+        sliders.difference_update(changed_squares)
+        for r, c in sliders:
+            self.update_attack_counts(r, c, -1)
+        for r, c in changed_squares:
+            self.update_attack_counts(r, c, -1)
+        return sliders
+
+    # After the board changed: add back the attacks removed by lift_attacks, computed on the new board
+    def restore_attacks(self, changed_squares, sliders):
+        for r, c in sliders:
+            self.update_attack_counts(r, c, 1)
+        for r, c in changed_squares:
+            self.update_attack_counts(r, c, 1)
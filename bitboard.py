@@ -0,0 +1,619 @@
+# # bitboard.py
+# Bitboard position backend: twelve 64-bit piece sets plus occupancy, with precomputed attack tables (sliders are
+# looked up by the occupancy of each line through their square). The 8x8 string view used by the UI is built on
+# demand (board property). It exposes the same surface as chess_board.ChessBoard (make_move, undo_move,
+# get_valid_moves, get_fen, ...) and can be selected with chess_board.create_board('bitboard').
+from array import array
+from chess_board import (castling_after_move, CASTLE_RIGHTS_SQUARES, code_to_move, DIMENSION, logged_move,
+                         MOVE_CACHE_SIZE, MOVE_CASTLE, MOVE_EN_PASSANT, MOVE_FLAGS, MOVE_PROMOTION, MoveCache,
+                         Position, PROMOTION_CODE_PIECES, START_FEN, ZOBRIST_BLACK_TO_MOVE, ZOBRIST_CASTLING, ZOBRIST_EP_FILE,
+                         ZOBRIST_PIECES)
+
+# Square index is row * 8 + col, with row 0 being rank 8 (same orientation as ChessBoard.board)
+PIECES = ['wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK']
+PIECE_INDEX = {piece: i for i, piece in enumerate(PIECES)}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PROMOTION_KINDS = (QUEEN, ROOK, BISHOP, KNIGHT)  # indexed like chess_board.PROMOTION_CODE_PIECES
+ZOBRIST_KEYS = [ZOBRIST_PIECES[piece] for piece in PIECES]  # ZOBRIST_KEYS[piece index][sq]
+WHITE, BLACK = 0, 1
+
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+ROOK_DIRS = [0, 1, 2, 3]
+BISHOP_DIRS = [4, 5, 6, 7]
+ALL_SQUARES = (1 << 64) - 1
+
+
+# Build a per-square attack mask for a piece that jumps by fixed offsets
+def _build_leaper_table(offsets):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        for dr, dc in offsets:
+            end_row, end_col = r + dr, c + dc
+            if 0 <= end_row < 8 and 0 <= end_col < 8:
+                mask |= 1 << (end_row * 8 + end_col)
+        table.append(mask)
+    return table
+
+
+# Build the empty-board ray mask for every direction and square
+def _build_ray_table():
+    rays = []
+    for dr, dc in DIRECTIONS:
+        dir_rays = []
+        for sq in range(64):
+            r, c = divmod(sq, 8)
+            mask = 0
+            r, c = r + dr, c + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                mask |= 1 << (r * 8 + c)
+                r, c = r + dr, c + dc
+            dir_rays.append(mask)
+        rays.append(dir_rays)
+    return rays
+
+
+KNIGHT_ATTACKS = _build_leaper_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _build_leaper_table(KING_OFFSETS)
+# PAWN_ATTACKS[color][sq]: squares attacked by a pawn of that color standing on sq
+PAWN_ATTACKS = [_build_leaper_table([(-1, -1), (-1, 1)]), _build_leaper_table([(1, -1), (1, 1)])]
+RAYS = _build_ray_table()
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+# Per color: the row a single push from the start row lands on, and the row where pawns promote
+DOUBLE_PUSH_ROWS = [0xFF << 40, 0xFF << 16]
+PROMOTION_ROWS = [0xFF, 0xFF << 56]
+# Rays that run towards higher square indexes find their first blocker with the lowest set bit
+RAY_POSITIVE = [dr > 0 or (dr == 0 and dc > 0) for dr, dc in DIRECTIONS]
+
+# Castling: (right, king from, king to, rook from, rook to, squares that must be empty, squares king crosses)
+CASTLES = [
+    ('wK', 60, 62, 63, 61, (61, 62), (61, 62)),
+    ('wQ', 60, 58, 56, 59, (57, 58, 59), (59, 58)),
+    ('bK', 4, 6, 7, 5, (5, 6), (5, 6)),
+    ('bQ', 4, 2, 0, 3, (1, 2, 3), (3, 2)),
+]
+
+
+# Attack set of a sliding piece on sq along the given directions, stopping at the first blocker
+# (a ray walk, only used to fill the line tables below)
+def slider_attacks(sq, occupied, dirs):
+    attacks = 0
+    for d in dirs:
+        ray = RAYS[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            if RAY_POSITIVE[d]:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= RAYS[d][blocker]
+        attacks |= ray
+    return attacks
+
+
+# Occupancy-indexed attack tables for one line (a pair of opposite directions) through every square.
+# The mask holds the squares of the line whose occupancy matters (the last square of each ray never blocks
+# anything behind it); the table maps every subset of the mask to the attacks along the line
+def _build_line_tables(dirs):
+    masks, tables = [], []
+    for sq in range(64):
+        mask = 0
+        for d in dirs:
+            ray = RAYS[d][sq]
+            if ray:
+                last = ray.bit_length() - 1 if RAY_POSITIVE[d] else (ray & -ray).bit_length() - 1
+                mask |= ray & ~(1 << last)
+        table = {}
+        subset = 0
+        while True:  # enumerate every subset of mask (Carry-Rippler)
+            table[subset] = slider_attacks(sq, subset, dirs)
+            subset = (subset - mask) & mask
+            if not subset:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+# Lines through a square: rank (W/E), file (N/S), diagonal (NW/SE) and anti-diagonal (NE/SW)
+RANK_MASKS, RANK_ATTACKS = _build_line_tables((2, 3))
+FILE_MASKS, FILE_ATTACKS = _build_line_tables((0, 1))
+DIAGONAL_MASKS, DIAGONAL_ATTACKS = _build_line_tables((4, 7))
+ANTI_DIAGONAL_MASKS, ANTI_DIAGONAL_ATTACKS = _build_line_tables((5, 6))
+
+
+# Rook attacks from sq: one table lookup per line
+def rook_attacks(sq, occupied):
+    return RANK_ATTACKS[sq][occupied & RANK_MASKS[sq]] | FILE_ATTACKS[sq][occupied & FILE_MASKS[sq]]
+
+
+# Bishop attacks from sq: one table lookup per diagonal
+def bishop_attacks(sq, occupied):
+    return DIAGONAL_ATTACKS[sq][occupied & DIAGONAL_MASKS[sq]] | \
+        ANTI_DIAGONAL_ATTACKS[sq][occupied & ANTI_DIAGONAL_MASKS[sq]]
+
+
+# Yield the index of every set bit, lowest first
+def iter_bits(bb):
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+class BitboardChessBoard:
+    def __init__(self, fen=START_FEN, cache_size=MOVE_CACHE_SIZE):
+        self.bitboards = [0] * 12
+        self.occupancy = [0, 0]  # per color
+        self.occupied = 0
+        self.rows = None  # cached 8x8 string view, None after any change
+        self.white_to_move = True
+        # (code, piece index, captured piece index or None, castling_rights, en_passant_possible, halfmove_clock,
+        # zobrist_hash) before each move; castling_rights dicts are replaced, never modified
+        self.history = []
+        self.logged_moves = []  # Move per history entry; None until move_log decodes it
+        self.zobrist_hash = 0  # same keys as ChessBoard, kept up to date by _put / _remove and make / undo
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.checkmate = False
+        self.stalemate = False
+        self.en_passant_possible = ()
+        self.castling_rights = {'wK': False, 'wQ': False, 'bK': False, 'bQ': False}
+        self.move_cache = MoveCache(cache_size)
+        self.load_fen(fen)
+
+    # Set up the position from a FEN string
+    def load_fen(self, fen):
+        fields = fen.split()
+        self.bitboards = [0] * 12
+        self.occupancy = [0, 0]
+        self.occupied = 0
+        self.rows = None
+        self.zobrist_hash = 0
+        for r, rank in enumerate(fields[0].split('/')):
+            c = 0
+            for ch in rank:
+                if ch.isdigit():
+                    c += int(ch)
+                else:
+                    piece = ('w' if ch.isupper() else 'b') + ch.upper()
+                    self._put(piece, r * 8 + c)
+                    c += 1
+        self.white_to_move = fields[1] == 'w'
+        castling = fields[2] if len(fields) > 2 else '-'
+        self.castling_rights = {'wK': 'K' in castling, 'wQ': 'Q' in castling,
+                                'bK': 'k' in castling, 'bQ': 'q' in castling}
+        ep = fields[3] if len(fields) > 3 else '-'
+        self.en_passant_possible = (8 - int(ep[1]), ord(ep[0]) - ord('a')) if ep != '-' else ()
+        self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        self.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        self.history = []
+        self.logged_moves = []
+        self.checkmate = False
+        self.stalemate = False
+        self.zobrist_hash ^= self._state_hash()
+
+    # Hash of side to move, castling rights and en passant file (pieces are hashed by _put)
+    def _state_hash(self):
+        h = 0 if self.white_to_move else ZOBRIST_BLACK_TO_MOVE
+        for right, allowed in self.castling_rights.items():
+            if allowed:
+                h ^= ZOBRIST_CASTLING[right]
+        if self.en_passant_possible:
+            h ^= ZOBRIST_EP_FILE[self.en_passant_possible[1]]
+        return h
+
+    def _put(self, piece, sq):
+        bit = 1 << sq
+        self.bitboards[PIECE_INDEX[piece]] |= bit
+        self.occupancy[WHITE if piece[0] == 'w' else BLACK] |= bit
+        self.occupied |= bit
+        self.zobrist_hash ^= ZOBRIST_PIECES[piece][sq]
+
+    # 8x8 string view for the UI, Move objects and FEN (read-only; rebuilt after the position changes)
+    @property
+    def board(self):
+        if self.rows is None:
+            rows = [['--'] * DIMENSION for _ in range(DIMENSION)]
+            for piece, bb in enumerate(self.bitboards):
+                name = PIECES[piece]
+                for sq in iter_bits(bb):
+                    rows[sq >> 3][sq & 7] = name
+            self.rows = rows
+        return self.rows
+
+    @property
+    def white_king_pos(self):
+        return divmod(self.bitboards[5].bit_length() - 1, 8)
+
+    @property
+    def black_king_pos(self):
+        return divmod(self.bitboards[11].bit_length() - 1, 8)
+
+    # Immutable copy of the current position (see chess_board.Position)
+    def snapshot(self):
+        return Position.from_board(self)
+
+    # Moves played so far as Move objects (read-only); moves made from codes are decoded here, on demand
+    @property
+    def move_log(self):
+        logged = self.logged_moves
+        for i, move in enumerate(logged):
+            if move is None:
+                code, piece, captured = self.history[i][:3]
+                logged[i] = logged_move(code, PIECES[piece], '--' if captured is None else PIECES[captured])
+        return logged
+
+    # Index of the piece of the given color on sq, None if it has none there
+    def _piece_at(self, sq, color):
+        bb = self.bitboards
+        for piece in range(6 * color, 6 * color + 6):
+            if (bb[piece] >> sq) & 1:
+                return piece
+        return None
+
+    # Make a Move object (e.g. from the UI); it is logged as given, with its promotion piece set
+    def make_move(self, move, promotion_piece='Q'):
+        code = move.start_row * 8 + move.start_col | (move.end_row * 8 + move.end_col) << 6
+        if move.is_en_passant:
+            code |= MOVE_EN_PASSANT
+        elif move.is_castle:
+            code |= MOVE_CASTLE
+        elif move.is_pawn_promotion:
+            code |= MOVE_PROMOTION | PROMOTION_CODE_PIECES.index(promotion_piece) << 12
+            move.promotion_piece = promotion_piece  # Store what it was promoted to
+        self.make_move_code(code, move)
+
+    # Make a move given as a code, straight on the bitboards; a promotion uses the piece stored in the code
+    def make_move_code(self, code, move=None):
+        bb = self.bitboards
+        occupancy = self.occupancy
+        keys = ZOBRIST_KEYS
+        start = code & 63
+        end = code >> 6 & 63
+        us = WHITE if self.white_to_move else BLACK
+        piece = self._piece_at(start, us)
+        captured = self._piece_at(end, 1 - us)
+        prev_en_passant = self.en_passant_possible
+        self.history.append((code, piece, captured, self.castling_rights, prev_en_passant, self.halfmove_clock,
+                             self.zobrist_hash))
+        self.logged_moves.append(move)
+        h = self.zobrist_hash ^ ZOBRIST_BLACK_TO_MOVE ^ keys[piece][start]
+
+        start_bit = 1 << start
+        end_bit = 1 << end
+        if captured is not None:
+            bb[captured] ^= end_bit
+            occupancy[1 - us] ^= end_bit
+            h ^= keys[captured][end]
+        moved = 6 * us + PROMOTION_KINDS[code >> 12 & 3] if code >= MOVE_PROMOTION else piece
+        bb[piece] ^= start_bit
+        bb[moved] |= end_bit
+        occupancy[us] ^= start_bit | end_bit
+        h ^= keys[moved][end]
+        flags = code & MOVE_FLAGS
+        if flags == MOVE_EN_PASSANT:
+            victim_sq = end + 8 if us == WHITE else end - 8
+            victim = 6 * (1 - us) + PAWN
+            bb[victim] ^= 1 << victim_sq
+            occupancy[1 - us] ^= 1 << victim_sq
+            h ^= keys[victim][victim_sq]
+        elif flags == MOVE_CASTLE:
+            rook_from, rook_to = (end + 1, end - 1) if end > start else (end - 2, end + 1)
+            rook = 6 * us + ROOK
+            rook_bits = 1 << rook_from | 1 << rook_to
+            bb[rook] ^= rook_bits
+            occupancy[us] ^= rook_bits
+            h ^= keys[rook][rook_from] ^ keys[rook][rook_to]
+        self.occupied = occupancy[WHITE] | occupancy[BLACK]
+
+        # En passant square, move counters and castling rights
+        if prev_en_passant:
+            h ^= ZOBRIST_EP_FILE[prev_en_passant[1]]
+        if piece == 6 * us + PAWN:
+            self.halfmove_clock = 0
+            if end - start == 16 or start - end == 16:
+                self.en_passant_possible = ((start + end) >> 4, start & 7)
+                h ^= ZOBRIST_EP_FILE[start & 7]
+            else:
+                self.en_passant_possible = ()
+        else:
+            self.halfmove_clock = 0 if captured is not None else self.halfmove_clock + 1
+            self.en_passant_possible = ()
+        if start in CASTLE_RIGHTS_SQUARES or end in CASTLE_RIGHTS_SQUARES:
+            self.castling_rights, changed = castling_after_move(self.castling_rights, start, end)
+            h ^= changed
+        if us == BLACK:
+            self.fullmove_number += 1
+
+        self.zobrist_hash = h
+        self.rows = None
+        self.white_to_move = not self.white_to_move
+
+    def undo_move(self):
+        if len(self.history) != 0:
+            code, piece, captured, self.castling_rights, self.en_passant_possible, self.halfmove_clock, \
+                self.zobrist_hash = self.history.pop()
+            self.logged_moves.pop()
+            bb = self.bitboards
+            occupancy = self.occupancy
+            start = code & 63
+            end = code >> 6 & 63
+            us = BLACK if self.white_to_move else WHITE  # the side that made the move
+            if us == BLACK:
+                self.fullmove_number -= 1
+
+            start_bit = 1 << start
+            end_bit = 1 << end
+            moved = 6 * us + PROMOTION_KINDS[code >> 12 & 3] if code >= MOVE_PROMOTION else piece
+            bb[moved] ^= end_bit
+            bb[piece] |= start_bit
+            occupancy[us] ^= start_bit | end_bit
+            if captured is not None:
+                bb[captured] |= end_bit
+                occupancy[1 - us] |= end_bit
+            flags = code & MOVE_FLAGS
+            if flags == MOVE_EN_PASSANT:
+                victim_sq = end + 8 if us == WHITE else end - 8
+                bb[6 * (1 - us) + PAWN] |= 1 << victim_sq
+                occupancy[1 - us] |= 1 << victim_sq
+            elif flags == MOVE_CASTLE:
+                rook_from, rook_to = (end + 1, end - 1) if end > start else (end - 2, end + 1)
+                rook_bits = 1 << rook_from | 1 << rook_to
+                bb[6 * us + ROOK] ^= rook_bits
+                occupancy[us] ^= rook_bits
+            self.occupied = occupancy[WHITE] | occupancy[BLACK]
+
+            self.rows = None
+            self.white_to_move = not self.white_to_move
+            self.checkmate = False
+            self.stalemate = False
+
+    # True if sq is attacked by the given color; excluded squares are treated as captured
+    def _is_attacked(self, sq, by, occupied, excluded=0):
+        bb = self.bitboards
+        base = 6 * by
+        keep = ~excluded
+        if PAWN_ATTACKS[1 - by][sq] & bb[base + PAWN] & keep:
+            return True
+        if KNIGHT_ATTACKS[sq] & bb[base + KNIGHT] & keep:
+            return True
+        if KING_ATTACKS[sq] & bb[base + KING]:
+            return True
+        rooks = (bb[base + ROOK] | bb[base + QUEEN]) & keep
+        if rooks and rook_attacks(sq, occupied) & rooks:
+            return True
+        bishops = (bb[base + BISHOP] | bb[base + QUEEN]) & keep
+        if bishops and bishop_attacks(sq, occupied) & bishops:
+            return True
+        return False
+
+    def square_attacked_by(self, row, col, attacking_color):
+        return self._is_attacked(row * 8 + col, WHITE if attacking_color == 'w' else BLACK, self.occupied)
+
+    def in_check(self):
+        us = WHITE if self.white_to_move else BLACK
+        king_sq = self.bitboards[6 * us + KING].bit_length() - 1
+        return self._is_attacked(king_sq, 1 - us, self.occupied)
+
+    # True if moving from start to end (capturing on captured_sq, if any) keeps our king safe
+    def _is_legal(self, start, end, us, king_sq, captured_sq=None):
+        occupied = (self.occupied & ~(1 << start)) | (1 << end)
+        excluded = 0
+        if captured_sq is not None:
+            excluded = 1 << captured_sq
+            if captured_sq != end:  # en passant: the captured pawn leaves its own square
+                occupied &= ~excluded
+        if king_sq == start:
+            king_sq = end
+        return not self._is_attacked(king_sq, 1 - us, occupied, excluded)
+
+    # Legal moves as Move objects, decoded from get_valid_move_codes
+    def get_valid_moves(self):
+        board = self.board
+        return [code_to_move(code, board) for code in self.get_valid_move_codes()]
+
+    # Legal moves as compact codes (see chess_board.MOVE_FLAGS); positions seen before come from the cache
+    def get_valid_move_codes(self):
+        cached = self.move_cache.get(self.zobrist_hash)
+        if cached is not None:
+            valid_moves, self.checkmate, self.stalemate = cached
+            return valid_moves
+
+        valid_moves, in_check = self.get_legal_moves()
+        if len(valid_moves) == 0:
+            if in_check:
+                self.checkmate = True
+            else:
+                self.stalemate = True
+        else:
+            self.checkmate = False
+            self.stalemate = False
+        self.move_cache.put(self.zobrist_hash, (valid_moves, self.checkmate, self.stalemate))
+        return valid_moves
+
+    # Pieces giving check and pinned pieces of the side to move, from the rays cast outward from its king
+    def get_checks_and_pins(self, us, king_sq):
+        """ Output:
+        checkers: number of pieces giving check
+        check_mask: squares a move other than a king move must land on (the checker and the squares between
+                    it and the king), all squares when not in check
+        pin_masks: {square of a pinned piece: squares it may move to, along the pin up to and including the pinner} """
+        bb = self.bitboards
+        base = 6 * (1 - us)
+        own = self.occupancy[us]
+        occupied = self.occupied
+        leapers = (PAWN_ATTACKS[us][king_sq] & bb[base + PAWN]) | (KNIGHT_ATTACKS[king_sq] & bb[base + KNIGHT])
+        checkers = bin(leapers).count('1')
+        check_mask = leapers if leapers else ALL_SQUARES
+        pin_masks = {}
+        rooks = bb[base + ROOK] | bb[base + QUEEN]
+        bishops = bb[base + BISHOP] | bb[base + QUEEN]
+        for d in range(8):
+            ray = RAYS[d][king_sq]
+            sliders = ray & (rooks if d < 4 else bishops)
+            if not sliders:
+                continue
+            blockers = ray & occupied
+            first = (blockers & -blockers).bit_length() - 1 if RAY_POSITIVE[d] else blockers.bit_length() - 1
+            if (sliders >> first) & 1:
+                checkers += 1
+                check_mask = ray ^ RAYS[d][first]
+            elif (own >> first) & 1:
+                behind = blockers & RAYS[d][first]
+                if behind:
+                    second = (behind & -behind).bit_length() - 1 if RAY_POSITIVE[d] else behind.bit_length() - 1
+                    if (sliders >> second) & 1:
+                        pin_masks[first] = ray ^ RAYS[d][second]
+        return checkers, check_mask, pin_masks
+
+    # Generate only legal moves: pieces move onto the check mask and along their pin, the king to unattacked squares
+    def get_legal_moves(self):
+        """ Output:
+        moves: array('H') of legal move codes for the side to move
+        in_check: True if the side to move is in check """
+        us = WHITE if self.white_to_move else BLACK
+        them = 1 - us
+        bb = self.bitboards
+        base = 6 * us
+        own = self.occupancy[us]
+        enemy = self.occupancy[them]
+        occupied = self.occupied
+        king_sq = bb[base + KING].bit_length() - 1
+        checkers, check_mask, pin_masks = self.get_checks_and_pins(us, king_sq)
+        moves = array('H')
+        append = moves.append
+
+        # In double check only the king may move
+        if checkers < 2:
+            targets = ~own & check_mask
+
+            # Pawns that are not pinned move as whole sets: the pawn bitboard shifted one rank forward (and one file
+            # sideways for captures). Pinned pawns move one by one along their pin. En passant is tried on the
+            # board, since it removes two pieces from the capturing rank
+            pawns = bb[base + PAWN]
+            pinned = 0
+            for sq in pin_masks:
+                pinned |= 1 << sq
+            free = pawns & ~pinned
+            empty = ~occupied
+            if us == WHITE:
+                forward = -8
+                one = free >> 8 & empty
+                pushes = ((one & targets, 8), ((one & DOUBLE_PUSH_ROWS[us]) >> 8 & empty & targets, 16),
+                          ((free & ~FILE_A) >> 9 & enemy & targets, 9), ((free & ~FILE_H) >> 7 & enemy & targets, 7))
+            else:
+                forward = 8
+                one = free << 8 & empty
+                pushes = ((one & targets, -8), ((one & DOUBLE_PUSH_ROWS[us]) << 8 & empty & targets, -16),
+                          ((free & ~FILE_A) << 7 & enemy & targets, -7), ((free & ~FILE_H) << 9 & enemy & targets, -9))
+            last_rank = PROMOTION_ROWS[us]
+            for ends, delta in pushes:
+                while ends:
+                    end = ends & -ends
+                    flags = MOVE_PROMOTION if end & last_rank else 0
+                    end = end.bit_length() - 1
+                    append(end + delta | end << 6 | flags)
+                    ends &= ends - 1
+            start_row = 6 if us == WHITE else 1
+            for sq in iter_bits(pawns & pinned):
+                allowed = targets & pin_masks[sq]
+                one = sq + forward
+                flags = MOVE_PROMOTION if (last_rank >> one) & 1 else 0
+                if not (occupied >> one) & 1:
+                    if (allowed >> one) & 1:
+                        append(sq | one << 6 | flags)
+                    two = one + forward
+                    if sq >> 3 == start_row and not (occupied >> two) & 1 and (allowed >> two) & 1:
+                        append(sq | two << 6)
+                for end in iter_bits(PAWN_ATTACKS[us][sq] & enemy & allowed):
+                    append(sq | end << 6 | flags)
+            if self.en_passant_possible:
+                ep_sq = self.en_passant_possible[0] * 8 + self.en_passant_possible[1]
+                for sq in iter_bits(PAWN_ATTACKS[them][ep_sq] & pawns):
+                    if self._is_legal(sq, ep_sq, us, king_sq, ep_sq - forward):
+                        append(sq | ep_sq << 6 | MOVE_EN_PASSANT)
+
+            # Knights (a pinned knight can never move), bishops, rooks and queens
+            # (target bits are popped inline rather than through iter_bits: these loops emit most of the moves)
+            for sq in iter_bits(bb[base + KNIGHT]):
+                if sq not in pin_masks:
+                    ends = KNIGHT_ATTACKS[sq] & targets
+                    while ends:
+                        end = ends & -ends
+                        append(sq | (end.bit_length() - 1) << 6)
+                        ends ^= end
+            for sq in iter_bits(bb[base + BISHOP] | bb[base + QUEEN]):
+                ends = bishop_attacks(sq, occupied) & (targets & pin_masks[sq] if sq in pin_masks else targets)
+                while ends:
+                    end = ends & -ends
+                    append(sq | (end.bit_length() - 1) << 6)
+                    ends ^= end
+            for sq in iter_bits(bb[base + ROOK] | bb[base + QUEEN]):
+                ends = rook_attacks(sq, occupied) & (targets & pin_masks[sq] if sq in pin_masks else targets)
+                while ends:
+                    end = ends & -ends
+                    append(sq | (end.bit_length() - 1) << 6)
+                    ends ^= end
+
+        # King moves: the king is lifted so squares behind it on a checking ray count as attacked
+        without_king = occupied & ~(1 << king_sq)
+        for end in iter_bits(KING_ATTACKS[king_sq] & ~own):
+            if not self._is_attacked(end, them, without_king, 1 << end):
+                append(king_sq | end << 6)
+
+        # Castling
+        if not checkers:
+            color = 'w' if us == WHITE else 'b'
+            for right, king_from, king_to, rook_from, _, empty, crossed in CASTLES:
+                if right[0] != color or not self.castling_rights[right] or king_sq != king_from:
+                    continue
+                if not (bb[base + ROOK] >> rook_from) & 1:
+                    continue
+                if any((occupied >> sq) & 1 for sq in empty):
+                    continue
+                if any(self._is_attacked(sq, them, occupied) for sq in crossed):
+                    continue
+                append(king_from | king_to << 6 | MOVE_CASTLE)
+
+        return moves, checkers > 0
+
+    # Board as text, one rank per line
+    def board_string(self):
+        return '\n'.join(' ' + ''.join('[ ' + piece + ']' for piece in row) for row in self.board)
+
+    def print_board(self):
+        print(' ')
+        print(self.board_string())
+
+    # Convert current board position to FEN notation
+    def get_fen(self):
+        ranks = []
+        for r in range(8):
+            rank = ''
+            empty = 0
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece == '--':
+                    empty += 1
+                    continue
+                if empty > 0:
+                    rank += str(empty)
+                    empty = 0
+                rank += piece[1] if piece[0] == 'w' else piece[1].lower()
+            if empty > 0:
+                rank += str(empty)
+            ranks.append(rank)
+
+        castling = ''.join(flag for right, flag in (('wK', 'K'), ('wQ', 'Q'), ('bK', 'k'), ('bQ', 'q'))
+                           if self.castling_rights[right])
+        if self.en_passant_possible:
+            ep = chr(ord('a') + self.en_passant_possible[1]) + str(8 - self.en_passant_possible[0])
+        else:
+            ep = '-'
+        return (f"{'/'.join(ranks)} {'w' if self.white_to_move else 'b'} {castling or '-'} {ep} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
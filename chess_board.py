@@ -1,11 +1,259 @@
 # chess_board.py
+import random
+from array import array
+from collections import namedtuple, OrderedDict
 
 # Constants
 DIMENSION = 8
+BACKENDS = ('mailbox', 'bitboard', 'mailbox120', 'attackmap')
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+MOVE_CACHE_SIZE = 4096  # positions kept in each board's legal-move cache (0 disables it)
+
+# Zobrist keys: one per (piece, square), plus side to move, each castling right and the en passant file
+_zobrist_rng = random.Random(0x5EED)
+ZOBRIST_PIECES = {color + piece: [_zobrist_rng.getrandbits(64) for _ in range(64)]
+                  for color in 'wb' for piece in 'PNBRQK'}
+ZOBRIST_PIECES['--'] = [0] * 64  # empty squares do not change the hash
+ZOBRIST_BLACK_TO_MOVE = _zobrist_rng.getrandbits(64)
+ZOBRIST_CASTLING = {right: _zobrist_rng.getrandbits(64) for right in ('wK', 'wQ', 'bK', 'bQ')}
+ZOBRIST_EP_FILE = [_zobrist_rng.getrandbits(64) for _ in range(8)]
+
+ROOK_DIRS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_DIRS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+# Per-square table of the on-board squares reached by fixed offsets: TABLE[row][col] -> ((r, c), ...)
+def _build_target_table(offsets):
+    return [[tuple((r + dr, c + dc) for dr, dc in offsets if 0 <= r + dr < 8 and 0 <= c + dc < 8)
+             for c in range(DIMENSION)] for r in range(DIMENSION)]
+
+
+# Per-square table of rays: TABLE[row][col] -> one tuple per direction, squares ordered away from (row, col)
+def _build_ray_table(dirs):
+    table = [[None] * DIMENSION for _ in range(DIMENSION)]
+    for r in range(DIMENSION):
+        for c in range(DIMENSION):
+            rays = []
+            for dr, dc in dirs:
+                ray = tuple((r + dr * i, c + dc * i) for i in range(1, 8)
+                            if 0 <= r + dr * i < 8 and 0 <= c + dc * i < 8)
+                if ray:
+                    rays.append(ray)
+            table[r][c] = tuple(rays)
+    return table
+
+
+KNIGHT_TARGETS = _build_target_table(KNIGHT_OFFSETS)
+KING_TARGETS = _build_target_table(KING_OFFSETS)
+ROOK_RAYS = _build_ray_table(ROOK_DIRS)
+BISHOP_RAYS = _build_ray_table(BISHOP_DIRS)
+# PAWN_CAPTURES[color][row][col]: squares a pawn of that color on (row, col) attacks
+PAWN_CAPTURES = {'w': _build_target_table(((-1, -1), (-1, 1))), 'b': _build_target_table(((1, -1), (1, 1)))}
+# PAWN_ATTACKERS[color][row][col]: squares from which a pawn of that color attacks (row, col)
+PAWN_ATTACKERS = {'w': _build_target_table(((1, -1), (1, 1))), 'b': _build_target_table(((-1, -1), (-1, 1)))}
+
+# Compact 16-bit move codes, stored in array('H') move lists during generation:
+# start square | end square << 6 | flags, with squares numbered row * 8 + col
+MOVE_SQUARES = 0x0FFF  # start and end square bits
+MOVE_FLAGS = 0xF000
+MOVE_EN_PASSANT = 0x1000
+MOVE_CASTLE = 0x2000
+MOVE_PROMOTION = 0x8000  # codes >= MOVE_PROMOTION are promotions; bits 12-13 index PROMOTION_CODE_PIECES
+PROMOTION_CODE_PIECES = ('Q', 'R', 'B', 'N')
+# Castling rights lost when a piece moves from or to one of these squares (row * 8 + col)
+CASTLE_RIGHTS_SQUARES = {60: ('wK', 'wQ'), 63: ('wK',), 56: ('wQ',), 4: ('bK', 'bQ'), 7: ('bK',), 0: ('bQ',)}
+
+
+# The same tables with the move code of each target: TABLE[row][col] -> ((end_row, end_col, code), ...)
+def _build_code_table(table):
+    return [[tuple((er, ec, r * 8 + c | (er * 8 + ec) << 6) for er, ec in table[r][c])
+             for c in range(DIMENSION)] for r in range(DIMENSION)]
+
+
+# Ray tables with move codes: TABLE[row][col] -> one tuple of (end_row, end_col, code) per direction
+def _build_ray_code_table(table):
+    return [[tuple(tuple((er, ec, r * 8 + c | (er * 8 + ec) << 6) for er, ec in ray) for ray in table[r][c])
+             for c in range(DIMENSION)] for r in range(DIMENSION)]
+
+
+KNIGHT_CODES = _build_code_table(KNIGHT_TARGETS)
+KING_CODES = _build_code_table(KING_TARGETS)
+ROOK_RAY_CODES = _build_ray_code_table(ROOK_RAYS)
+BISHOP_RAY_CODES = _build_ray_code_table(BISHOP_RAYS)
+PAWN_CAPTURE_CODES = {color: _build_code_table(table) for color, table in PAWN_CAPTURES.items()}
+
+
+# Promotion piece ('Q', 'R', 'B' or 'N') of a move code, None when the move is not a promotion
+def code_promotion_piece(code):
+    return PROMOTION_CODE_PIECES[code >> 12 & 3] if code >= MOVE_PROMOTION else None
+
+
+# Full Move object for a move code, built on demand for the UI, UCI and search layers
+def code_to_move(code, board):
+    """ Input: code: compact move code; board: 8x8 board (list of rows) of the position the move is played in
+    Output: Move; promotion_piece stays None until the move is made, as for generated moves """
+    start = code & 63
+    end = code >> 6 & 63
+    flags = code & MOVE_FLAGS
+    return Move((start >> 3, start & 7), (end >> 3, end & 7), board,
+                is_en_passant=flags == MOVE_EN_PASSANT, is_castle=flags == MOVE_CASTLE)
+
+
+# Move object for a logged move code, from the names of the pieces that stood on its start and end squares;
+# code_to_move only reads those two squares, so they are all the board it needs
+def logged_move(code, piece, captured):
+    start, end = code & 63, code >> 6 & 63
+    rows = {start >> 3: {}, end >> 3: {}}
+    rows[start >> 3][start & 7] = piece
+    rows[end >> 3][end & 7] = captured
+    move = code_to_move(code, rows)
+    move.promotion_piece = code_promotion_piece(code)
+    return move
+
+
+# Castling rights after a move between start and end (squares 0-63) that touches a king or rook home square,
+# and the Zobrist change; the dict is copied, never modified, since history entries share it
+def castling_after_move(rights, start, end):
+    lost = [right for right in CASTLE_RIGHTS_SQUARES.get(start, ()) + CASTLE_RIGHTS_SQUARES.get(end, ())
+            if rights[right]]
+    if not lost:
+        return rights, 0
+    rights = rights.copy()
+    h = 0
+    for right in lost:
+        rights[right] = False
+        h ^= ZOBRIST_CASTLING[right]
+    return rights, h
+
+
+# UCI string of a move code, e.g. 'e2e4' or 'e7e8q'
+def code_to_uci(code):
+    start, end = code & 63, code >> 6 & 63
+    uci = 'abcdefgh'[start & 7] + '87654321'[start >> 3] + 'abcdefgh'[end & 7] + '87654321'[end >> 3]
+    if code >= MOVE_PROMOTION:
+        uci += PROMOTION_CODE_PIECES[code >> 12 & 3].lower()
+    return uci
+
+
+# Legal move for a UCI string such as 'e2e4' or 'e7e8n' on a board of any backend, or None.
+# A new Move is returned each time, so the caller may set its promotion piece freely
+def find_uci_move(board, uci):
+    if len(uci) not in (4, 5) or (len(uci) == 5 and uci[4] not in 'qrbn'):
+        return None
+    start_col, end_col = 'abcdefgh'.find(uci[0]), 'abcdefgh'.find(uci[2])
+    start_row, end_row = '87654321'.find(uci[1]), '87654321'.find(uci[3])
+    if min(start_col, start_row, end_col, end_row) < 0:
+        return None
+    squares = start_row * 8 + start_col | (end_row * 8 + end_col) << 6
+    for code in board.get_valid_move_codes():
+        if code & MOVE_SQUARES == squares:
+            return code_to_move(code, board.board)
+    return None
+
+
+# Create a board using the selected position backend: 'mailbox' (8x8 list of strings), 'bitboard',
+# 'mailbox120' (integer-coded 10x12 array) or 'attackmap' (mailbox with incrementally kept attack counts)
+def create_board(backend='mailbox', fen=START_FEN):
+    if backend == 'mailbox':
+        return ChessBoard(fen)
+    if backend == 'bitboard':
+        from bitboard import BitboardChessBoard  # imported lazily: bitboard imports Move from this module
+        return BitboardChessBoard(fen)
+    if backend == 'mailbox120':
+        from mailbox120 import Mailbox120ChessBoard  # imported lazily, like bitboard
+        return Mailbox120ChessBoard(fen)
+    if backend == 'attackmap':
+        from attack_maps import AttackMapChessBoard  # imported lazily, like bitboard
+        return AttackMapChessBoard(fen)
+    raise ValueError(f"Unknown board backend: {backend} (expected one of {BACKENDS})")
+
+
+# Bounded least-recently-used cache from position hash to generated moves and game status
+class MoveCache:
+    def __init__(self, max_size=MOVE_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        if self.max_size <= 0:
+            return
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+# Snapshot square byte per piece: its FEN letter, '.' for an empty square
+SNAPSHOT_BYTES = {color + kind: ord(kind if color == 'w' else kind.lower()) for color in 'wb' for kind in 'PNBRQK'}
+SNAPSHOT_BYTES['--'] = ord('.')
+
+
+# Immutable, hashable position value (see ChessBoard.snapshot): safe to share between threads without locks
+# and small to send to other processes. Two snapshots are equal when their positions and counters are.
+class Position(namedtuple('Position', ['squares', 'white_to_move', 'castling', 'en_passant',
+                                       'halfmove_clock', 'fullmove_number'])):
+    """ squares: 64 bytes, rank 8 first, FEN letters with '.' for empty squares
+        castling: FEN castling field ('KQkq', '-', ...); en_passant: (row, col) or () """
+    __slots__ = ()
+
+    # Snapshot of any board backend (they all expose board, white_to_move, castling_rights, ...)
+    @classmethod
+    def from_board(cls, board):
+        squares = bytes([SNAPSHOT_BYTES[piece] for row in board.board for piece in row])
+        castling = ''.join(flag for right, flag in (('wK', 'K'), ('wQ', 'Q'), ('bK', 'k'), ('bQ', 'q'))
+                           if board.castling_rights[right])
+        return cls(squares, board.white_to_move, castling or '-', board.en_passant_possible,
+                   board.halfmove_clock, board.fullmove_number)
+
+    def to_fen(self):
+        ranks = []
+        for r in range(DIMENSION):
+            rank = ''
+            empty = 0
+            for ch in self.squares[r * 8:r * 8 + 8].decode('ascii'):
+                if ch == '.':
+                    empty += 1
+                    continue
+                if empty > 0:
+                    rank += str(empty)
+                    empty = 0
+                rank += ch
+            if empty > 0:
+                rank += str(empty)
+            ranks.append(rank)
+        if self.en_passant:
+            en_passant = chr(ord('a') + self.en_passant[1]) + str(8 - self.en_passant[0])
+        else:
+            en_passant = '-'
+        return (f"{'/'.join(ranks)} {'w' if self.white_to_move else 'b'} {self.castling} {en_passant} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
+    # A new, independent board set up at this position (without the move history)
+    def to_board(self, backend='mailbox'):
+        return create_board(backend, self.to_fen())
 
 
 class ChessBoard:
-    def __init__(self):
+    # When True, get_valid_moves verifies the legal generator against get_filtered_moves (slow, for debugging)
+    debug_cross_check = False
+
+    def __init__(self, fen=None, cache_size=MOVE_CACHE_SIZE):
         self.board = [
             ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'],
             ['bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP'],
@@ -17,13 +265,24 @@ class ChessBoard:
             ['wR', 'wN', 'wB', 'wQ', 'wK', 'wB', 'wN', 'wR']
         ]
         self.white_to_move = True
-        self.move_log = []
+        # (code, piece, captured piece, castling_rights, en_passant_possible, halfmove_clock, zobrist_hash) before
+        # each move; castling_rights dicts are replaced, never modified, so entries can share them
+        self.history = []
+        self.logged_moves = []  # Move per history entry; None until move_log decodes it
+        self.halfmove_clock = 0  # plies since the last capture or pawn move (50-move rule)
+        self.fullmove_number = 1  # incremented after each black move
+        self.fen_ranks = [None] * DIMENSION  # cached FEN fragment per row, None when the row changed
+        self.fen_cache = None  # full FEN of the current position, None after any move
         self.white_king_pos = (7, 4)
         self.black_king_pos = (0, 4)
         self.checkmate = False
         self.stalemate = False
         self.en_passant_possible = ()
         self.castling_rights = {'wK': True, 'wQ': True, 'bK': True, 'bQ': True}
+        if fen is not None and fen != START_FEN:
+            self.load_fen(fen)
+        self.zobrist_hash = self.compute_hash()
+        self.move_cache = MoveCache(cache_size)
         self.piece_functions = {
             'P': self.get_pawn_moves,
             'R': self.get_rook_moves,
@@ -32,108 +291,349 @@ class ChessBoard:
             'Q': self.get_queen_moves,
             'K': self.get_king_moves
         }
-        self.rook_dirs = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        self.bishop_dirs = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        self.knight_moves = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
-        self.king_moves = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-
-    def make_move(self, move, promotion_piece='Q'):
-        self.board[move.start_row][move.start_col] = '--'
-        self.board[move.end_row][move.end_col] = move.piece_moved
-        self.move_log.append(move)
-        self.white_to_move = not self.white_to_move
 
-        # Update king position
-        if move.piece_moved == 'wK':
-            self.white_king_pos = (move.end_row, move.end_col)
-        elif move.piece_moved == 'bK':
-            self.black_king_pos = (move.end_row, move.end_col)
-
-        # Pawn promotion
-        if move.is_pawn_promotion:
-            self.board[move.end_row][move.end_col] = move.piece_moved[0] + promotion_piece
-            move.promotion_piece = promotion_piece  # Store what it was promoted to
+    # Set up the position from a FEN string
+    def load_fen(self, fen):
+        fields = fen.split()
+        self.board = [['--'] * DIMENSION for _ in range(DIMENSION)]
+        for r, rank in enumerate(fields[0].split('/')):
+            c = 0
+            for ch in rank:
+                if ch.isdigit():
+                    c += int(ch)
+                else:
+                    piece = ('w' if ch.isupper() else 'b') + ch.upper()
+                    self.board[r][c] = piece
+                    if piece == 'wK':
+                        self.white_king_pos = (r, c)
+                    elif piece == 'bK':
+                        self.black_king_pos = (r, c)
+                    c += 1
+        self.white_to_move = fields[1] == 'w'
+        castling = fields[2] if len(fields) > 2 else '-'
+        self.castling_rights = {'wK': 'K' in castling, 'wQ': 'Q' in castling,
+                                'bK': 'k' in castling, 'bQ': 'q' in castling}
+        ep = fields[3] if len(fields) > 3 else '-'
+        self.en_passant_possible = (8 - int(ep[1]), ord(ep[0]) - ord('a')) if ep != '-' else ()
+        self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        self.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        self.fen_ranks = [None] * DIMENSION
+        self.fen_cache = None
+        self.history = []
+        self.logged_moves = []
+        self.checkmate = False
+        self.stalemate = False
+        self.zobrist_hash = self.compute_hash()
 
-        # En passant
+    # Full Zobrist hash of the current position (make_move / undo_move keep self.zobrist_hash up to date)
+    def compute_hash(self):
+        h = 0
+        for r in range(DIMENSION):
+            for c in range(DIMENSION):
+                h ^= ZOBRIST_PIECES[self.board[r][c]][r * 8 + c]
+        if not self.white_to_move:
+            h ^= ZOBRIST_BLACK_TO_MOVE
+        for right, allowed in self.castling_rights.items():
+            if allowed:
+                h ^= ZOBRIST_CASTLING[right]
+        if self.en_passant_possible:
+            h ^= ZOBRIST_EP_FILE[self.en_passant_possible[1]]
+        return h
+
+    # Immutable copy of the current position, e.g. for a background search while this board keeps changing
+    def snapshot(self):
+        return Position.from_board(self)
+
+    # Moves played so far as Move objects (read-only); moves made from codes are decoded here, on demand
+    @property
+    def move_log(self):
+        logged = self.logged_moves
+        for i, move in enumerate(logged):
+            if move is None:
+                logged[i] = logged_move(*self.history[i][:3])
+        return logged
+
+    # Make a Move object (e.g. from the UI); it is logged as given, with its promotion piece set
+    def make_move(self, move, promotion_piece='Q'):
+        code = move.start_row * 8 + move.start_col | (move.end_row * 8 + move.end_col) << 6
         if move.is_en_passant:
-            self.board[move.start_row][move.end_col] = '--'  # ?move.piece_moved
-
-        # Update whether en-passant is possible for this pawn
-        if move.piece_moved[1] == 'P' and abs(move.start_row - move.end_row) == 2:
-            self.en_passant_possible = ((move.start_row + move.end_row) // 2, move.start_col)
+            code |= MOVE_EN_PASSANT
+        elif move.is_castle:
+            code |= MOVE_CASTLE
+        elif move.is_pawn_promotion:
+            code |= MOVE_PROMOTION | PROMOTION_CODE_PIECES.index(promotion_piece) << 12
+            move.promotion_piece = promotion_piece  # Store what it was promoted to
+        self.make_move_code(code, move)
+
+    # Make a move given as a code, straight on the 8x8 board; a promotion uses the piece stored in the code
+    def make_move_code(self, code, move=None):
+        board = self.board
+        keys = ZOBRIST_PIECES
+        start = code & 63
+        end = code >> 6 & 63
+        start_row, start_col = start >> 3, start & 7
+        end_row, end_col = end >> 3, end & 7
+        piece = board[start_row][start_col]
+        captured = board[end_row][end_col]
+        prev_en_passant = self.en_passant_possible
+        self.history.append((code, piece, captured, self.castling_rights, prev_en_passant, self.halfmove_clock,
+                             self.zobrist_hash))
+        self.logged_moves.append(move)
+        h = self.zobrist_hash ^ ZOBRIST_BLACK_TO_MOVE ^ keys[piece][start] ^ keys[captured][end]
+
+        board[start_row][start_col] = '--'
+        if code >= MOVE_PROMOTION:
+            promoted = piece[0] + PROMOTION_CODE_PIECES[code >> 12 & 3]
+            board[end_row][end_col] = promoted
+            h ^= keys[promoted][end]
         else:
+            board[end_row][end_col] = piece
+            h ^= keys[piece][end]
+            flags = code & MOVE_FLAGS
+            if flags == MOVE_EN_PASSANT:
+                victim = board[start_row][end_col]
+                board[start_row][end_col] = '--'
+                h ^= keys[victim][start_row * 8 + end_col]
+            elif flags == MOVE_CASTLE:
+                rook_from, rook_to = (end_col + 1, end_col - 1) if end_col > start_col else (end_col - 2, end_col + 1)
+                row = board[end_row]
+                rook = row[rook_from]
+                row[rook_to] = rook
+                row[rook_from] = '--'
+                h ^= keys[rook][end_row * 8 + rook_from] ^ keys[rook][end_row * 8 + rook_to]
+            if piece[1] == 'K':
+                if piece[0] == 'w':
+                    self.white_king_pos = (end_row, end_col)
+                else:
+                    self.black_king_pos = (end_row, end_col)
+
+        # En passant square, move counters and castling rights
+        if prev_en_passant:
+            h ^= ZOBRIST_EP_FILE[prev_en_passant[1]]
+        if piece[1] == 'P':
+            self.halfmove_clock = 0
+            if end - start == 16 or start - end == 16:
+                self.en_passant_possible = ((start_row + end_row) >> 1, start_col)
+                h ^= ZOBRIST_EP_FILE[start_col]
+            else:
+                self.en_passant_possible = ()
+        else:
+            self.halfmove_clock = 0 if captured != '--' else self.halfmove_clock + 1
             self.en_passant_possible = ()
-
-        # Castling
-        if move.is_castle:
-            if move.end_col - move.start_col == 2:  # Kingside
-                self.board[move.end_row][move.end_col - 1] = self.board[move.end_row][move.end_col + 1]
-                self.board[move.end_row][move.end_col + 1] = '--'
-            else:  # Queenside
-                self.board[move.end_row][move.end_col + 1] = self.board[move.end_row][move.end_col - 2]
-                self.board[move.end_row][move.end_col - 2] = '--'
-
-        # Update castling rights
-        self.update_castling_rights(move)
+        if start in CASTLE_RIGHTS_SQUARES or end in CASTLE_RIGHTS_SQUARES:
+            self.castling_rights, changed = castling_after_move(self.castling_rights, start, end)
+            h ^= changed
+        if piece[0] == 'b':
+            self.fullmove_number += 1
+
+        # FEN cache: only the rows this move touched are rebuilt
+        self.fen_ranks[start_row] = None
+        self.fen_ranks[end_row] = None
+        self.fen_cache = None
+        self.zobrist_hash = h
+        self.white_to_move = not self.white_to_move
 
     def undo_move(self):
-        if len(self.move_log) != 0:
-            move = self.move_log.pop()
-            self.board[move.start_row][move.start_col] = move.piece_moved
-            self.board[move.end_row][move.end_col] = move.piece_captured
+        if len(self.history) != 0:
+            code, piece, captured, self.castling_rights, self.en_passant_possible, self.halfmove_clock, \
+                self.zobrist_hash = self.history.pop()
+            self.logged_moves.pop()
+            board = self.board
+            start_row, start_col = divmod(code & 63, 8)
+            end_row, end_col = divmod(code >> 6 & 63, 8)
+            if piece[0] == 'b':
+                self.fullmove_number -= 1
+
+            board[start_row][start_col] = piece
+            board[end_row][end_col] = captured
+            if code < MOVE_PROMOTION:
+                flags = code & MOVE_FLAGS
+                if flags == MOVE_EN_PASSANT:
+                    board[start_row][end_col] = ('b' if piece[0] == 'w' else 'w') + 'P'
+                elif flags == MOVE_CASTLE:
+                    rook_from, rook_to = (end_col + 1, end_col - 1) if end_col > start_col else \
+                        (end_col - 2, end_col + 1)
+                    row = board[end_row]
+                    row[rook_from] = row[rook_to]
+                    row[rook_to] = '--'
+                if piece[1] == 'K':
+                    if piece[0] == 'w':
+                        self.white_king_pos = (start_row, start_col)
+                    else:
+                        self.black_king_pos = (start_row, start_col)
+
+            self.fen_ranks[start_row] = None
+            self.fen_ranks[end_row] = None
+            self.fen_cache = None
             self.white_to_move = not self.white_to_move
+            self.checkmate = False
+            self.stalemate = False
 
-            # Update king position
-            if move.piece_moved == 'wK':
-                self.white_king_pos = (move.start_row, move.start_col)
-            elif move.piece_moved == 'bK':
-                self.black_king_pos = (move.start_row, move.start_col)
-
-            # Undo en passant
-            if move.is_en_passant:
-                self.board[move.end_row][move.end_col] = '--'
-                curPiece = move.piece_moved  # such as 'wP'
-                curColor = curPiece[0]
-                oppColor = 'w' if curColor=='b' else 'b'
-                self.board[move.start_row][move.end_col] = oppColor + 'P'  # move.piece_captured
-                print(f'line 99: Undo en passant: {curPiece} loc={move.end_row},{move.end_col} deleted.  Prev={move.start_row},{move.start_col}.  {move.start_row},{move.end_col} restored')
-
-            # Undo castling
-            if move.is_castle:
-                if move.end_col - move.start_col == 2:
-                    self.board[move.end_row][move.end_col + 1] = self.board[move.end_row][move.end_col - 1]
-                    self.board[move.end_row][move.end_col - 1] = '--'
-                else:
-                    self.board[move.end_row][move.end_col - 2] = self.board[move.end_row][move.end_col + 1]
-                    self.board[move.end_row][move.end_col + 1] = '--'
+    # Legal moves as Move objects (decoded from the compact codes for the UI, UCI and search layers)
+    def get_valid_moves(self):
+        board = self.board
+        return [code_to_move(code, board) for code in self.get_valid_move_codes()]
+
+    # Legal moves as compact codes; the array is shared with the move cache, so copy it before modifying
+    def get_valid_move_codes(self):
+        # Positions seen before (repetitions, undo, engine re-queries) come straight from the cache
+        cached = None if self.debug_cross_check else self.move_cache.get(self.zobrist_hash)
+        if cached is not None:
+            valid_moves, self.checkmate, self.stalemate = cached
+            return valid_moves
+
+        valid_moves, in_check = self.get_legal_moves()
+
+        # Debug mode: compare against the slow make/undo filtering generator
+        if self.debug_cross_check:
+            filtered = self.get_filtered_moves()
+            if sorted(valid_moves) != sorted(filtered):
+                raise AssertionError(f"Legal move generator mismatch in {self.get_fen()}: "
+                                     f"legal={sorted(valid_moves)} filtered={sorted(filtered)}")
 
+        if len(valid_moves) == 0:
+            if in_check:
+                self.checkmate = True
+            else:
+                self.stalemate = True
+        else:
             self.checkmate = False
             self.stalemate = False
+        self.move_cache.put(self.zobrist_hash, (valid_moves, self.checkmate, self.stalemate))
+        return valid_moves
 
-    def update_castling_rights(self, move):
-        if move.piece_moved == 'wK':
-            self.castling_rights['wK'] = False
-            self.castling_rights['wQ'] = False
-        elif move.piece_moved == 'bK':
-            self.castling_rights['bK'] = False
-            self.castling_rights['bQ'] = False
-        elif move.piece_moved == 'wR':
-            if move.start_row == 7:
-                if move.start_col == 0:
-                    self.castling_rights['wQ'] = False
-                elif move.start_col == 7:
-                    self.castling_rights['wK'] = False
-        elif move.piece_moved == 'bR':
-            if move.start_row == 0:
-                if move.start_col == 0:
-                    self.castling_rights['bQ'] = False
-                elif move.start_col == 7:
-                    self.castling_rights['bK'] = False
-
-    def get_valid_moves(self):
-        moves = []
-        temp_en_passant = self.en_passant_possible
-        temp_castling = self.castling_rights.copy()
+    # Generate only legal moves, using the checking pieces and pins computed once per position
+    def get_legal_moves(self):
+        """ Output:
+        moves: array('H') of legal move codes for the side to move
+        in_check: True if the side to move is in check """
+        ally_color = 'w' if self.white_to_move else 'b'
+        enemy_color = 'b' if self.white_to_move else 'w'
+        king_row, king_col = self.white_king_pos if self.white_to_move else self.black_king_pos
+        checks, pins = self.get_checks_and_pins()
+        moves = array('H')
+
+        # In double check only the king may move
+        if len(checks) < 2:
+            block_squares = checks[0] if checks else None
+            board = self.board
+            for r in range(DIMENSION):
+                row = board[r]
+                for c in range(DIMENSION):
+                    piece = row[c]
+                    if piece[0] != ally_color or piece[1] == 'K':
+                        continue
+                    first = len(moves)
+                    self.get_piece_moves(r, c, piece[1], moves)
+                    pin_squares = pins.get(r * 8 + c)
+                    if pin_squares is None and block_squares is None and (
+                            piece[1] != 'P' or not self.en_passant_possible):
+                        continue  # every generated move is legal
+
+                    # Keep the moves that stay on the pin ray, answer the check and (en passant) keep the king safe
+                    piece_moves = moves[first:]
+                    del moves[first:]
+                    for code in piece_moves:
+                        if code & MOVE_FLAGS == MOVE_EN_PASSANT:
+                            if self.en_passant_is_legal(code):
+                                moves.append(code)
+                            continue
+                        end_sq = code >> 6 & 63
+                        if pin_squares is not None and end_sq not in pin_squares:
+                            continue
+                        if block_squares is not None and end_sq not in block_squares:
+                            continue
+                        moves.append(code)
+
+        self.get_safe_king_moves(king_row, king_col, enemy_color, len(checks) > 0, moves)
+
+        # Castling (squares the king crosses are checked in get_kingside_castle / get_queenside_castle)
+        if not checks:
+            if self.castling_rights[ally_color + 'K']:
+                self.get_kingside_castle(king_row, king_col, moves)
+            if self.castling_rights[ally_color + 'Q']:
+                self.get_queenside_castle(king_row, king_col, moves)
+
+        return moves, len(checks) > 0
+
+    # King moves to squares the enemy does not attack. The king is lifted so squares behind it on a checking ray
+    # count as attacked (AttackMapChessBoard overrides this with a lookup when not in check)
+    def get_safe_king_moves(self, king_row, king_col, enemy_color, in_check, moves):
+        king_moves = array('H')
+        self.get_king_moves_no_castle(king_row, king_col, king_moves)
+        king = self.board[king_row][king_col]
+        self.board[king_row][king_col] = '--'
+        for code in king_moves:
+            end_sq = code >> 6 & 63
+            if not self.scan_square_attacked_by(end_sq >> 3, end_sq & 7, enemy_color):
+                moves.append(code)
+        self.board[king_row][king_col] = king
+
+    # Find the pieces checking our king and our pieces pinned to it
+    def get_checks_and_pins(self):
+        """ Output:
+        checks: list of square sets, one per checking piece - squares that capture or block that check
+        pins: dict {square: squares} - pinned piece and the squares it may move to without leaving the pin ray
+        Squares are numbered row * 8 + col, like the squares of move codes """
+        ally_color = 'w' if self.white_to_move else 'b'
+        enemy_color = 'b' if self.white_to_move else 'w'
+        king_row, king_col = self.white_king_pos if self.white_to_move else self.black_king_pos
+        checks = []
+        pins = {}
+
+        board = self.board
+        for rays, sliders in ((ROOK_RAYS[king_row][king_col], 'RQ'), (BISHOP_RAYS[king_row][king_col], 'BQ')):
+            for ray in rays:
+                possible_pin = None
+                for i, (r, c) in enumerate(ray):
+                    piece = board[r][c]
+                    if piece == '--':
+                        continue
+                    if piece[0] == ally_color:
+                        if possible_pin is None:
+                            possible_pin = r * 8 + c
+                            continue
+                        break  # Two of our pieces on the ray: no pin
+                    if piece[1] in sliders:
+                        squares = {sr * 8 + sc for sr, sc in ray[:i + 1]}
+                        if possible_pin is None:
+                            checks.append(squares)
+                        else:
+                            pins[possible_pin] = squares
+                    break  # Blocked by an enemy piece
+
+        knight = enemy_color + 'N'
+        for r, c in KNIGHT_TARGETS[king_row][king_col]:
+            if board[r][c] == knight:
+                checks.append({r * 8 + c})
+
+        pawn = enemy_color + 'P'
+        for r, c in PAWN_ATTACKERS[enemy_color][king_row][king_col]:
+            if board[r][c] == pawn:
+                checks.append({r * 8 + c})
+
+        return checks, pins
+
+    # En passant removes two pawns from one rank, which can expose the king, so it is tried on the board
+    def en_passant_is_legal(self, code):
+        start_row, start_col = divmod(code & 63, 8)
+        end_row, end_col = divmod(code >> 6 & 63, 8)
+        board = self.board
+        pawn = board[start_row][start_col]
+        captured_piece = board[start_row][end_col]
+        board[start_row][start_col] = '--'
+        board[start_row][end_col] = '--'
+        board[end_row][end_col] = pawn
+        king_row, king_col = self.white_king_pos if self.white_to_move else self.black_king_pos
+        legal = not self.scan_square_attacked_by(king_row, king_col, 'b' if self.white_to_move else 'w')
+        board[end_row][end_col] = '--'
+        board[start_row][end_col] = captured_piece
+        board[start_row][start_col] = pawn
+        return legal
+
+    # Reference generator: pseudo-legal moves filtered with make/undo (used by debug_cross_check)
+    def get_filtered_moves(self):
+        moves = array('H')
         ally_color = 'w' if self.white_to_move else 'b'
 
         for r in range(DIMENSION):
@@ -142,28 +642,15 @@ class ChessBoard:
                 if piece[0] == ally_color:
                     self.get_piece_moves(r, c, piece[1], moves)
 
-        # Filter out moves that leave king in check (now much faster)
-        valid_moves = []
         # Filter out moves that leave king in check
-        for move in moves:
-            self.make_move(move)
+        valid_moves = array('H')
+        for code in moves:
+            self.make_move_code(code)
             self.white_to_move = not self.white_to_move
             if not self.in_check():
-                valid_moves.append(move)
+                valid_moves.append(code)
             self.white_to_move = not self.white_to_move
             self.undo_move()
-
-        if len(valid_moves) == 0:
-            if self.in_check():
-                self.checkmate = True
-            else:
-                self.stalemate = True
-        else:
-            self.checkmate = False
-            self.stalemate = False
-
-        self.en_passant_possible = temp_en_passant
-        self.castling_rights = temp_castling
         return valid_moves
 
     def in_check(self):
@@ -172,138 +659,101 @@ class ChessBoard:
         else:
             return self.square_attacked_by(self.black_king_pos[0], self.black_king_pos[1], 'w')
 
-    def square_attacked_by(self, row, col, attacking_color):
-        pawn_row = row + 1 if attacking_color == 'w' else row - 1
-        if 0 <= pawn_row < 8:
-            for dc in [-1, 1]:
-                c = col + dc
-                if 0 <= c < 8:
-                    piece = self.board[pawn_row][c]
-                    if piece == attacking_color + 'P':
-                        return True
-
-        for dr, dc in self.knight_moves:
-            r, c = row + dr, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                if self.board[r][c] == attacking_color + 'N':
-                    return True
-
-        for dr, dc in self.rook_dirs:
-            for i in range(1, 8):
-                r, c = row + dr * i, col + dc * i
-                if not (0 <= r < 8 and 0 <= c < 8):
-                    break
-                piece = self.board[r][c]
+    # Scan outward from (row, col); also valid while the board is temporarily modified
+    def scan_square_attacked_by(self, row, col, attacking_color):
+        board = self.board
+        pawn = attacking_color + 'P'
+        for r, c in PAWN_ATTACKERS[attacking_color][row][col]:
+            if board[r][c] == pawn:
+                return True
+
+        knight = attacking_color + 'N'
+        for r, c in KNIGHT_TARGETS[row][col]:
+            if board[r][c] == knight:
+                return True
+
+        rook, queen = attacking_color + 'R', attacking_color + 'Q'
+        for ray in ROOK_RAYS[row][col]:
+            for r, c in ray:
+                piece = board[r][c]
                 if piece == '--':
                     continue
-                if piece[0] == attacking_color and piece[1] in 'RQ':
+                if piece == rook or piece == queen:
                     return True
                 break  # Blocked by any piece
 
-        for dr, dc in self.bishop_dirs:
-            for i in range(1, 8):
-                r, c = row + dr * i, col + dc * i
-                if not (0 <= r < 8 and 0 <= c < 8):
-                    break
-                piece = self.board[r][c]
-                # Don't check castling when determining if square is under attack
+        bishop = attacking_color + 'B'
+        for ray in BISHOP_RAYS[row][col]:
+            for r, c in ray:
+                piece = board[r][c]
                 if piece == '--':
                     continue
-                if piece[0] == attacking_color and piece[1] in 'BQ':
+                if piece == bishop or piece == queen:
                     return True
                 break  # Blocked by any piece
 
-        for dr, dc in self.king_moves:
-            r, c = row + dr, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                if self.board[r][c] == attacking_color + 'K':
-                    return True
+        king = attacking_color + 'K'
+        for r, c in KING_TARGETS[row][col]:
+            if board[r][c] == king:
+                return True
         return False
 
+    # Plain ChessBoard answers by scanning; AttackMapChessBoard overrides this with a lookup in its attack counts
+    square_attacked_by = scan_square_attacked_by
+
     def get_piece_moves(self, r, c, piece, moves):
         self.piece_functions[piece](r, c, moves)
 
     def get_pawn_moves(self, r, c, moves):
+        board = self.board
         if self.white_to_move:
-            if r > 0 and self.board[r - 1][c] == '--':
-                moves.append(Move((r, c), (r - 1, c), self.board))
-                if r == 6 and self.board[r - 2][c] == '--':
-                    moves.append(Move((r, c), (r - 2, c), self.board))
-            if c > 0 and r > 0:
-                if self.board[r - 1][c - 1][0] == 'b':
-                    moves.append(Move((r, c), (r - 1, c - 1), self.board))
-                elif (r - 1, c - 1) == self.en_passant_possible:
-                    moves.append(Move((r, c), (r - 1, c - 1), self.board, is_en_passant=True))
-            if c < 7 and r > 0:
-                if self.board[r - 1][c + 1][0] == 'b':
-                    moves.append(Move((r, c), (r - 1, c + 1), self.board))
-                elif (r - 1, c + 1) == self.en_passant_possible:
-                    moves.append(Move((r, c), (r - 1, c + 1), self.board, is_en_passant=True))
+            ally, enemy, step, start_row, last_row = 'w', 'b', -1, 6, 0
         else:
-            if r < 7 and self.board[r + 1][c] == '--':
-                moves.append(Move((r, c), (r + 1, c), self.board))
-                if r == 1 and self.board[r + 2][c] == '--':
-                    moves.append(Move((r, c), (r + 2, c), self.board))
-            if c > 0 and r < 7:
-                if self.board[r + 1][c - 1][0] == 'w':
-                    moves.append(Move((r, c), (r + 1, c - 1), self.board))
-                elif (r + 1, c - 1) == self.en_passant_possible:
-                    moves.append(Move((r, c), (r + 1, c - 1), self.board, is_en_passant=True))
-            if c < 7 and r < 7:
-                if self.board[r + 1][c + 1][0] == 'w':
-                    moves.append(Move((r, c), (r + 1, c + 1), self.board))
-                elif (r + 1, c + 1) == self.en_passant_possible:
-                    moves.append(Move((r, c), (r + 1, c + 1), self.board, is_en_passant=True))
-
-    def get_rook_moves(self, r, c, moves):
+            ally, enemy, step, start_row, last_row = 'b', 'w', 1, 1, 7
+        start = r * 8 + c
+        end_row = r + step
+        flags = MOVE_PROMOTION if end_row == last_row else 0
+        if 0 <= end_row < 8 and board[end_row][c] == '--':
+            moves.append(start | (end_row * 8 + c) << 6 | flags)
+            if r == start_row and board[end_row + step][c] == '--':
+                moves.append(start | ((end_row + step) * 8 + c) << 6)
+        en_passant = self.en_passant_possible
+        for er, ec, code in PAWN_CAPTURE_CODES[ally][r][c]:
+            if board[er][ec][0] == enemy:
+                moves.append(code | flags)
+            elif en_passant and er == en_passant[0] and ec == en_passant[1]:
+                moves.append(code | MOVE_EN_PASSANT)
+
+    # Walk each precomputed ray until the first piece, capturing it if it is an enemy
+    def get_slider_moves(self, rays, moves):
+        board = self.board
         enemy = 'b' if self.white_to_move else 'w'
-        for dr, dc in self.rook_dirs:
-            for i in range(1, 8):
-                end_row = r + dr * i
-                end_col = c + dc * i
-                if 0 <= end_row < 8 and 0 <= end_col < 8:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece == '--':
-                        moves.append(Move((r, c), (end_row, end_col), self.board))
-                    elif end_piece[0] == enemy:
-                        moves.append(Move((r, c), (end_row, end_col), self.board))
-                        break
-                    else:
-                        break
+        for ray in rays:
+            for er, ec, code in ray:
+                end_piece = board[er][ec]
+                if end_piece == '--':
+                    moves.append(code)
                 else:
+                    if end_piece[0] == enemy:
+                        moves.append(code)
                     break
 
+    def get_rook_moves(self, r, c, moves):
+        self.get_slider_moves(ROOK_RAY_CODES[r][c], moves)
+
     def get_knight_moves(self, r, c, moves):
+        board = self.board
         ally = 'w' if self.white_to_move else 'b'
-        for dr, dc in self.knight_moves:
-            end_row = r + dr
-            end_col = c + dc
-            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally:
-                    moves.append(Move((r, c), (end_row, end_col), self.board))
+        for er, ec, code in KNIGHT_CODES[r][c]:
+            if board[er][ec][0] != ally:
+                moves.append(code)
 
     def get_bishop_moves(self, r, c, moves):
-        enemy = 'b' if self.white_to_move else 'w'
-        for dr, dc in self.bishop_dirs:
-            for i in range(1, 8):
-                end_row = r + dr * i
-                end_col = c + dc * i
-                if 0 <= end_row < 8 and 0 <= end_col < 8:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece == '--':
-                        moves.append(Move((r, c), (end_row, end_col), self.board))
-                    elif end_piece[0] == enemy:
-                        moves.append(Move((r, c), (end_row, end_col), self.board))
-                        break
-                    else:
-                        break
-                else:
-                    break
+        self.get_slider_moves(BISHOP_RAY_CODES[r][c], moves)
 
     def get_queen_moves(self, r, c, moves):
-        self.get_rook_moves(r, c, moves)
-        self.get_bishop_moves(r, c, moves)
+        self.get_slider_moves(ROOK_RAY_CODES[r][c], moves)
+        self.get_slider_moves(BISHOP_RAY_CODES[r][c], moves)
 
     def get_king_moves(self, r, c, moves):
         self.get_king_moves_no_castle(r, c, moves)
@@ -311,14 +761,11 @@ class ChessBoard:
         self.get_castle_moves(r, c, moves)
 
     def get_king_moves_no_castle(self, r, c, moves):
+        board = self.board
         ally = 'w' if self.white_to_move else 'b'
-        for dr, dc in self.king_moves:
-            end_row = r + dr
-            end_col = c + dc
-            if 0 <= end_row < 8 and 0 <= end_col < 8:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally:
-                    moves.append(Move((r, c), (end_row, end_col), self.board))
+        for er, ec, code in KING_CODES[r][c]:
+            if board[er][ec][0] != ally:
+                moves.append(code)
 
     def get_castle_moves(self, r, c, moves):
         if self.in_check():
@@ -334,50 +781,48 @@ class ChessBoard:
         enemy = 'b' if self.white_to_move else 'w'
         if self.board[r][c + 1] == '--' and self.board[r][c + 2] == '--':
             if not self.square_attacked_by(r, c + 1, enemy) and not self.square_attacked_by(r, c + 2, enemy):
-                moves.append(Move((r, c), (r, c + 2), self.board, is_castle=True))
+                moves.append(r * 8 + c | (r * 8 + c + 2) << 6 | MOVE_CASTLE)
 
     def get_queenside_castle(self, r, c, moves):
         enemy = 'b' if self.white_to_move else 'w'
         if self.board[r][c - 1] == '--' and self.board[r][c - 2] == '--' and self.board[r][c - 3] == '--':
             if not self.square_attacked_by(r, c - 1, enemy) and not self.square_attacked_by(r, c - 2, enemy):
-                moves.append(Move((r, c), (r, c - 2), self.board, is_castle=True))
+                moves.append(r * 8 + c | (r * 8 + c - 2) << 6 | MOVE_CASTLE)
+
+    # Board as text, one rank per line
+    def board_string(self):
+        return '\n'.join(' ' + ''.join('[ ' + piece + ']' for piece in row) for row in self.board)
 
     def print_board(self):
         print(' ')
-        for r in range(DIMENSION):
-            print(' ', end="")
-            for c in range(DIMENSION):
-                piece = self.board[r][c]
-                print("[ " +piece, end="]")
-            print('')
-
-    # Convert current board position to FEN notation
+        print(self.board_string())
+
+    # FEN fragment for one row of the board
+    def get_fen_rank(self, r):
+        rank = ''
+        empty = 0
+        for piece in self.board[r]:
+            if piece == '--':
+                empty += 1
+            else:
+                if empty > 0:
+                    rank += str(empty)
+                    empty = 0
+                rank += piece[1] if piece[0] == 'w' else piece[1].lower()
+        if empty > 0:
+            rank += str(empty)
+        return rank
+
+    # Convert current board position to FEN notation (cached until the next move; rows are cached separately)
     def get_fen(self):
-        fen = ""
+        if self.fen_cache is not None:
+            return self.fen_cache
 
         # Board position
-        for r in range(8):
-            empty = 0
-            for c in range(8):
-                piece = self.board[r][c]
-                if piece == '--':
-                    empty += 1
-                else:
-                    if empty > 0:
-                        fen += str(empty)
-                        empty = 0
-                    piece_char = piece[1]
-                    if piece[0] == 'w':
-                        fen += piece_char
-                    else:
-                        fen += piece_char.lower()
-            if empty > 0:
-                fen += str(empty)
-            if r < 7:
-                fen += '/'
-
-        # Active color
-        fen += ' w ' if self.white_to_move else ' b '
+        ranks = self.fen_ranks
+        for r in range(DIMENSION):
+            if ranks[r] is None:
+                ranks[r] = self.get_fen_rank(r)
 
         # Castling rights
         castling = ''
@@ -389,22 +834,16 @@ class ChessBoard:
             castling += 'k'
         if self.castling_rights['bQ']:
             castling += 'q'
-        fen += castling if castling else '-'
-        fen += ' '
 
         # En passant
         if self.en_passant_possible:
-            file = chr(ord('a') + self.en_passant_possible[1])
-            rank = str(8 - self.en_passant_possible[0])
-            fen += file + rank
+            en_passant = chr(ord('a') + self.en_passant_possible[1]) + str(8 - self.en_passant_possible[0])
         else:
-            fen += '-'
-
-        # Halfmove clock and fullmove number
-        fen += ' 0 1'
-
-        return fen
+            en_passant = '-'
 
+        self.fen_cache = (f"{'/'.join(ranks)} {'w' if self.white_to_move else 'b'} {castling or '-'} "
+                          f"{en_passant} {self.halfmove_clock} {self.fullmove_number}")
+        return self.fen_cache
 
 class Move:
     # slots:  Memory Optimization - Tells Python "this class will ONLY have these specific attributes"
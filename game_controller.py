@@ -0,0 +1,150 @@
+# # game_controller.py
+# UI-independent game flow: whose turn it is, applying human and engine moves (including promotion),
+# undo / restart and game-over detection. main.py drives it from pygame events, headless.py without a display.
+import logging
+import threading
+from chess_board import create_board, find_uci_move, Move, START_FEN
+from pgn import board_to_pgn
+
+logger = logging.getLogger(__name__)
+
+
+# One game: the board, its legal moves and which side (if any) is played by an engine
+class GameController:
+
+    def __init__(self, backend='mailbox', fen=START_FEN, ai_color=None):
+        """ Input:
+                backend: board backend, see chess_board.create_board
+                fen: start position
+                ai_color: 'w' or 'b' for the side played by an engine, None when humans play both sides """
+        self.backend = backend
+        self.start_fen = fen
+        self.ai_color = ai_color
+        self.reset()
+
+    # Start again from the start position
+    def reset(self):
+        self.board = create_board(self.backend, self.start_fen)
+        self.refresh()
+
+    # Regenerate the legal moves after the position changed
+    def refresh(self):
+        self.valid_moves = self.board.get_valid_moves()
+        self.valid_moves_dict = {move.move_id: move for move in self.valid_moves}
+
+    def side_to_move(self):
+        return 'w' if self.board.white_to_move else 'b'
+
+    # True when the side to move is played by the engine
+    def is_ai_turn(self):
+        return self.ai_color == self.side_to_move()
+
+    # Legal move from start to end square ((row, col) tuples), or None
+    def find_move(self, start, end):
+        return self.valid_moves_dict.get(Move(start, end, self.board.board).move_id)
+
+    # Play a legal move; promotion_piece is used when the move is a pawn promotion
+    def make_move(self, move, promotion_piece='Q'):
+        self.board.make_move(move, promotion_piece)
+        self.refresh()
+
+    # Play a move given in UCI notation (e.g. 'e2e4', 'e7e8n'); returns the move, or None if it is not legal
+    def make_uci_move(self, uci):
+        move = find_uci_move(self.board, uci)
+        if move is None:
+            return None
+        self.make_move(move, uci[4].upper() if len(uci) == 5 else 'Q')
+        return move
+
+    # Take back plies half-moves (2 against an engine, so the human is to move again)
+    def undo(self, plies=1):
+        for _ in range(plies):
+            self.board.undo_move()
+        self.refresh()
+
+    # Moves played so far in UCI notation
+    def uci_moves(self):
+        return [move.get_uci_notation() for move in self.board.move_log]
+
+    def is_game_over(self):
+        return self.board.checkmate or self.board.stalemate
+
+    # ('1-0' / '0-1' / '1/2-1/2', reason) once the game is over, ('*', None) while it is running
+    def result(self):
+        if self.board.checkmate:
+            return ('0-1' if self.board.white_to_move else '1-0'), 'checkmate'
+        if self.board.stalemate:
+            return '1/2-1/2', 'stalemate'
+        return '*', None
+
+    # PGN record of the game so far
+    def to_pgn(self, headers=None):
+        return board_to_pgn(self.board, headers, self.result()[0], self.start_fen)
+
+
+# An engine search of a frozen position on a background thread. cancel() ends it early (undo, restart, quit):
+# the player stops at once and the result is dropped, so a stale move can never be played.
+class SearchHandle:
+
+    def __init__(self, player, position, moves=None, generation=0, move_time=1000, on_done=None):
+        """ Input:
+                player: StockfishAI or SearchAI (get_best_move with stop_event, stop_search)
+                position: chess_board.Position snapshot to search
+                moves: UCI moves of the game from the start position (session mode), or None to send only the
+                       snapshot's FEN
+                generation: id of the request, copied to the result so callers can recognise stale ones
+                on_done: called with this handle from the search thread when a search that was not
+                         cancelled finishes (best_move is None if the engine had no legal move) """
+        self.player = player
+        self.position = position
+        self.moves = None if moves is None else tuple(moves)
+        self.generation = generation
+        self.move_time = move_time
+        self.on_done = on_done
+        self.stop_event = threading.Event()
+        self.best_move = None  # UCI move, checked against the snapshot
+        self.thread = threading.Thread(target=self._run, name=f'search-{generation}', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        best_move = None
+        try:
+            fen = self.position.to_fen()
+            logger.debug("Requesting AI move for position: %s", fen)
+            moves = None if self.moves is None else list(self.moves)
+            uci_move = self.player.get_best_move(fen, self.move_time, moves=moves, stop_event=self.stop_event)
+            if self.cancelled():
+                logger.debug("Search %s cancelled", self.generation)
+                return
+            if not uci_move:
+                logger.error("AI returned no move")
+            elif find_uci_move(self.position.to_board(), uci_move) is None:
+                logger.error("AI move %s is not legal in %s", uci_move, fen)
+            else:
+                logger.debug("AI selected move: %s", uci_move)
+                best_move = uci_move
+        except Exception as e:
+            logger.exception("Error in AI search: %s", e)
+        if self.cancelled():
+            return
+        self.best_move = best_move
+        if self.on_done:
+            self.on_done(self)
+
+    # Stop the search; returns at once, the engine answers within milliseconds and the result is discarded
+    def cancel(self):
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        try:
+            self.player.stop_search(self.stop_event)
+        except Exception as e:
+            logger.error("Could not stop search %s: %s", self.generation, e)
+
+    def cancelled(self):
+        return self.stop_event.is_set()
+
+    # Wait for the search thread to end; True if it did within timeout seconds
+    def wait(self, timeout=None):
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
@@ -0,0 +1,140 @@
+# # headless.py
+# Play engine-vs-engine or scripted games without a display (no pygame), e.g. on servers or in batch jobs.
+# Usage: python headless.py --white stockfish --black builtin --level 5 --movetime 100 --games 10
+#        python headless.py --moves e2e4 e7e5 g1f3 --max-plies 3     (scripted game only)
+import argparse
+import logging
+import os
+import sys
+from chess_board import BACKENDS, START_FEN
+from game_controller import GameController
+from search_engine import SearchAI
+from stockfish_player import StockfishAI, find_stockfish
+
+PLAYER_KINDS = ('builtin', 'stockfish')
+MAX_PLIES = 400  # games still running after this many half-moves are adjudicated as draws
+FIFTY_MOVE_PLIES = 100  # halfmove clock value at which the game is drawn by the fifty-move rule
+REPETITION_COUNT = 3  # occurrences of the same position that draw the game
+
+logger = logging.getLogger(__name__)
+
+
+# True when neither side can possibly checkmate: bare kings, or a single knight or bishop against a bare king
+def insufficient_material(board):
+    pieces = [piece[1] for row in board.board for piece in row if piece != '--' and piece[1] != 'K']
+    return not pieces or (len(pieces) == 1 and pieces[0] in 'NB')
+
+
+# Create an engine player: the in-process search engine or a Stockfish process
+def make_player(kind, skill_level, stockfish_path=None):
+    if kind == 'builtin':
+        return SearchAI(skill_level=skill_level)
+    path = stockfish_path or find_stockfish()
+    if not path:
+        raise RuntimeError("Stockfish not found (set STOCKFISH_PATH or pass --stockfish)")
+    player = StockfishAI(path, skill_level)
+    if not player.is_alive():
+        raise RuntimeError(f"Stockfish at {path} could not be started")
+    return player
+
+
+# Position key for threefold repetition: the en-passant square only counts while an en-passant capture is legal
+def repetition_key(game):
+    fields = game.board.get_fen().split()[:4]
+    if fields[3] != '-' and not any(move.is_en_passant for move in game.valid_moves):
+        fields[3] = '-'
+    return ' '.join(fields)
+
+
+# Play one game to the end
+def play_game(players, move_time=100, fen=START_FEN, opening=(), max_plies=MAX_PLIES, backend='mailbox'):
+    """ Input:
+            players: {'w': player, 'b': player}, objects with get_best_move(fen, move_time, moves) like StockfishAI
+            move_time: thinking time per move in milliseconds, or {'w': ms, 'b': ms}
+            fen: start position; opening: UCI moves played before the engines take over
+            max_plies: half-move limit after which the game is drawn
+    Output: (result, reason, game) with result '1-0', '0-1' or '1/2-1/2' and the finished GameController """
+    game = GameController(backend, fen)
+    move_times = move_time if isinstance(move_time, dict) else {'w': move_time, 'b': move_time}
+    for player in players.values():
+        player.new_game()
+    for uci in opening:
+        if game.is_game_over():
+            break
+        if game.make_uci_move(uci) is None:
+            raise ValueError(f"Illegal scripted move {uci} in position {game.board.get_fen()}")
+
+    positions = {}  # repetition_key -> times seen, for threefold repetition
+    while not game.is_game_over():
+        key = repetition_key(game)
+        positions[key] = positions.get(key, 0) + 1
+        if positions[key] >= REPETITION_COUNT:
+            return '1/2-1/2', 'threefold repetition', game
+        if game.board.halfmove_clock >= FIFTY_MOVE_PLIES:
+            return '1/2-1/2', 'fifty-move rule', game
+        if insufficient_material(game.board):
+            return '1/2-1/2', 'insufficient material', game
+        if len(game.board.move_log) >= max_plies:
+            return '1/2-1/2', 'move limit', game
+
+        # Engines get the move list (session mode) when the game started from the standard position
+        side = game.side_to_move()
+        moves = game.uci_moves() if fen == START_FEN else None
+        uci = players[side].get_best_move(game.board.get_fen(), move_times[side], moves=moves)
+        if not uci or game.make_uci_move(uci) is None:
+            logger.error("%s engine returned no legal move (%s) in %s", side, uci, game.board.get_fen())
+            return ('0-1' if side == 'w' else '1-0'), 'no legal move from engine', game
+
+    result, reason = game.result()
+    return result, reason, game
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play chess games without a display')
+    parser.add_argument('--white', choices=PLAYER_KINDS, default='builtin', help='engine playing white')
+    parser.add_argument('--black', choices=PLAYER_KINDS, default='builtin', help='engine playing black')
+    parser.add_argument('--level', type=int, default=3, help='skill level of both engines (0-20)')
+    parser.add_argument('--white-level', type=int, help='skill level of the white engine')
+    parser.add_argument('--black-level', type=int, help='skill level of the black engine')
+    parser.add_argument('--movetime', type=int, default=100, help='thinking time per move in milliseconds')
+    parser.add_argument('--games', type=int, default=1, help='number of games to play')
+    parser.add_argument('--fen', default=START_FEN, help='start position')
+    parser.add_argument('--moves', nargs='*', default=[], help='scripted UCI moves played before the engines')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES, help='draw after this many half-moves')
+    parser.add_argument('--backend', choices=BACKENDS, default='mailbox', help='board backend')
+    parser.add_argument('--stockfish', help='path to the Stockfish executable')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=os.environ.get('CHESS_LOG_LEVEL', 'WARNING').upper(),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    players = {}
+    try:
+        players['w'] = make_player(args.white, args.white_level if args.white_level is not None else args.level,
+                                   args.stockfish)
+        players['b'] = make_player(args.black, args.black_level if args.black_level is not None else args.level,
+                                   args.stockfish)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        for player in players.values():
+            player.close()
+        return 1
+
+    scores = {'1-0': 0, '0-1': 0, '1/2-1/2': 0}
+    try:
+        for number in range(1, args.games + 1):
+            result, reason, game = play_game(players, args.movetime, args.fen, args.moves, args.max_plies,
+                                             args.backend)
+            scores[result] += 1
+            print(f"Game {number}: {result} ({reason}), {len(game.board.move_log)} plies")
+            print(' '.join(game.uci_moves()))
+    finally:
+        for player in players.values():
+            player.close()
+
+    print(f"White wins {scores['1-0']}, black wins {scores['0-1']}, draws {scores['1/2-1/2']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,505 @@
+# # mailbox120.py
+# Integer-coded 10x12 mailbox backend: one byte per square in a flat 120-square bytearray. The board is padded
+# with OFFBOARD sentinels (two rows above and below, one column left and right), so knight jumps and slider rays
+# stop at the border without row / col bound checks. It exposes the same surface as chess_board.ChessBoard
+# (make_move, undo_move, get_valid_moves, get_valid_move_codes, get_fen, ...) and can be selected with
+# chess_board.create_board('mailbox120'). The 8x8 string view used by the UI is built on demand (board property).
+from array import array
+from chess_board import (code_to_move, DIMENSION, logged_move, MOVE_CACHE_SIZE, MOVE_CASTLE,
+                         MOVE_EN_PASSANT, MOVE_FLAGS, MOVE_PROMOTION, MoveCache, Position, PROMOTION_CODE_PIECES,
+                         START_FEN, ZOBRIST_BLACK_TO_MOVE, ZOBRIST_CASTLING, ZOBRIST_EP_FILE, ZOBRIST_PIECES)
+
+# Piece codes: color bit | kind. EMPTY and OFFBOARD have no color bit, so `piece & color` is false for both
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(1, 7)
+KIND_MASK = 7
+WHITE, BLACK = 8, 16
+COLORS = WHITE | BLACK
+OFFBOARD = 32
+PIECE_CODES = {'--': EMPTY}
+PIECE_CODES.update({color_name + kind_name: color | kind
+                    for color_name, color in (('w', WHITE), ('b', BLACK))
+                    for kind_name, kind in zip('PNBRQK', range(PAWN, KING + 1))})
+# PIECE_NAMES[code]: two-character piece string ('--' for EMPTY and OFFBOARD)
+PIECE_NAMES = ['--'] * (OFFBOARD + 1)
+for _name, _code in PIECE_CODES.items():
+    PIECE_NAMES[_code] = _name
+FEN_LETTERS = {code: name[1] if name[0] == 'w' else name[1].lower() for name, code in PIECE_CODES.items() if code}
+# Piece kind for each promotion index of a move code (bits 12-13, see chess_board.PROMOTION_CODE_PIECES)
+PROMOTION_KINDS = tuple(PIECE_CODES['w' + piece] & KIND_MASK for piece in PROMOTION_CODE_PIECES)
+
+KNIGHT_STEPS = (-21, -19, -12, -8, 8, 12, 19, 21)
+KING_STEPS = (-11, -10, -9, -1, 1, 9, 10, 11)
+ROOK_STEPS = (-10, 10, -1, 1)
+BISHOP_STEPS = (-11, -9, 9, 11)
+SLIDER_STEPS = {BISHOP: BISHOP_STEPS, ROOK: ROOK_STEPS, QUEEN: ROOK_STEPS + BISHOP_STEPS}
+
+
+# Index into the 120-square array of (row, col), with row 0 being rank 8 (same orientation as ChessBoard.board)
+def square120(row, col):
+    return 21 + row * 10 + col
+
+
+SQUARES120 = tuple(square120(sq >> 3, sq & 7) for sq in range(64))  # move-code square (row * 8 + col) -> 120
+SQUARES64 = [-1] * 120  # 120 -> move-code square, -1 off the board
+for _sq, _sq120 in enumerate(SQUARES120):
+    SQUARES64[_sq120] = _sq
+SQUARES64 = tuple(SQUARES64)
+
+# Castling: (right, king from, king to, rook from, squares that must be empty, squares the king crosses)
+CASTLES = [
+    ('wK', square120(7, 4), square120(7, 6), square120(7, 7), (square120(7, 5), square120(7, 6)),
+     (square120(7, 5), square120(7, 6))),
+    ('wQ', square120(7, 4), square120(7, 2), square120(7, 0),
+     (square120(7, 1), square120(7, 2), square120(7, 3)), (square120(7, 3), square120(7, 2))),
+    ('bK', square120(0, 4), square120(0, 6), square120(0, 7), (square120(0, 5), square120(0, 6)),
+     (square120(0, 5), square120(0, 6))),
+    ('bQ', square120(0, 4), square120(0, 2), square120(0, 0),
+     (square120(0, 1), square120(0, 2), square120(0, 3)), (square120(0, 3), square120(0, 2))),
+]
+# Castling rights are kept as a bit mask of CASTLE_BITS
+CASTLE_BITS = {'wK': 1, 'wQ': 2, 'bK': 4, 'bQ': 8}
+# Castling rights lost when a piece moves from or to one of these squares
+CASTLE_RIGHTS_SQUARES = {square120(7, 4): ('wK', 'wQ'), square120(7, 7): ('wK',), square120(7, 0): ('wQ',),
+                         square120(0, 4): ('bK', 'bQ'), square120(0, 7): ('bK',), square120(0, 0): ('bQ',)}
+# CASTLE_KEEP[sq]: mask of the rights that survive a move from or to sq
+CASTLE_KEEP = [15] * 120
+for _sq, _rights in CASTLE_RIGHTS_SQUARES.items():
+    CASTLE_KEEP[_sq] = 15 & ~sum(CASTLE_BITS[right] for right in _rights)
+
+# Zobrist keys of chess_board (so all backends hash a position alike), indexed by piece code and 120-square
+ZOBRIST_CODES = [[0] * 120 for _ in range(OFFBOARD + 1)]
+for _name, _code in PIECE_CODES.items():
+    if _code:
+        for _sq, _sq120 in enumerate(SQUARES120):
+            ZOBRIST_CODES[_code][_sq120] = ZOBRIST_PIECES[_name][_sq]
+# ZOBRIST_CASTLE_MASKS[mask]: combined key of the castling rights in mask
+ZOBRIST_CASTLE_MASKS = [0] * 16
+for _mask in range(16):
+    for _right, _bit in CASTLE_BITS.items():
+        if _mask & _bit:
+            ZOBRIST_CASTLE_MASKS[_mask] ^= ZOBRIST_CASTLING[_right]
+
+
+# 8x8 list of two-character piece strings (the ChessBoard.board layout) from a 120-square array
+def board_to_rows(squares):
+    return [[PIECE_NAMES[piece] for piece in squares[21 + r * 10:29 + r * 10]] for r in range(DIMENSION)]
+
+
+# 120-square array from an 8x8 list of two-character piece strings
+def rows_to_board(rows):
+    squares = bytearray([OFFBOARD]) * 120
+    for r, row in enumerate(rows):
+        for c, piece in enumerate(row):
+            squares[square120(r, c)] = PIECE_CODES[piece]
+    return squares
+
+
+class Mailbox120ChessBoard:
+    def __init__(self, fen=START_FEN, cache_size=MOVE_CACHE_SIZE):
+        self.squares = bytearray([OFFBOARD]) * 120
+        self.king_squares = {WHITE: 0, BLACK: 0}
+        self.rows = None  # cached 8x8 string view, None after any change
+        self.white_to_move = True
+        # (code, piece, captured piece, castling, ep_square, halfmove_clock, zobrist_hash) before each move
+        self.history = []
+        self.logged_moves = []  # Move per history entry; None until move_log decodes it
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.checkmate = False
+        self.stalemate = False
+        self.castling = 0  # mask of CASTLE_BITS
+        self.ep_square = 0  # 120-square a pawn may capture en passant on, 0 if none
+        self.zobrist_hash = 0
+        self.move_cache = MoveCache(cache_size)
+        self.load_fen(fen)
+
+    # Set up the position from a FEN string
+    def load_fen(self, fen):
+        fields = fen.split()
+        self.squares = bytearray([OFFBOARD]) * 120
+        for r, rank in enumerate(fields[0].split('/')):
+            c = 0
+            for ch in rank:
+                if ch.isdigit():
+                    for _ in range(int(ch)):
+                        self.squares[square120(r, c)] = EMPTY
+                        c += 1
+                else:
+                    piece = PIECE_CODES[('w' if ch.isupper() else 'b') + ch.upper()]
+                    self.squares[square120(r, c)] = piece
+                    if piece & KIND_MASK == KING:
+                        self.king_squares[piece & COLORS] = square120(r, c)
+                    c += 1
+        self.rows = None
+        self.white_to_move = fields[1] == 'w'
+        castling = fields[2] if len(fields) > 2 else '-'
+        self.castling = sum(bit for right, bit in CASTLE_BITS.items()
+                            if (right[1] if right[0] == 'w' else right[1].lower()) in castling)
+        ep = fields[3] if len(fields) > 3 else '-'
+        self.ep_square = square120(8 - int(ep[1]), ord(ep[0]) - ord('a')) if ep != '-' else 0
+        self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        self.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        self.history = []
+        self.logged_moves = []
+        self.checkmate = False
+        self.stalemate = False
+        self.zobrist_hash = self.compute_hash()
+
+    # Full Zobrist hash of the current position (make_move_code / undo_move keep self.zobrist_hash up to date)
+    def compute_hash(self):
+        h = 0
+        for sq in SQUARES120:
+            h ^= ZOBRIST_CODES[self.squares[sq]][sq]
+        if not self.white_to_move:
+            h ^= ZOBRIST_BLACK_TO_MOVE
+        h ^= ZOBRIST_CASTLE_MASKS[self.castling]
+        if self.ep_square:
+            h ^= ZOBRIST_EP_FILE[self.ep_square % 10 - 1]
+        return h
+
+    # 8x8 string view for the UI, Move objects and evaluation (read-only; rebuilt after the position changes)
+    @property
+    def board(self):
+        if self.rows is None:
+            self.rows = board_to_rows(self.squares)
+        return self.rows
+
+    # Moves played so far as Move objects (read-only); moves made from codes are decoded here, on demand
+    @property
+    def move_log(self):
+        logged = self.logged_moves
+        for i, move in enumerate(logged):
+            if move is None:
+                code, piece, captured = self.history[i][:3]
+                logged[i] = logged_move(code, PIECE_NAMES[piece], PIECE_NAMES[captured])
+        return logged
+
+    @property
+    def castling_rights(self):
+        return {right: bool(self.castling & bit) for right, bit in CASTLE_BITS.items()}
+
+    @property
+    def en_passant_possible(self):
+        return divmod(SQUARES64[self.ep_square], 8) if self.ep_square else ()
+
+    @property
+    def white_king_pos(self):
+        return divmod(SQUARES64[self.king_squares[WHITE]], 8)
+
+    @property
+    def black_king_pos(self):
+        return divmod(SQUARES64[self.king_squares[BLACK]], 8)
+
+    # Immutable copy of the current position (see chess_board.Position)
+    def snapshot(self):
+        return Position.from_board(self)
+
+    # Make a Move object (e.g. from the UI); it is logged as given, with its promotion piece set
+    def make_move(self, move, promotion_piece='Q'):
+        code = move.start_row * 8 + move.start_col | (move.end_row * 8 + move.end_col) << 6
+        if move.is_en_passant:
+            code |= MOVE_EN_PASSANT
+        elif move.is_castle:
+            code |= MOVE_CASTLE
+        elif move.is_pawn_promotion:
+            code |= MOVE_PROMOTION | PROMOTION_CODE_PIECES.index(promotion_piece) << 12
+            move.promotion_piece = promotion_piece  # Store what it was promoted to
+        self.make_move_code(code, move)
+
+    # Make a move given as a code, straight on the 120-square array; a promotion uses the piece stored in the code
+    def make_move_code(self, code, move=None):
+        squares = self.squares
+        keys = ZOBRIST_CODES
+        start = SQUARES120[code & 63]
+        end = SQUARES120[code >> 6 & 63]
+        piece = squares[start]
+        captured = squares[end]
+        color = piece & COLORS
+        self.history.append((code, piece, captured, self.castling, self.ep_square, self.halfmove_clock,
+                             self.zobrist_hash))
+        self.logged_moves.append(move)
+        h = self.zobrist_hash ^ ZOBRIST_BLACK_TO_MOVE ^ keys[piece][start] ^ keys[captured][end]
+
+        squares[start] = EMPTY
+        if code >= MOVE_PROMOTION:
+            promoted = color | PROMOTION_KINDS[code >> 12 & 3]
+            squares[end] = promoted
+            h ^= keys[promoted][end]
+        else:
+            squares[end] = piece
+            h ^= keys[piece][end]
+            flags = code & MOVE_FLAGS
+            if flags == MOVE_EN_PASSANT:
+                victim = end + 10 if color == WHITE else end - 10
+                h ^= keys[squares[victim]][victim]
+                squares[victim] = EMPTY
+            elif flags == MOVE_CASTLE:
+                rook_from, rook_to = (end + 1, end - 1) if end > start else (end - 2, end + 1)
+                rook = squares[rook_from]
+                squares[rook_to] = rook
+                squares[rook_from] = EMPTY
+                h ^= keys[rook][rook_from] ^ keys[rook][rook_to]
+            if piece & KIND_MASK == KING:
+                self.king_squares[color] = end
+
+        if self.ep_square:
+            h ^= ZOBRIST_EP_FILE[self.ep_square % 10 - 1]
+        if piece & KIND_MASK == PAWN:
+            self.halfmove_clock = 0
+            if end - start == 20 or start - end == 20:
+                self.ep_square = (start + end) >> 1
+                h ^= ZOBRIST_EP_FILE[self.ep_square % 10 - 1]
+            else:
+                self.ep_square = 0
+        else:
+            self.halfmove_clock = 0 if captured else self.halfmove_clock + 1
+            self.ep_square = 0
+
+        castling = self.castling & CASTLE_KEEP[start] & CASTLE_KEEP[end]
+        if castling != self.castling:
+            h ^= ZOBRIST_CASTLE_MASKS[castling ^ self.castling]
+            self.castling = castling
+        if color == BLACK:
+            self.fullmove_number += 1
+
+        self.zobrist_hash = h
+        self.rows = None
+        self.white_to_move = not self.white_to_move
+
+    def undo_move(self):
+        if len(self.history) != 0:
+            code, piece, captured, self.castling, self.ep_square, self.halfmove_clock, self.zobrist_hash = \
+                self.history.pop()
+            self.logged_moves.pop()
+            squares = self.squares
+            start = SQUARES120[code & 63]
+            end = SQUARES120[code >> 6 & 63]
+            color = piece & COLORS
+            if color == BLACK:
+                self.fullmove_number -= 1
+
+            squares[start] = piece
+            squares[end] = captured
+            if code < MOVE_PROMOTION:
+                flags = code & MOVE_FLAGS
+                if flags == MOVE_EN_PASSANT:
+                    squares[end + 10 if color == WHITE else end - 10] = (color ^ COLORS) | PAWN
+                elif flags == MOVE_CASTLE:
+                    rook_from, rook_to = (end + 1, end - 1) if end > start else (end - 2, end + 1)
+                    squares[rook_from] = squares[rook_to]
+                    squares[rook_to] = EMPTY
+                if piece & KIND_MASK == KING:
+                    self.king_squares[color] = start
+
+            self.rows = None
+            self.white_to_move = not self.white_to_move
+            self.checkmate = False
+            self.stalemate = False
+
+    # True if the 120-square sq is attacked by the given color (WHITE or BLACK)
+    def _is_attacked(self, sq, by):
+        squares = self.squares
+        pawn = by | PAWN
+        if by == WHITE:
+            if squares[sq + 9] == pawn or squares[sq + 11] == pawn:
+                return True
+        elif squares[sq - 9] == pawn or squares[sq - 11] == pawn:
+            return True
+        knight = by | KNIGHT
+        for step in KNIGHT_STEPS:
+            if squares[sq + step] == knight:
+                return True
+        king = by | KING
+        for step in KING_STEPS:
+            if squares[sq + step] == king:
+                return True
+        rook, bishop, queen = by | ROOK, by | BISHOP, by | QUEEN
+        for step in ROOK_STEPS:
+            target = sq + step
+            while squares[target] == EMPTY:
+                target += step
+            if squares[target] == rook or squares[target] == queen:
+                return True
+        for step in BISHOP_STEPS:
+            target = sq + step
+            while squares[target] == EMPTY:
+                target += step
+            if squares[target] == bishop or squares[target] == queen:
+                return True
+        return False
+
+    # 120-square indices of our pieces pinned to our king on king_sq
+    def _pinned_squares(self, king_sq, us, them):
+        squares = self.squares
+        pinned = set()
+        for steps, slider in ((ROOK_STEPS, them | ROOK), (BISHOP_STEPS, them | BISHOP)):
+            queen = them | QUEEN
+            for step in steps:
+                target = king_sq + step
+                while squares[target] == EMPTY:
+                    target += step
+                if not squares[target] & us:
+                    continue
+                blocker = target
+                target += step
+                while squares[target] == EMPTY:
+                    target += step
+                if squares[target] == slider or squares[target] == queen:
+                    pinned.add(blocker)
+        return pinned
+
+    def square_attacked_by(self, row, col, attacking_color):
+        return self._is_attacked(square120(row, col), WHITE if attacking_color == 'w' else BLACK)
+
+    def in_check(self):
+        us = WHITE if self.white_to_move else BLACK
+        return self._is_attacked(self.king_squares[us], us ^ COLORS)
+
+    # Legal moves as Move objects, decoded from get_valid_move_codes
+    def get_valid_moves(self):
+        board = self.board
+        return [code_to_move(code, board) for code in self.get_valid_move_codes()]
+
+    # Legal moves as compact codes (see chess_board.MOVE_FLAGS); positions seen before come from the cache
+    def get_valid_move_codes(self):
+        cached = self.move_cache.get(self.zobrist_hash)
+        if cached is not None:
+            valid_moves, self.checkmate, self.stalemate = cached
+            return valid_moves
+
+        valid_moves, in_check = self.get_legal_moves()
+        if len(valid_moves) == 0:
+            if in_check:
+                self.checkmate = True
+            else:
+                self.stalemate = True
+        else:
+            self.checkmate = False
+            self.stalemate = False
+        self.move_cache.put(self.zobrist_hash, (valid_moves, self.checkmate, self.stalemate))
+        return valid_moves
+
+    # Generate legal moves. Out of check, a move by an unpinned piece other than the king (and not en passant)
+    # cannot expose the king, so it is kept directly; everything else is tried on the board and taken back
+    def get_legal_moves(self):
+        """ Output:
+        moves: array('H') of legal move codes for the side to move
+        in_check: True if the side to move is in check """
+        squares = self.squares
+        us = WHITE if self.white_to_move else BLACK
+        them = us ^ COLORS
+        king_sq = self.king_squares[us]
+        to64 = SQUARES64
+        ep_sq = self.ep_square
+        if us == WHITE:
+            forward, captures, double_rows, promotion_rows = -10, (-11, -9), (81, 88), (21, 28)
+        else:
+            forward, captures, double_rows, promotion_rows = 10, (9, 11), (31, 38), (91, 98)
+        in_check = self._is_attacked(king_sq, them)
+        pinned = self._pinned_squares(king_sq, us, them)
+        valid_moves = array('H')
+        candidates = array('H')  # moves that need the on-board test
+
+        for sq in range(21, 99):
+            piece = squares[sq]
+            if not piece & us:
+                continue
+            kind = piece & KIND_MASK
+            start = to64[sq]
+            add = candidates.append if in_check or kind == KING or sq in pinned else valid_moves.append
+            if kind == PAWN:
+                one = sq + forward
+                flags = MOVE_PROMOTION if promotion_rows[0] <= one <= promotion_rows[1] else 0
+                if squares[one] == EMPTY:
+                    add(start | to64[one] << 6 | flags)
+                    two = one + forward
+                    if double_rows[0] <= sq <= double_rows[1] and squares[two] == EMPTY:
+                        add(start | to64[two] << 6)
+                for step in captures:
+                    target = sq + step
+                    if squares[target] & them:
+                        add(start | to64[target] << 6 | flags)
+                    elif target == ep_sq:
+                        candidates.append(start | to64[target] << 6 | MOVE_EN_PASSANT)
+            elif kind == KNIGHT or kind == KING:
+                for step in KNIGHT_STEPS if kind == KNIGHT else KING_STEPS:
+                    target = sq + step
+                    if squares[target] == EMPTY or squares[target] & them:
+                        add(start | to64[target] << 6)
+            else:
+                for step in SLIDER_STEPS[kind]:
+                    target = sq + step
+                    while squares[target] == EMPTY:
+                        add(start | to64[target] << 6)
+                        target += step
+                    if squares[target] & them:
+                        add(start | to64[target] << 6)
+
+        for code in candidates:
+            from_sq = SQUARES120[code & 63]
+            to_sq = SQUARES120[code >> 6 & 63]
+            piece, captured = squares[from_sq], squares[to_sq]
+            squares[to_sq] = piece
+            squares[from_sq] = EMPTY
+            if code & MOVE_FLAGS == MOVE_EN_PASSANT:
+                squares[to_sq - forward] = EMPTY
+            legal = not self._is_attacked(to_sq if from_sq == king_sq else king_sq, them)
+            if code & MOVE_FLAGS == MOVE_EN_PASSANT:
+                squares[to_sq - forward] = them | PAWN
+            squares[from_sq] = piece
+            squares[to_sq] = captured
+            if legal:
+                valid_moves.append(code)
+
+        # Castling
+        if not in_check:
+            color = 'w' if us == WHITE else 'b'
+            for right, king_from, king_to, rook_from, empty, crossed in CASTLES:
+                if right[0] != color or not self.castling & CASTLE_BITS[right] or king_sq != king_from:
+                    continue
+                if squares[rook_from] != us | ROOK:
+                    continue
+                if any(squares[sq] != EMPTY for sq in empty):
+                    continue
+                if any(self._is_attacked(sq, them) for sq in crossed):
+                    continue
+                valid_moves.append(to64[king_from] | to64[king_to] << 6 | MOVE_CASTLE)
+
+        return valid_moves, in_check
+
+    # Board as text, one rank per line
+    def board_string(self):
+        return '\n'.join(' ' + ''.join('[ ' + piece + ']' for piece in row) for row in self.board)
+
+    def print_board(self):
+        print(' ')
+        print(self.board_string())
+
+    # Convert current board position to FEN notation (read straight from the 120-square array)
+    def get_fen(self):
+        squares = self.squares
+        ranks = []
+        for r in range(DIMENSION):
+            rank = ''
+            empty = 0
+            for piece in squares[21 + r * 10:29 + r * 10]:
+                if piece == EMPTY:
+                    empty += 1
+                    continue
+                if empty > 0:
+                    rank += str(empty)
+                    empty = 0
+                rank += FEN_LETTERS[piece]
+            if empty > 0:
+                rank += str(empty)
+            ranks.append(rank)
+
+        castling = ''.join(flag for right, flag in (('wK', 'K'), ('wQ', 'Q'), ('bK', 'k'), ('bQ', 'q'))
+                           if self.castling & CASTLE_BITS[right])
+        if self.en_passant_possible:
+            ep = chr(ord('a') + self.en_passant_possible[1]) + str(8 - self.en_passant_possible[0])
+        else:
+            ep = '-'
+        return (f"{'/'.join(ranks)} {'w' if self.white_to_move else 'b'} {castling or '-'} {ep} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
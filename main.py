@@ -1,17 +1,29 @@
+import logging
+import os
 import pygame
 import sys
-import threading
 from promotion_menu import PromotionMenu
-from chess_board import ChessBoard, Move
-from stockfish_player import StockfishAI, find_stockfish
+from game_controller import GameController, SearchHandle
+from stockfish_player import EnginePrewarm
+from search_engine import SearchAI
 from menu import show_menu
+from ui_cache import get_board_background, get_highlight, get_text
 
 
 # Constants
 WIDTH, HEIGHT = 640, 640
 DIMENSION = 8
 SQ_SIZE = WIDTH // DIMENSION
-MAX_FPS = 15
+EVENT_TIMEOUT_MS = 1000  # the main loop sleeps in pygame.event.wait and wakes up at least this often
+AI_MOVE_EVENT = pygame.USEREVENT + 1  # posted by the AI worker thread: move (UCI or None), position, generation
+BOARD_BACKEND = 'attackmap'  # 'mailbox', 'bitboard', 'mailbox120' or 'attackmap', see chess_board.create_board
+BUILTIN_AI_MAX_LEVEL = 3  # difficulty levels up to this use the in-process search engine instead of Stockfish
+PONDER_MIN_LEVEL = 10  # from this level Stockfish keeps thinking during the human's turn
+SAVED_GAMES_FILE = 'games.pgn'  # the S key appends the current game here
+
+LOG_LEVEL_ENV_VAR = 'CHESS_LOG_LEVEL'  # e.g. DEBUG to see every UCI line and the board after each move
+
+logger = logging.getLogger(__name__)
 
 # Colors
 WHITE = (240, 217, 181)
@@ -31,6 +43,18 @@ image_names = {
 }
 
 
+# Configure logging: quiet (warnings and errors only) unless CHESS_LOG_LEVEL asks for more
+def setup_logging():
+    logging.basicConfig(level=os.environ.get(LOG_LEVEL_ENV_VAR, 'WARNING').upper(),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+
+# Log the board after a move (only rendered when debug logging is enabled)
+def log_board(game_state):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Board:\n%s", game_state.board_string())
+
+
 # Load chess piece images into IMAGES dictionary
 def load_images():
     for piece, img_name in image_names.items():
@@ -38,219 +62,282 @@ def load_images():
         IMAGES[piece] = img
 
 
-# Draw the chess board squares
-def draw_board(screen):
-    colors = [WHITE, BLACK]
-    for r in range(DIMENSION):
-        for c in range(DIMENSION):
-            color = colors[(r + c) % 2]
-            pygame.draw.rect(screen, color, pygame.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+# Highlight flags of a square, drawn in this order below the piece
+MARK_LAST_MOVE = 1
+MARK_CHECK = 2
+MARK_SELECTED = 4
+MARK_TARGET = 8
 
 
-# Draw chess pieces on the board
-def draw_pieces(screen, board):
-    for r in range(DIMENSION):
-        for c in range(DIMENSION):
-            piece = board[r][c]
-            if piece != '--':
-                screen.blit(IMAGES[piece], (c * SQ_SIZE + SQ_SIZE // 6, r * SQ_SIZE + SQ_SIZE // 6))
+# Fill a square with a semi-transparent color
+def highlight_square(screen, r, c, color, alpha):
+    screen.blit(get_highlight(SQ_SIZE, SQ_SIZE, color, alpha), (c * SQ_SIZE, r * SQ_SIZE))
 
 
-# Highlights the king's square in red when in check
-def highlight_check(screen, game_state):
-    if game_state.in_check():
-        if game_state.white_to_move:
-            king_row, king_col = game_state.white_king_pos
-        else:
-            king_row, king_col = game_state.black_king_pos
-        s = pygame.Surface((SQ_SIZE, SQ_SIZE))
-        s.set_alpha(150)  # Semi-transparent
-        s.fill(CHECK_HIGHLIGHT)
-        screen.blit(s, (king_col * SQ_SIZE, king_row * SQ_SIZE))
+# Draw one square: background color (copied from the prerendered board), highlights and piece
+def draw_square(screen, r, c, piece, marks):
+    square = pygame.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE)
+    screen.blit(get_board_background(SQ_SIZE, DIMENSION, WHITE, BLACK), square, square)
+    if marks & MARK_LAST_MOVE:
+        highlight_square(screen, r, c, MOVE_HIGHLIGHT, 150)
+    if marks & MARK_CHECK:
+        highlight_square(screen, r, c, CHECK_HIGHLIGHT, 150)  # Red king square when in check
+    if marks & MARK_SELECTED:
+        highlight_square(screen, r, c, SELECT, 100)
+    if marks & MARK_TARGET:
+        highlight_square(screen, r, c, HIGHLIGHT, 100)
+    if piece != '--':
+        screen.blit(IMAGES[piece], (c * SQ_SIZE + SQ_SIZE // 6, r * SQ_SIZE + SQ_SIZE // 6))
 
 
-# Highlights last move's squares
-def highlight_last_move(screen, ai_last_move_locs):
+# Highlight flags of every square: last AI move, king in check, selected square and its move destinations
+def get_square_marks(game_state, valid_moves, selected_sq, ai_last_move_locs):
+    marks = [[0] * DIMENSION for _ in range(DIMENSION)]
     if ai_last_move_locs:
-        s = pygame.Surface((SQ_SIZE, SQ_SIZE))
-        s.set_alpha(150)  # Semi-transparent
-        s.fill(MOVE_HIGHLIGHT)
-        screen.blit(s, (ai_last_move_locs['start_col'] * SQ_SIZE, ai_last_move_locs['start_row'] * SQ_SIZE))
-        screen.blit(s, (ai_last_move_locs['end_col'] * SQ_SIZE, ai_last_move_locs['end_row'] * SQ_SIZE))
-
-
-# Highlight selected square and valid move destinations
-def highlight_squares(screen, game_state, valid_moves, selected_sq):
+        marks[ai_last_move_locs['start_row']][ai_last_move_locs['start_col']] |= MARK_LAST_MOVE
+        marks[ai_last_move_locs['end_row']][ai_last_move_locs['end_col']] |= MARK_LAST_MOVE
+    if game_state.in_check():
+        king_row, king_col = game_state.white_king_pos if game_state.white_to_move else game_state.black_king_pos
+        marks[king_row][king_col] |= MARK_CHECK
     if selected_sq != ():
         r, c = selected_sq
         if game_state.board[r][c][0] == ('w' if game_state.white_to_move else 'b'):
-            s = pygame.Surface((SQ_SIZE, SQ_SIZE))
-            s.set_alpha(100)
-            s.fill(SELECT)
-            screen.blit(s, (c * SQ_SIZE, r * SQ_SIZE))
-            s.fill(HIGHLIGHT)
+            marks[r][c] |= MARK_SELECTED
             for move in valid_moves:
                 if move.start_row == r and move.start_col == c:
-                    screen.blit(s, (move.end_col * SQ_SIZE, move.end_row * SQ_SIZE))
-
-
-# Draw complete game state: board, highlights, and pieces
-def draw_game_state(screen, game_state, valid_moves, selected_sq, ai_last_move_locs):
-    draw_board(screen)
-    highlight_last_move(screen, ai_last_move_locs)
-    highlight_check(screen, game_state)  # NEW: Highlight king if in check
-    highlight_squares(screen, game_state, valid_moves, selected_sq)
-    draw_pieces(screen, game_state.board)
-
-
-# Draw centered text on screen (for game over messages)
-def draw_text(screen, text):
-    font = pygame.font.SysFont('Arial', 32, True, False)
-    text_object = font.render(text, True, pygame.Color('Black'))
+                    marks[move.end_row][move.end_col] |= MARK_TARGET
+    return marks
+
+
+# Board squares covered by a screen rectangle
+def squares_under(rect):
+    rect = rect.clip(pygame.Rect(0, 0, WIDTH, HEIGHT))
+    if rect.width <= 0 or rect.height <= 0:
+        return set()
+    return {(r, c) for r in range(rect.top // SQ_SIZE, (rect.bottom - 1) // SQ_SIZE + 1)
+            for c in range(rect.left // SQ_SIZE, (rect.right - 1) // SQ_SIZE + 1)}
+
+
+# Dirty-rectangle renderer: remembers what each square and overlay looked like when last drawn,
+# and redraws and pushes to the display only the parts that changed
+class BoardRenderer:
+
+    def __init__(self):
+        self.squares = None  # (piece, marks) per square as last drawn, None forces a full redraw
+        self.overlays = {}  # name -> (key, rect) of each overlay as last drawn
+
+    # Redraw everything on the next frame (e.g. after the window was uncovered)
+    def invalidate(self):
+        self.squares = None
+
+    def render(self, screen, board, marks, overlays):
+        """ Input:
+                board: 8x8 pieces, marks: 8x8 highlight flags (see get_square_marks)
+                overlays: list of (name, key, rect, draw) drawn in order on top of the board; draw(screen) paints
+                          the overlay, key is any value that changes whenever its appearance changes
+        Output: list of rectangles updated on the display """
+        squares = [[(board[r][c], marks[r][c]) for c in range(DIMENSION)] for r in range(DIMENSION)]
+        if self.squares is None:
+            dirty = {(r, c) for r in range(DIMENSION) for c in range(DIMENSION)}
+        else:
+            dirty = {(r, c) for r in range(DIMENSION) for c in range(DIMENSION)
+                     if squares[r][c] != self.squares[r][c]}
+
+        # Squares below an overlay that appeared, disappeared, moved or changed are repainted first
+        current = {name: (key, rect) for name, key, rect, _ in overlays}
+        for name in set(current) | set(self.overlays):
+            if current.get(name) != self.overlays.get(name):
+                for key_rect in (current.get(name), self.overlays.get(name)):
+                    if key_rect:
+                        dirty |= squares_under(key_rect[1])
+
+        rects = []
+        for r, c in dirty:
+            draw_square(screen, r, c, squares[r][c][0], squares[r][c][1])
+            rects.append(pygame.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+
+        # Every overlay touching a repainted area is drawn again, keeping the stacking order
+        for name, key, rect, draw in overlays:
+            if rect.collidelist(rects) != -1:
+                draw(screen)
+                rects.append(rect)
+
+        self.squares = squares
+        self.overlays = current
+        if rects:
+            pygame.display.update(rects)
+        return rects
+
+
+# Overlay drawing a prerendered surface at a position
+def surface_overlay(name, key, surface, pos):
+    rect = surface.get_rect(topleft=pos)
+    return name, key, rect, lambda screen: screen.blit(surface, rect)
+
+
+# Overlay with centered text (for game over messages)
+def text_overlay(text):
+    text_object = get_text(text, 'Black', 'Arial', 32, True)
     Xloc = int(WIDTH * 0.22)
     Yloc = HEIGHT / 2 - text_object.get_height() / 2
     text_location = pygame.Rect(0, 0, int(WIDTH*0.56), int(HEIGHT*0.06)).move(Xloc, Yloc)
-    screen.fill(pygame.Color('White'), text_location)
-    screen.blit(text_object, text_location)
 
-
-# Initialize Stockfish AI if in AI mode
-def load_ai(game_mode, difficulty_level):
+    def draw(screen):
+        screen.fill(pygame.Color('White'), text_location)
+        screen.blit(text_object, text_location)
+    return 'text', text, text_location.union(text_object.get_rect(topleft=text_location.topleft)), draw
+
+
+# Draw the game screen through the dirty-rectangle renderer
+# promotion_menu: open PromotionMenu or None; difficulty_level: shown with the turn info when playing the AI, or None
+def render_frame(screen, renderer, game_state, valid_moves, selected_sq, ai_last_move_locs, promotion_menu,
+                 difficulty_level, human_turn, ai_thinking):
+    overlays = []
+    if promotion_menu:
+        overlays.append(('promotion', promotion_menu.get_hover_index(pygame.mouse.get_pos()),
+                         promotion_menu.get_rect(), lambda surface: promotion_menu.draw(surface, IMAGES)))
+
+    # Show AI info if playing against AI
+    if difficulty_level is not None:
+        # Show difficulty level
+        if difficulty_level <= 5:
+            diff_desc = "Beginner"
+        elif difficulty_level <= 10:
+            diff_desc = "Intermediate"
+        elif difficulty_level <= 15:
+            diff_desc = "Advanced"
+        else:
+            diff_desc = "Expert"
+
+        # place AI difficulty level at bottom left corner
+        diff_label = f"AI: Level {difficulty_level} ({diff_desc})"
+        diff_text = get_text(diff_label, 'DarkBlue', 'Arial', 16, True)
+        overlays.append(surface_overlay('ai_level', diff_label, diff_text, (10, HEIGHT - 18)))
+
+        # Show whose turn it is (bottom right corner)
+        turn_text = "Your turn" if human_turn else "AI's turn"
+        turn_color = 'DarkGreen' if human_turn else 'DarkRed'
+        turn_surf = get_text(turn_text, turn_color, 'Arial', 16, True)
+        overlays.append(surface_overlay('ai_turn', turn_text, turn_surf,
+                                        (WIDTH - turn_surf.get_width() - 10, HEIGHT - 18)))
+
+    if ai_thinking and not promotion_menu:
+        thinking_text = get_text("AI is thinking...", 'Red', 'Arial', 24, True)
+        overlays.append(surface_overlay('thinking', None, thinking_text, (10, 10)))
+
+    # is game over?
+    if game_state.checkmate:
+        winner = 'Black' if game_state.white_to_move else 'White'
+        overlays.append(text_overlay(f'   {winner} wins by checkmate'))
+    elif game_state.stalemate:
+        overlays.append(text_overlay('                Stalemate'))
+
+    marks = get_square_marks(game_state, valid_moves, selected_sq, ai_last_move_locs)
+    renderer.render(screen, game_state.board, marks, overlays)
+
+
+# Initialize the AI if in AI mode: the built-in search engine for low levels or when Stockfish is unavailable
+# prewarm: EnginePrewarm that may already have started Stockfish while the menu was shown
+def load_ai(game_mode, difficulty_level, prewarm=None):
     ai = None
 
     if game_mode == 'ai':
-        stockfish_path = find_stockfish()
-
-        if stockfish_path:
-            print(f"\nAttempting to initialize Stockfish from: {stockfish_path}")
-            print(f"Selected difficulty: Level {difficulty_level}")
-            ai = StockfishAI(stockfish_path, skill_level=difficulty_level)
-
-            if ai.engine is None:
-                game_mode = 'friend'
-                ai = None
-        else:
-            game_mode = 'friend'
+        if difficulty_level <= BUILTIN_AI_MAX_LEVEL:
+            if prewarm:
+                prewarm.discard()
+            logger.info("Using built-in search engine for difficulty level %s", difficulty_level)
+            return SearchAI(skill_level=difficulty_level), game_mode
+
+        logger.info("Selected difficulty: Level %s", difficulty_level)
+        ai = (prewarm or EnginePrewarm()).result()
+        if ai and not ai.configure(skill_level=difficulty_level, ponder=difficulty_level >= PONDER_MIN_LEVEL):
+            ai.close()
+            ai = None
+
+        if ai is None:
+            logger.warning("Stockfish unavailable: using built-in search engine")
+            ai = SearchAI(skill_level=difficulty_level)
+    elif prewarm:
+        prewarm.discard()
     return ai, game_mode
 
 
-# Convert UCI move format to game Move object
-def uci_to_move(uci_move, game_state, valid_moves):
-    if len(uci_move) < 4:
-        return None
-
-    start_file = ord(uci_move[0]) - ord('a')
-    start_rank = 8 - int(uci_move[1])
-    end_file = ord(uci_move[2]) - ord('a')
-    end_rank = 8 - int(uci_move[3])
-
-    for move in valid_moves:
-        if (move.start_row == start_rank and move.start_col == start_file and
-                move.end_row == end_rank and move.end_col == end_file):
-            if len(uci_move) == 5:
-                move.promotion_piece = uci_move[4].upper()
-            return move
-
-    return None
-
-
 def main():
+    setup_logging()
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption('Chess')
     load_images()
-    clock = pygame.time.Clock()
     screen.fill(pygame.Color('white'))
 
-    game_state = ChessBoard()
-    valid_moves = game_state.get_valid_moves()
-    valid_moves_dict = {move.move_id: move for move in valid_moves}
-    move_made = False
-
     selected_sq = ()
     player_clicks = []
-    game_over = False
     awaiting_promotion = False
     promotion_menu = None
     pending_move = None
 
     # get human's input
-    game_mode, player_color, difficulty_level = show_menu(screen, WIDTH)
+    # Stockfish is found and started in the background as soon as "Play vs AI" is clicked
+    prewarm = EnginePrewarm()
+    game_mode, player_color, difficulty_level = show_menu(screen, WIDTH, on_ai_selected=prewarm.start)
 
     # init AI configurations
-    ai, game_mode = load_ai(game_mode, difficulty_level)
+    ai, game_mode = load_ai(game_mode, difficulty_level, prewarm)
+    ai_color = ('b' if player_color == 'white' else 'w') if game_mode == 'ai' and ai else None
+    game = GameController(BOARD_BACKEND, ai_color=ai_color)
     ai_thinking = False
-    ai_move = None
+    ai_generation = 0  # incremented by every AI request, undo and restart; older AI results are ignored
+    ai_search = None  # SearchHandle of the running AI search
     ai_last_move_locs = None
-    ai_thread = None
-    ai_lock = threading.Lock()  # IMPROVEMENT: Add thread safety
+    renderer = BoardRenderer()
 
     running = True
     while running:
-        human_turn = True
-        if game_mode == 'ai' and ai:
-            if player_color == 'white':
-                human_turn = game_state.white_to_move
-            else:
-                human_turn = not game_state.white_to_move
-
-        if game_mode == 'ai' and ai and not human_turn and not game_over and not ai_thinking and not awaiting_promotion:
-            ai_thinking = True
-
-            # Inner function to get AI move in separate thread
-            def get_ai_move():
-                nonlocal ai_move, ai_last_move_locs
-                try:  # IMPROVEMENT: Add error handling
-                    fen = game_state.get_fen()
-                    print(f"\nRequesting AI move for position: {fen[:50]}...")
-                    uci_move = ai.get_best_move(fen, move_time=1000)
-                    if uci_move:
-                        print(f"AI selected move: {uci_move}")
-                        with ai_lock:  # IMPROVEMENT: Thread-safe access
-                            ai_move = uci_to_move(uci_move, game_state, valid_moves)
-                        if ai_move:
-                            print("AI move was validated")
-                            ai_last_move_locs = ai_move.get_move_locs()  # save move's data to highlight squares
-                        else:
-                            print(f"Error: Could not convert UCI move to game move")
-                    else:
-                        print("Error: AI returned None")
-                except Exception as e:
-                    print(f"Error in AI thread: {e}")
-                    with ai_lock:
-                        ai_move = None
-            ai_thread = threading.Thread(target=get_ai_move)
-            ai_thread.daemon = True
-            ai_thread.start()
-
-        # AI thinking process
-        if ai_thinking and ai_thread and not ai_thread.is_alive():
-            with ai_lock:
-                if ai_move and not awaiting_promotion:
-                    if ai_move.is_pawn_promotion:
-                        game_state.make_move(ai_move, 'Q')
-                    else:
-                        game_state.make_move(ai_move)
-                    move_made = True
-                    ai_move = None
-                    game_state.print_board()
-                ai_thinking = False
+        human_turn = not game.is_ai_turn()
+        game_over = game.is_game_over()
 
-        # human's move
-        for e in pygame.event.get():
+        if not human_turn and not game_over and not ai_thinking and not awaiting_promotion:
+            ai_thinking = True
+            ai_generation += 1
+
+            # Search a snapshot of the position on a background thread; the result is posted as an AI_MOVE_EVENT
+            def post_ai_move(search):
+                pygame.event.post(pygame.event.Event(AI_MOVE_EVENT, move=search.best_move, position=search.position,
+                                                     generation=search.generation))
+            ai_search = SearchHandle(ai, game.board.snapshot(), game.uci_moves(), ai_generation,
+                                     move_time=1000, on_done=post_ai_move)
+
+        # Draw only what changed since the last wake-up
+        render_frame(screen, renderer, game.board, game.valid_moves, selected_sq, ai_last_move_locs,
+                     promotion_menu if awaiting_promotion else None,
+                     difficulty_level if ai_color else None, human_turn, ai_thinking)
+
+        # Sleep until something happens: input, window events or the AI worker finishing
+        events = [pygame.event.wait(EVENT_TIMEOUT_MS)] + pygame.event.get()
+        for e in events:
             if e.type == pygame.QUIT:
                 running = False
+            elif e.type == AI_MOVE_EVENT:  # AI thinking process finished
+                if e.generation != ai_generation:
+                    continue  # result of a search started before an undo or restart
+                ai_thinking = False
+                if e.move and not awaiting_promotion and e.position == game.board.snapshot():
+                    ai_move = game.make_uci_move(e.move)
+                    if ai_move:
+                        ai_last_move_locs = ai_move.get_move_locs()  # save move's data to highlight squares
+                        log_board(game.board)
+            elif e.type == pygame.VIDEOEXPOSE:  # window contents were lost, repaint everything
+                renderer.invalidate()
             elif e.type == pygame.MOUSEBUTTONDOWN:
                 location = pygame.mouse.get_pos()
                 if awaiting_promotion:
                     chosen_piece = promotion_menu.handle_click(location)
                     if chosen_piece:
-                        game_state.make_move(pending_move, chosen_piece)
-                        move_made = True
+                        game.make_move(pending_move, chosen_piece)
                         awaiting_promotion = False
                         promotion_menu = None
                         pending_move = None
-                        game_state.print_board()
+                        log_board(game.board)
                         ai_last_move_locs = None
 
                 elif not game_over and human_turn and not ai_thinking:  # human's move
@@ -265,105 +352,58 @@ def main():
                         player_clicks.append(selected_sq)
 
                     if len(player_clicks) == 2:  # user may commited a move
-                        move = Move(player_clicks[0], player_clicks[1], game_state.board)
-                        if move.move_id in valid_moves_dict:  # user completed a valid move
+                        actual_move = game.find_move(player_clicks[0], player_clicks[1])
+                        if actual_move:  # user completed a valid move
                             ai_last_move_locs = None
-                            actual_move = valid_moves_dict[move.move_id]
                             if actual_move.is_pawn_promotion:  # is promotion
-                                color = 'w' if game_state.white_to_move else 'b'
-                                promotion_menu = PromotionMenu(color, WIDTH)
+                                promotion_menu = PromotionMenu(game.side_to_move(), WIDTH)
                                 awaiting_promotion = True
                                 pending_move = actual_move
                                 selected_sq = ()
                                 player_clicks = []
                             else:
-                                game_state.make_move(actual_move)
-                                move_made = True
+                                game.make_move(actual_move)
                                 selected_sq = ()
                                 player_clicks = []
-                                game_state.print_board()
+                                log_board(game.board)
                         else:
                             player_clicks = [selected_sq]
 
             elif e.type == pygame.KEYDOWN:  # if user pressed a key (supports undo/restart cases)
-                if e.key == pygame.K_z and not awaiting_promotion and human_turn:  # undo
-                    game_state.undo_move()
-                    if game_mode == 'ai' and ai:
-                        game_state.undo_move()
-                    move_made = True
-                    game_over = False
+                if e.key == pygame.K_z and not awaiting_promotion and (human_turn or ai_thinking):  # undo
+                    if ai_search:
+                        ai_search.cancel()  # frees the engine within milliseconds
+                    # While the AI is thinking only the human's last move is taken back
+                    game.undo(2 if ai_color and human_turn else 1)
                     ai_last_move_locs = None
                     selected_sq = ()
                     player_clicks = []
-                    with ai_lock:  # IMPROVEMENT: Thread-safe reset
-                        ai_thinking = False
-                        ai_move = None
+                    ai_thinking = False
+                    ai_generation += 1
+                if e.key == pygame.K_s:  # save the game as PGN
+                    ai_name = f"AI level {difficulty_level}"
+                    headers = {'Event': 'Casual game', 'Site': 'local',
+                               'White': ai_name if ai_color == 'w' else 'Human',
+                               'Black': ai_name if ai_color == 'b' else 'Human'}
+                    with open(SAVED_GAMES_FILE, 'a') as f:
+                        f.write(game.to_pgn(headers))
+                    logger.info("Game saved to %s", SAVED_GAMES_FILE)
                 if e.key == pygame.K_r:  # restart
-                    game_state = ChessBoard()
-                    valid_moves = game_state.get_valid_moves()
-                    valid_moves_dict = {move.move_id: move for move in valid_moves}
+                    if ai_search:
+                        ai_search.cancel()
+                    game.reset()
                     selected_sq = ()
                     player_clicks = []
-                    move_made = False
-                    game_over = False
                     ai_last_move_locs = None
                     awaiting_promotion = False
                     promotion_menu = None
                     pending_move = None
-                    with ai_lock:  # Thread-safe reset
-                        ai_thinking = False
-                        ai_move = None
-
-        if move_made:
-            valid_moves = game_state.get_valid_moves()
-            valid_moves_dict = {move.move_id: move for move in valid_moves}
-            move_made = False
-
-        draw_game_state(screen, game_state, valid_moves, selected_sq, ai_last_move_locs)
-        if awaiting_promotion and promotion_menu:
-            promotion_menu.draw(screen, IMAGES)
-
-        # Show AI info if playing against AI
-        if game_mode == 'ai' and ai:
-            info_font = pygame.font.SysFont('Arial', 16, True)
-
-            # Show difficulty level
-            if difficulty_level <= 5:
-                diff_desc = "Beginner"
-            elif difficulty_level <= 10:
-                diff_desc = "Intermediate"
-            elif difficulty_level <= 15:
-                diff_desc = "Advanced"
-            else:
-                diff_desc = "Expert"
-
-            # place AI difficulty level at bottom left corner
-            diff_text = info_font.render(f"AI: Level {difficulty_level} ({diff_desc})", True, pygame.Color('DarkBlue'))
-            screen.blit(diff_text, (10, HEIGHT - 18))
-
-            # Show whose turn it is (bottom right corner)
-            turn_text = "Your turn" if human_turn else "AI's turn"
-            turn_color = pygame.Color('DarkGreen') if human_turn else pygame.Color('DarkRed')
-            turn_surf = info_font.render(turn_text, True, turn_color)
-            screen.blit(turn_surf, (WIDTH - turn_surf.get_width() - 10, HEIGHT - 18))
-
-        if ai_thinking and not awaiting_promotion:
-            font = pygame.font.SysFont('Arial', 24, True)
-            thinking_text = font.render("AI is thinking...", True, pygame.Color('Red'))
-            screen.blit(thinking_text, (10, 10))
-
-        # is game over?
-        if game_state.checkmate:
-            game_over = True
-            winner = 'Black' if game_state.white_to_move else 'White'
-            draw_text(screen, f'   {winner} wins by checkmate')
-        elif game_state.stalemate:
-            game_over = True
-            draw_text(screen, '                Stalemate')
-
-        clock.tick(MAX_FPS)
-        pygame.display.flip()
+                    ai_thinking = False
+                    ai_generation += 1
 
+    if ai_search:
+        ai_search.cancel()
+        ai_search.wait(1)
     if ai:
         ai.close()
     pygame.quit()
@@ -1,9 +1,10 @@
 # # menu.py
 import pygame
 from slider import Slider
+from ui_cache import get_text
 
 # Constants
-MAX_FPS = 15
+EVENT_TIMEOUT_MS = 1000  # the menu sleeps in pygame.event.wait and wakes up at least this often
 
 # Colors
 MENU_BG = (245, 245, 245)
@@ -14,9 +15,8 @@ BUTTON_HOVER = (100, 160, 210)
 
 
 # Show main menu and return game mode and player color
-def show_menu(screen, WIDTH):
-    clock = pygame.time.Clock()
-
+# on_ai_selected: optional callback run once when "Play vs AI" is clicked (e.g. to start the engine early)
+def show_menu(screen, WIDTH, on_ai_selected=None):
     # Create buttons
     button_width = 300
     button_height = 60
@@ -37,43 +37,29 @@ def show_menu(screen, WIDTH):
     # init state
     AI_mode = False  # True: play vs 'ai'  ;  False: play vs 'friend'
 
-    # enable menu (waits for user selection)
+    # enable menu (waits for user selection); the screen is only redrawn when what it shows changed
+    drawn_state = None
     while True:
-        screen.fill(pygame.Color('white'))
-
-        # Draw title
-        title_font = pygame.font.SysFont('Arial', 48, True)
-        title = title_font.render("Chess Game", True, pygame.Color('Black'))
-        title_rect = title.get_rect(center=(WIDTH // 2, 100))
-        screen.blit(title, title_rect)
-
-        # Draw mode buttons
-        btn_vs_friend.draw(screen)
-        btn_vs_ai.draw(screen)
-
-        # If AI mode selected, show: difficulty + color selection
-        if AI_mode:
-            # Draw difficulty slider
-            difficulty_slider.draw(screen)
-
-            # Draw color selection instruction
-            instruction_font = pygame.font.SysFont('Arial', 24)
-            instruction = instruction_font.render("Choose your color:", True, pygame.Color('Black'))
-            inst_rect = instruction.get_rect(center=(WIDTH // 2, 495))
-            screen.blit(instruction, inst_rect)
-
-            btn_white.draw(screen)
-            btn_black.draw(screen)
-
-        for event in pygame.event.get():
+        state = (AI_mode, btn_vs_friend.hovered, btn_vs_ai.hovered, btn_white.hovered, btn_black.hovered,
+                 difficulty_slider.value, difficulty_slider.dragging)
+        if state != drawn_state:
+            draw_menu(screen, WIDTH, AI_mode, [btn_vs_friend, btn_vs_ai], [btn_white, btn_black], difficulty_slider)
+            pygame.display.flip()
+            drawn_state = state
+
+        for event in [pygame.event.wait(EVENT_TIMEOUT_MS)] + pygame.event.get():
             if event.type == pygame.QUIT:
                 return None, None, None
+            if event.type == pygame.VIDEOEXPOSE:
+                drawn_state = None
 
             # Handle button events
             if btn_vs_friend.handle_event(event):
                 return 'friend', None, None
 
             if btn_vs_ai.handle_event(event):
+                if not AI_mode and on_ai_selected:
+                    on_ai_selected()
                 AI_mode = True
 
             if AI_mode:
@@ -91,8 +77,32 @@ def show_menu(screen, WIDTH):
                 btn_white.handle_event(event)
                 btn_black.handle_event(event)
 
-        pygame.display.flip()
-        clock.tick(MAX_FPS)
+
+# Draw the whole menu screen
+def draw_menu(screen, WIDTH, AI_mode, mode_buttons, color_buttons, difficulty_slider):
+    screen.fill(pygame.Color('white'))
+
+    # Draw title
+    title = get_text("Chess Game", 'Black', 'Arial', 48, True)
+    title_rect = title.get_rect(center=(WIDTH // 2, 100))
+    screen.blit(title, title_rect)
+
+    # Draw mode buttons
+    for button in mode_buttons:
+        button.draw(screen)
+
+    # If AI mode selected, show: difficulty + color selection
+    if AI_mode:
+        # Draw difficulty slider
+        difficulty_slider.draw(screen)
+
+        # Draw color selection instruction
+        instruction = get_text("Choose your color:", 'Black', 'Arial', 24)
+        inst_rect = instruction.get_rect(center=(WIDTH // 2, 495))
+        screen.blit(instruction, inst_rect)
+
+        for button in color_buttons:
+            button.draw(screen)
 
 
 # button class
@@ -100,7 +110,7 @@ class Button:
     def __init__(self, x, y, width, height, text, font_size=24):
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
-        self.font = pygame.font.SysFont('Arial', font_size, True)
+        self.font_size = font_size
         self.hovered = False
 
     def draw(self, screen):
@@ -108,7 +118,7 @@ class Button:
         pygame.draw.rect(screen, color, self.rect, border_radius=10)
         pygame.draw.rect(screen, MENU_BORDER, self.rect, 3, border_radius=10)
 
-        text_surf = self.font.render(self.text, True, pygame.Color('White'))
+        text_surf = get_text(self.text, 'White', 'Arial', self.font_size, True)
         text_rect = text_surf.get_rect(center=self.rect.center)
         screen.blit(text_surf, text_rect)
 
@@ -0,0 +1,117 @@
+# # perft.py
+# Perft / divide: counts the leaf nodes of the legal move tree to validate and benchmark move generation.
+# Usage:
+#   python perft.py                                  run the standard suite on the default backend
+#   python perft.py --backend bitboard --depth 3     run the suite on another backend, up to depth 3
+#   python perft.py --position kiwipete --depth 2 --divide
+#   python perft.py --fen "<fen>" --depth 4
+import argparse
+import sys
+import time
+from chess_board import create_board, BACKENDS, MOVE_PROMOTION, PROMOTION_CODE_PIECES, START_FEN
+
+# Bits added to a (queen) promotion code to promote to each piece instead
+PROMOTION_VARIANTS = tuple(i << 12 for i in range(len(PROMOTION_CODE_PIECES)))
+
+# Standard test positions and their known node counts for depth 1, 2, 3, ...
+POSITIONS = {
+    'startpos': (START_FEN,
+                 [20, 400, 8902, 197281, 4865609]),
+    'kiwipete': ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+                 [48, 2039, 97862, 4085603]),
+    'en_passant': ('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+                   [14, 191, 2812, 43238, 674624]),
+    'promotion': ('r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+                  [6, 264, 9467, 422333]),
+    'promotion_check': ('rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+                        [44, 1486, 62379, 2103487]),
+}
+
+
+# Count leaf nodes at the given depth; every promotion is expanded into all four pieces.
+# Works on compact move codes, so leaf positions are counted without creating Move objects.
+def perft(board, depth):
+    codes = board.get_valid_move_codes()
+    if depth == 1:
+        return len(codes) + (len(PROMOTION_VARIANTS) - 1) * sum(1 for code in codes if code >= MOVE_PROMOTION)
+
+    nodes = 0
+    for code in codes:
+        for variant in PROMOTION_VARIANTS if code >= MOVE_PROMOTION else PROMOTION_VARIANTS[:1]:
+            board.make_move_code(code | variant)
+            nodes += perft(board, depth - 1)
+            board.undo_move()
+    return nodes
+
+
+# Node count below each root move, keyed by UCI notation
+def divide(board, depth):
+    counts = {}
+    for move in board.get_valid_moves():
+        for piece in PROMOTION_CODE_PIECES if move.is_pawn_promotion else PROMOTION_CODE_PIECES[:1]:
+            board.make_move(move, piece)
+            counts[move.get_uci_notation()] = perft(board, depth - 1) if depth > 1 else 1
+            board.undo_move()
+    return counts
+
+
+# Run perft on one position up to max_depth, print a line per depth and return True if all counts match
+def run_position(name, fen, expected, max_depth, backend):
+    all_ok = True
+    for depth in range(1, max_depth + 1):
+        board = create_board(backend, fen)
+        start_time = time.perf_counter()
+        nodes = perft(board, depth)
+        elapsed = time.perf_counter() - start_time
+        nps = nodes / elapsed if elapsed > 0 else 0.0
+        if depth <= len(expected):
+            ok = nodes == expected[depth - 1]
+            status = 'ok' if ok else f'FAIL (expected {expected[depth - 1]})'
+            all_ok = all_ok and ok
+        else:
+            status = 'no reference'
+        print(f"{name:<16} depth {depth}  nodes {nodes:>10}  {elapsed:8.3f}s  {nps:>10.0f} nodes/s  {status}")
+    return all_ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Perft move generation benchmark and correctness suite')
+    parser.add_argument('--backend', choices=BACKENDS, default='mailbox', help='board backend to test')
+    parser.add_argument('--depth', type=int, default=3, help='maximum perft depth')
+    parser.add_argument('--position', choices=sorted(POSITIONS), help='run a single standard position')
+    parser.add_argument('--fen', help='run a custom position (no reference counts)')
+    parser.add_argument('--divide', action='store_true', help='print node counts per root move')
+    args = parser.parse_args(argv)
+
+    if args.fen:
+        positions = {'custom': (args.fen, [])}
+    elif args.position:
+        positions = {args.position: POSITIONS[args.position]}
+    else:
+        positions = POSITIONS
+
+    if args.divide:
+        for name, (fen, expected) in positions.items():
+            board = create_board(args.backend, fen)
+            start_time = time.perf_counter()
+            counts = divide(board, args.depth)
+            elapsed = time.perf_counter() - start_time
+            for uci, nodes in sorted(counts.items()):
+                print(f"{uci}: {nodes}")
+            total = sum(counts.values())
+            print(f"\n{name}: {len(counts)} moves, {total} nodes in {elapsed:.3f}s")
+            if args.depth <= len(expected) and total != expected[args.depth - 1]:
+                print(f"FAIL: expected {expected[args.depth - 1]}")
+                return 1
+        return 0
+
+    print(f"Perft suite on '{args.backend}' backend, depth {args.depth}")
+    all_ok = True
+    for name, (fen, expected) in positions.items():
+        all_ok = run_position(name, fen, expected, args.depth, args.backend) and all_ok
+    print('All counts match' if all_ok else 'Some counts do NOT match')
+    return 0 if all_ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+# # pgn.py
+# PGN game records: standard algebraic notation (SAN) from the legal moves of a ChessBoard, PGN text output,
+# and a streaming reader that replays and validates very large multi-game files on a pool of worker processes.
+# Usage: python pgn.py games.pgn [--workers N] [--chunk-size N]
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from chess_board import ChessBoard, find_uci_move, START_FEN
+
+PGN_LINE_LENGTH = 79  # movetext lines are wrapped before this many characters
+SEVEN_TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+REPLAY_CHUNK_SIZE = 200  # games sent to a worker process at a time
+PENDING_CHUNKS_PER_WORKER = 2  # chunks read ahead per worker; bounds memory use on huge files
+
+TAG_RE = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+TOKEN_RE = re.compile(r'\{[^}]*\}?|;[^\n]*|\(|\)|\$\d+|[^\s(){};]+')
+SAN_RE = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+MOVE_NUMBER_RE = re.compile(r'^\d+\.+')
+
+
+# SAN of a legal move in the current position (the board is left unchanged)
+def move_to_san(board, move, promotion_piece='Q'):
+    """ Input:
+            board: ChessBoard before the move; move: one of board.get_valid_moves()
+            promotion_piece: 'Q', 'R', 'B' or 'N' when the move is a pawn promotion
+    Output: SAN string, e.g. 'Nbd7', 'exd6', 'O-O', 'e8=Q+' """
+    piece = move.piece_moved[1]
+    if move.is_castle:
+        san = 'O-O' if move.end_col > move.start_col else 'O-O-O'
+    else:
+        capture = move.piece_captured != '--' or move.is_en_passant
+        destination = move.cols_to_files[move.end_col] + move.rows_to_ranks[move.end_row]
+        if piece == 'P':
+            san = (move.cols_to_files[move.start_col] + 'x' if capture else '') + destination
+            if move.is_pawn_promotion:
+                san += '=' + promotion_piece
+        else:
+            # Disambiguate between pieces of the same type that can reach the same square
+            others = [m for m in board.get_valid_moves() if m.piece_moved == move.piece_moved and
+                      m.end_row == move.end_row and m.end_col == move.end_col and m.move_id != move.move_id]
+            disambiguation = ''
+            if others:
+                if all(m.start_col != move.start_col for m in others):
+                    disambiguation = move.cols_to_files[move.start_col]
+                elif all(m.start_row != move.start_row for m in others):
+                    disambiguation = move.rows_to_ranks[move.start_row]
+                else:
+                    disambiguation = move.cols_to_files[move.start_col] + move.rows_to_ranks[move.start_row]
+            san = piece + disambiguation + ('x' if capture else '') + destination
+
+    # Check / checkmate suffix
+    board.make_move(move, promotion_piece)
+    if board.in_check():
+        san += '#' if not board.get_valid_moves() else '+'
+    board.undo_move()
+    return san
+
+
+# SAN of a list of UCI moves played from fen
+def uci_moves_to_san(uci_moves, fen=START_FEN):
+    board = ChessBoard(fen)
+    san_moves = []
+    for uci in uci_moves:
+        move = find_uci_move(board, uci)
+        if move is None:
+            raise ValueError(f"Illegal move {uci} in position {board.get_fen()}")
+        promotion_piece = uci[4].upper() if len(uci) == 5 else 'Q'
+        san_moves.append(move_to_san(board, move, promotion_piece))
+        board.make_move(move, promotion_piece)
+    return san_moves
+
+
+# PGN text of one game
+def format_pgn(headers, san_moves, result='*', fen=START_FEN):
+    """ Input:
+            headers: dict of tag pairs (missing Seven Tag Roster tags are filled with '?')
+            san_moves: moves in SAN; result: '1-0', '0-1', '1/2-1/2' or '*'
+            fen: start position; a non-standard one adds the SetUp and FEN tags
+    Output: PGN text ending with a blank line """
+    tags = {name: '?' for name in SEVEN_TAG_ROSTER}
+    tags['Date'] = time.strftime('%Y.%m.%d')
+    tags.update(headers)
+    tags['Result'] = result
+    if fen != START_FEN:
+        tags['SetUp'] = '1'
+        tags['FEN'] = fen
+    lines = ['[{} "{}"]'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+             for name, value in tags.items()]
+
+    # Movetext: move numbers follow the start position (black to move starts with '1...')
+    fields = fen.split()
+    white_to_move = len(fields) < 2 or fields[1] == 'w'
+    number = int(fields[5]) if len(fields) > 5 else 1
+    tokens = []
+    for i, san in enumerate(san_moves):
+        if white_to_move:
+            tokens.append(f'{number}. {san}')
+        elif i == 0:
+            tokens.append(f'{number}... {san}')
+        else:
+            tokens.append(san)
+        if not white_to_move:
+            number += 1
+        white_to_move = not white_to_move
+    tokens.append(result)
+
+    movetext = []
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > PGN_LINE_LENGTH:
+            movetext.append(line)
+            line = token
+        else:
+            line = f'{line} {token}' if line else token
+    movetext.append(line)
+    return '\n'.join(lines) + '\n\n' + '\n'.join(movetext) + '\n\n'
+
+
+# PGN of the game played on a board so far (its move_log, starting from fen)
+def board_to_pgn(board, headers=None, result=None, fen=START_FEN):
+    if result is None:
+        if board.checkmate:
+            result = '0-1' if board.white_to_move else '1-0'
+        else:
+            result = '1/2-1/2' if board.stalemate else '*'
+    uci_moves = [move.get_uci_notation() for move in board.move_log]
+    return format_pgn(headers or {}, uci_moves_to_san(uci_moves, fen), result, fen)
+
+
+# Read games one at a time from a text stream; only the current game is held in memory
+def read_games(stream):
+    """ Input: stream: iterable of PGN lines (e.g. an open file)
+    Output: generator of (headers, movetext) per game """
+    headers = {}
+    movetext = []
+    for line in stream:
+        if line.startswith('%'):
+            continue  # escape line
+        stripped = line.strip()
+        if stripped.startswith('['):
+            if movetext:  # a tag after movetext starts the next game
+                yield headers, '\n'.join(movetext)
+                headers, movetext = {}, []
+            match = TAG_RE.match(stripped)
+            if match:
+                headers[match.group(1)] = re.sub(r'\\(.)', r'\1', match.group(2))
+        elif stripped:
+            movetext.append(stripped)
+    if headers or movetext:
+        yield headers, '\n'.join(movetext)
+
+
+# SAN moves and result of a movetext; comments, variations, NAGs and move numbers are skipped
+def parse_movetext(movetext):
+    moves = []
+    result = '*'
+    depth = 0  # nesting level of variations
+    for token in TOKEN_RE.findall(movetext):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth = max(depth - 1, 0)
+        elif depth or token[0] in '{;$':
+            continue
+        elif token in RESULTS:
+            result = token
+        else:
+            token = MOVE_NUMBER_RE.sub('', token).rstrip('!?')
+            if token:
+                moves.append(token)
+    return moves, result
+
+
+# Legal move matching a SAN string, as (move, promotion_piece), or (None, None)
+def san_to_move(board, san):
+    san = san.rstrip('+#!?')
+    valid_moves = board.get_valid_moves()
+    if san in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        kingside = len(san) == 3
+        for move in valid_moves:
+            if move.is_castle and (move.end_col > move.start_col) == kingside:
+                return move, 'Q'
+        return None, None
+
+    match = SAN_RE.match(san)
+    if not match:
+        return None, None
+    piece, from_file, from_rank, destination, promotion = match.groups()
+    piece = piece or 'P'
+    end_col = ord(destination[0]) - ord('a')
+    end_row = 8 - int(destination[1])
+    candidates = [move for move in valid_moves
+                  if move.piece_moved[1] == piece and move.end_row == end_row and move.end_col == end_col and
+                  not move.is_castle and
+                  (from_file is None or move.start_col == ord(from_file) - ord('a')) and
+                  (from_rank is None or move.start_row == 8 - int(from_rank))]
+    if len(candidates) != 1:
+        return None, None
+    return candidates[0], promotion or 'Q'
+
+
+# Replay one game and check that every move is legal
+def replay_game(headers, movetext):
+    """ Output: dict with ok, plies, result, final fen and, for an invalid game, the error """
+    fen = headers.get('FEN', START_FEN)
+    moves, result = parse_movetext(movetext)
+    record = {'white': headers.get('White', '?'), 'black': headers.get('Black', '?'), 'result': result}
+    try:
+        board = ChessBoard(fen, cache_size=0)
+    except (ValueError, IndexError, KeyError) as e:
+        record.update(ok=False, plies=0, error=f"bad FEN '{fen}': {e}")
+        return record
+    for ply, san in enumerate(moves):
+        move, promotion_piece = san_to_move(board, san)
+        if move is None:
+            record.update(ok=False, plies=ply, fen=board.get_fen(), error=f"illegal or ambiguous move {san}")
+            return record
+        board.make_move(move, promotion_piece)
+    record.update(ok=True, plies=len(moves), fen=board.get_fen())
+    return record
+
+
+# Worker process: replay a chunk of (headers, movetext) games
+def replay_chunk(games):
+    return [replay_game(headers, movetext) for headers, movetext in games]
+
+
+# Replay every game of a PGN file on a process pool, yielding records in file order
+def replay_file(path, workers=None, chunk_size=REPLAY_CHUNK_SIZE):
+    """ Input: path of a (possibly multi-gigabyte) PGN file; workers: processes (default: CPU count)
+    Output: generator of replay_game records; at most workers * PENDING_CHUNKS_PER_WORKER chunks are in memory """
+    workers = workers or os.cpu_count()
+    with open(path, encoding='utf-8', errors='replace') as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []  # futures in file order
+        chunk = []
+        for game in read_games(f):
+            chunk.append(game)
+            if len(chunk) >= chunk_size:
+                pending.append(pool.submit(replay_chunk, chunk))
+                chunk = []
+                if len(pending) >= workers * PENDING_CHUNKS_PER_WORKER:
+                    wait(pending[:1], return_when=FIRST_COMPLETED)
+                    yield from pending.pop(0).result()
+        if chunk:
+            pending.append(pool.submit(replay_chunk, chunk))
+        for future in pending:
+            yield from future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay and validate the games of a PGN file in parallel')
+    parser.add_argument('pgn', help='PGN file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=REPLAY_CHUNK_SIZE, help='games per worker task')
+    parser.add_argument('--max-errors', type=int, default=20, help='invalid games to list')
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    games = invalid = plies = 0
+    for number, record in enumerate(replay_file(args.pgn, args.workers, args.chunk_size), 1):
+        games += 1
+        plies += record['plies']
+        if not record['ok']:
+            invalid += 1
+            if invalid <= args.max_errors:
+                print(f"game {number} ({record['white']} - {record['black']}), ply {record['plies'] + 1}: "
+                      f"{record['error']}")
+    elapsed = time.perf_counter() - start_time
+    rate = games / elapsed if elapsed > 0 else 0.0
+    print(f"{games} games, {plies} plies, {invalid} invalid in {elapsed:.1f}s ({rate:.0f} games/s)")
+    return 0 if not invalid else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,7 @@
 # # promotion_menu.py
 # when a pawn reaches final row, it opens a promotion menu so user may select the required piece to create.
 import pygame
+from ui_cache import get_text
 
 MENU_BG = (245, 245, 245)
 MENU_BORDER = (100, 100, 100)
@@ -23,8 +24,7 @@ class PromotionMenu:
     # Draw the promotion menu
     def draw(self, screen, IMAGES):
         # Draw title
-        font = pygame.font.SysFont('Arial', 20, True)
-        title = font.render("  Choose promotion piece:", True, pygame.Color('Black'))
+        title = get_text("  Choose promotion piece:", 'Black', 'Arial', 20, True)
         text_location = pygame.Rect(self.menu_x, self.menu_y - 30, self.menu_width, self.menu_height)
         screen.fill(pygame.Color('White'), text_location)
         screen.blit(title, text_location)
@@ -57,6 +57,18 @@ class PromotionMenu:
             img_y = y + (self.piece_size - piece_img.get_height()) // 2
             screen.blit(piece_img, (img_x, img_y))
 
+    # Screen area covered by the menu and its title
+    def get_rect(self):
+        return pygame.Rect(self.menu_x, self.menu_y - 30, self.menu_width, self.menu_height + 30)
+
+    # Index of the piece option under pos, or None (the hover highlight depends on it)
+    def get_hover_index(self, pos):
+        for i in range(len(self.pieces)):
+            x = self.menu_x + self.padding + i * (self.piece_size + self.padding)
+            if pygame.Rect(x, self.menu_y + self.padding, self.piece_size, self.piece_size).collidepoint(pos):
+                return i
+        return None
+
     # Check if a piece was clicked and return it
     def handle_click(self, pos):
         for i, piece in enumerate(self.pieces):
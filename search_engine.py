@@ -0,0 +1,344 @@
+# # search_engine.py
+# In-process chess AI built on ChessBoard, used when Stockfish is not available and for the low difficulty levels.
+# Iterative deepening alpha-beta with quiescence search, a transposition table, MVV-LVA / killer / history
+# move ordering and a hard time budget. Same get_best_move(fen, move_time) interface as StockfishAI.
+import logging
+import threading
+import time
+from chess_board import ChessBoard, code_to_uci, MOVE_CASTLE, MOVE_EN_PASSANT, MOVE_FLAGS, MOVE_PROMOTION
+
+logger = logging.getLogger(__name__)
+
+MATE_SCORE = 100000
+INFINITY = 1000000
+MAX_PLY = 64
+TT_SIZE = 200000  # transposition table entries before it is cleared
+TIME_CHECK_NODES = 255  # check the clock every 256 nodes
+
+# Transposition table entry flags
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+PIECE_VALUES = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0}
+
+# Piece-square tables from white's point of view, row 0 = rank 8
+PIECE_SQUARE_TABLES = {
+    'P': [[0, 0, 0, 0, 0, 0, 0, 0],
+          [50, 50, 50, 50, 50, 50, 50, 50],
+          [10, 10, 20, 30, 30, 20, 10, 10],
+          [5, 5, 10, 25, 25, 10, 5, 5],
+          [0, 0, 0, 20, 20, 0, 0, 0],
+          [5, -5, -10, 0, 0, -10, -5, 5],
+          [5, 10, 10, -20, -20, 10, 10, 5],
+          [0, 0, 0, 0, 0, 0, 0, 0]],
+    'N': [[-50, -40, -30, -30, -30, -30, -40, -50],
+          [-40, -20, 0, 0, 0, 0, -20, -40],
+          [-30, 0, 10, 15, 15, 10, 0, -30],
+          [-30, 5, 15, 20, 20, 15, 5, -30],
+          [-30, 0, 15, 20, 20, 15, 0, -30],
+          [-30, 5, 10, 15, 15, 10, 5, -30],
+          [-40, -20, 0, 5, 5, 0, -20, -40],
+          [-50, -40, -30, -30, -30, -30, -40, -50]],
+    'B': [[-20, -10, -10, -10, -10, -10, -10, -20],
+          [-10, 0, 0, 0, 0, 0, 0, -10],
+          [-10, 0, 5, 10, 10, 5, 0, -10],
+          [-10, 5, 5, 10, 10, 5, 5, -10],
+          [-10, 0, 10, 10, 10, 10, 0, -10],
+          [-10, 10, 10, 10, 10, 10, 10, -10],
+          [-10, 5, 0, 0, 0, 0, 5, -10],
+          [-20, -10, -10, -10, -10, -10, -10, -20]],
+    'R': [[0, 0, 0, 0, 0, 0, 0, 0],
+          [5, 10, 10, 10, 10, 10, 10, 5],
+          [-5, 0, 0, 0, 0, 0, 0, -5],
+          [-5, 0, 0, 0, 0, 0, 0, -5],
+          [-5, 0, 0, 0, 0, 0, 0, -5],
+          [-5, 0, 0, 0, 0, 0, 0, -5],
+          [-5, 0, 0, 0, 0, 0, 0, -5],
+          [0, 0, 0, 5, 5, 0, 0, 0]],
+    'Q': [[-20, -10, -10, -5, -5, -10, -10, -20],
+          [-10, 0, 0, 0, 0, 0, 0, -10],
+          [-10, 0, 5, 5, 5, 5, 0, -10],
+          [-5, 0, 5, 5, 5, 5, 0, -5],
+          [0, 0, 5, 5, 5, 5, 0, -5],
+          [-10, 5, 5, 5, 5, 5, 0, -10],
+          [-10, 0, 5, 0, 0, 0, 0, -10],
+          [-20, -10, -10, -5, -5, -10, -10, -20]],
+    'K': [[-30, -40, -40, -50, -50, -40, -40, -30],
+          [-30, -40, -40, -50, -50, -40, -40, -30],
+          [-30, -40, -40, -50, -50, -40, -40, -30],
+          [-30, -40, -40, -50, -50, -40, -40, -30],
+          [-20, -30, -30, -40, -40, -30, -30, -20],
+          [-10, -20, -20, -20, -20, -20, -20, -10],
+          [20, 20, 0, 0, 0, 0, 20, 20],
+          [20, 30, 10, 0, 0, 10, 30, 20]],
+}
+
+# Signed material + position value of every piece on every square (black mirrored and negated)
+SQUARE_VALUES = {'--': [[0] * 8 for _ in range(8)]}
+for _piece, _table in PIECE_SQUARE_TABLES.items():
+    SQUARE_VALUES['w' + _piece] = [[PIECE_VALUES[_piece] + _table[r][c] for c in range(8)] for r in range(8)]
+    SQUARE_VALUES['b' + _piece] = [[-(PIECE_VALUES[_piece] + _table[7 - r][c]) for c in range(8)] for r in range(8)]
+
+
+# Raised inside the search when the time budget is used up
+class SearchTimeout(Exception):
+    pass
+
+
+# Map the 0-20 skill level to a maximum search depth
+def skill_to_depth(skill_level):
+    return 1 + skill_level // 4
+
+
+# Built-in search engine with the StockfishAI interface
+class SearchAI:
+
+    def __init__(self, skill_level=20, max_depth=None, tt_size=TT_SIZE):
+        """ Input:
+        skill_level: 0-20, mapped to the maximum search depth
+        max_depth: overrides the depth derived from skill_level
+        tt_size: transposition table entries kept between moves """
+        self.skill_level = skill_level
+        self.max_depth = max_depth if max_depth is not None else skill_to_depth(skill_level)
+        self.tt_size = tt_size
+        self.tt = {}  # zobrist hash -> (depth, score, flag, best move code)
+        self.killers = []
+        self.history = {}
+        self.nodes = 0
+        self.deadline = 0.0
+        self.stop_event = None  # set by the caller to end the running search early
+        self.search_lock = threading.Lock()  # searches share the tables: a cancelled one finishes first
+
+    # Get best move from current position
+    def get_best_move(self, board_fen, move_time=1000, moves=None, stop_event=None):
+        """ Input:
+                board_fen: FEN string of current position
+                move_time: time in milliseconds to think
+                moves: game history in UCI notation (accepted for compatibility with StockfishAI, not used)
+                stop_event: optional threading.Event; once set the search returns its best move so far
+        Output: move in UCI format (e.g., 'e2e4') """
+        with self.search_lock:
+            self.stop_event = stop_event
+            return self.search(board_fen, move_time)
+
+    # Iterative deepening until the time budget is used up, a mate is found or the search is stopped
+    def search(self, board_fen, move_time):
+        board = ChessBoard(board_fen)
+        root_moves = board.get_valid_move_codes()
+        if not root_moves:
+            return None
+
+        start_time = time.perf_counter()
+        self.deadline = start_time + move_time / 1000
+        self.nodes = 0
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = {}
+        if len(self.tt) > self.tt_size:
+            self.tt.clear()
+
+        best_move = root_moves[0]
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, move = self.search_root(board, root_moves, depth, best_move)
+            except SearchTimeout:
+                break
+            best_move = move
+            elapsed = time.perf_counter() - start_time
+            logger.debug("SearchAI: depth %d score %d nodes %d time %.2fs best %s",
+                         depth, score, self.nodes, elapsed, code_to_uci(best_move))
+            if abs(score) >= MATE_SCORE - MAX_PLY:
+                break  # Forced mate found
+        return code_to_uci(best_move)
+
+    # True when the time budget is used up or the caller stopped the search (checked every TIME_CHECK_NODES nodes)
+    def out_of_time(self):
+        return time.perf_counter() > self.deadline or (self.stop_event is not None and self.stop_event.is_set())
+
+    # Interrupt the running search started with stop_event; it polls the event itself, so there is nothing to send
+    def stop_search(self, stop_event):
+        pass
+
+    def search_root(self, board, root_moves, depth, previous_best):
+        alpha, beta = -INFINITY, INFINITY
+        best_move = previous_best
+        ordered = self.order_moves(board, root_moves, previous_best, 0)
+        for move in ordered:
+            board.make_move_code(move)
+            score = -self.negamax(board, depth - 1, -beta, -alpha, 1)
+            board.undo_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self.tt[board.zobrist_hash] = (depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & TIME_CHECK_NODES == 0 and self.out_of_time():
+            raise SearchTimeout()
+        if depth <= 0:
+            return self.quiescence(board, alpha, beta, ply)
+
+        alpha_orig = alpha
+        key = board.zobrist_hash
+        tt_move = None
+        entry = self.tt.get(key)
+        if entry is not None:
+            tt_depth, tt_score, tt_flag, tt_move = entry
+            if tt_depth >= depth:
+                tt_score = self.score_from_tt(tt_score, ply)
+                if tt_flag == EXACT:
+                    return tt_score
+                if tt_flag == LOWER_BOUND:
+                    alpha = max(alpha, tt_score)
+                else:
+                    beta = min(beta, tt_score)
+                if alpha >= beta:
+                    return tt_score
+
+        moves = board.get_valid_move_codes()
+        if not moves:
+            return -(MATE_SCORE - ply) if board.checkmate else 0
+
+        best_score = -INFINITY
+        best_move = None
+        for move in self.order_moves(board, moves, tt_move, ply):
+            board.make_move_code(move)
+            score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.undo_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                end = move >> 6 & 63
+                if board.board[end >> 3][end & 7] == '--' and move & MOVE_FLAGS != MOVE_EN_PASSANT:
+                    self.store_killer(move, ply)
+                    key_hist = self.history_key(board.board, move)
+                    self.history[key_hist] = self.history.get(key_hist, 0) + depth * depth
+                break
+
+        if best_score <= alpha_orig:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.tt[key] = (depth, self.score_to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    # Search captures and promotions only, until the position is quiet
+    def quiescence(self, board, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & TIME_CHECK_NODES == 0 and self.out_of_time():
+            raise SearchTimeout()
+
+        moves = board.get_valid_move_codes()
+        if not moves:
+            return -(MATE_SCORE - ply) if board.checkmate else 0
+        stand_pat = self.evaluate(board)
+        if stand_pat >= beta or ply >= MAX_PLY - 1:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        rows = board.board
+        captures = [move for move in moves if self.is_tactical(rows, move)]
+        captures.sort(key=lambda move: self.mvv_lva(rows, move), reverse=True)
+        for move in captures:
+            board.make_move_code(move)
+            score = -self.quiescence(board, -beta, -alpha, ply + 1)
+            board.undo_move()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    # Static evaluation from the side to move's point of view
+    @staticmethod
+    def evaluate(board):
+        score = 0
+        for r, row in enumerate(board.board):
+            for c, piece in enumerate(row):
+                score += SQUARE_VALUES[piece][r][c]
+        return score if board.white_to_move else -score
+
+    # Captures, en passant and promotions (the moves quiescence searches); rows is the board the code is played on
+    @staticmethod
+    def is_tactical(rows, move):
+        end = move >> 6 & 63
+        flags = move & MOVE_FLAGS
+        return rows[end >> 3][end & 7] != '--' or (flags and flags != MOVE_CASTLE)
+
+    # History table key of a quiet move: the piece moved and its destination square
+    @staticmethod
+    def history_key(rows, move):
+        start = move & 63
+        return rows[start >> 3][start & 7], move >> 6 & 63
+
+    # Most valuable victim, least valuable attacker
+    @staticmethod
+    def mvv_lva(rows, move):
+        start, end = move & 63, move >> 6 & 63
+        captured = rows[end >> 3][end & 7]
+        if captured != '--':
+            victim = PIECE_VALUES[captured[1]]
+        else:
+            victim = PIECE_VALUES['P'] if move & MOVE_FLAGS == MOVE_EN_PASSANT else 0
+        score = 10 * victim - PIECE_VALUES[rows[start >> 3][start & 7][1]] // 10
+        if move >= MOVE_PROMOTION:
+            score += PIECE_VALUES['Q']
+        return score
+
+    # Transposition-table move, then captures by MVV-LVA, killers, then quiet moves by history score
+    def order_moves(self, board, moves, tt_move, ply):
+        killers = self.killers[ply] if ply < MAX_PLY else [None, None]
+        history = self.history
+        rows = board.board
+
+        def move_score(move):
+            if move == tt_move:
+                return 10000000
+            if self.is_tactical(rows, move):
+                return 1000000 + self.mvv_lva(rows, move)
+            if move == killers[0]:
+                return 900000
+            if move == killers[1]:
+                return 800000
+            return history.get(self.history_key(rows, move), 0)
+
+        return sorted(moves, key=move_score, reverse=True)
+
+    def store_killer(self, move, ply):
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+    # Mate scores are stored relative to the node so they stay correct when reached at another ply
+    @staticmethod
+    def score_to_tt(score, ply):
+        if score >= MATE_SCORE - MAX_PLY:
+            return score + ply
+        if score <= -(MATE_SCORE - MAX_PLY):
+            return score - ply
+        return score
+
+    @staticmethod
+    def score_from_tt(score, ply):
+        if score >= MATE_SCORE - MAX_PLY:
+            return score - ply
+        if score <= -(MATE_SCORE - MAX_PLY):
+            return score + ply
+        return score
+
+    # Forget what was learned about the previous game
+    def new_game(self):
+        self.tt.clear()
+        return True
+
+    # Nothing to release: the engine runs in-process
+    def close(self):
+        self.tt.clear()
@@ -1,5 +1,6 @@
 # # slider.py
 import pygame
+from ui_cache import get_text
 
 MENU_BG = (245, 245, 245)
 MENU_BORDER = (100, 100, 100)
@@ -23,11 +24,6 @@ class Slider:
         self.handle_radius = 12
         self.track_y = y + height // 2
 
-        # Fonts
-        self.title_font = pygame.font.SysFont('Arial', 20, True)
-        self.value_font = pygame.font.SysFont('Arial', 24, True)
-        self.desc_font = pygame.font.SysFont('Arial', 18)
-
     # Return description based on skill level
     def get_difficulty_description(self):
         if self.value <= 5:
@@ -53,7 +49,7 @@ class Slider:
     # Draw the slider
     def draw(self, screen):
         # Draw title
-        title = self.title_font.render("AI Difficulty Level:", True, pygame.Color('Black'))
+        title = get_text("AI Difficulty Level:", 'Black', 'Arial', 20, True)
         screen.blit(title, (self.rect.x, self.rect.y - 4))
 
         # Draw track
@@ -75,7 +71,7 @@ class Slider:
         pygame.draw.circle(screen, MENU_BORDER, (handle_x, self.track_y), self.handle_radius, 3)
 
         # Draw value and description
-        value_text = self.value_font.render(f"Level {self.value} ({self.get_difficulty_description()})", True, pygame.Color('Black'))
+        value_text = get_text(f"Level {self.value} ({self.get_difficulty_description()})", 'Black', 'Arial', 24, True)
 
         value_x = self.rect.x + self.rect.width // 2 - value_text.get_width() // 2
 
@@ -90,8 +86,7 @@ class Slider:
                              (tick_x, self.track_y + self.track_height // 2 + 8), 2)
 
             # Draw number labels
-            label_font = pygame.font.SysFont('Arial', 12)
-            label = label_font.render(str(i), True, pygame.Color('Gray'))
+            label = get_text(str(i), 'Gray', 'Arial', 12)
             screen.blit(label, (tick_x - label.get_width() // 2, self.track_y + 12))
 
     # Handle mouse events for slider
@@ -1,31 +1,165 @@
 # # stockfish_player.py
 # this is a wrapper to execute stockfish downloaded from https://stockfishchess.org/download/
+import json
+import logging
 import os
-import subprocess
+import queue
+import shutil
 import sys
+import tempfile
+import threading
 import time
+from contextlib import contextmanager
+from chess_board import ChessBoard, find_uci_move
+from uci_client import UCIClient, UCIEngineError
+
+logger = logging.getLogger(__name__)
+
+
+# Position part of a FEN (placement, side, castling, en passant), ignoring the move counters
+def fen_position_key(fen):
+    return ' '.join(fen.split()[:4])
+
+
+# Engine discovery settings
+STOCKFISH_ENV_VAR = 'STOCKFISH_PATH'  # explicit path to the executable, checked first
+CONFIGURED_PATHS = []  # extra paths to try, e.g. ['C:/Tools/stockfish/stockfish.exe']
+ACQUIRE_POLL_SECONDS = 0.5  # how often a waiting acquire re-checks that the pool still has engines
+ENGINE_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.chess_stockfish_cache.json')
+
+if sys.platform == 'win32':
+    STOCKFISH_NAMES = ['stockfish.exe', 'stockfish-windows-x86-64-avx2.exe', 'stockfish-windows-x86-64.exe']
+elif sys.platform == 'darwin':
+    STOCKFISH_NAMES = ['stockfish', 'stockfish-macos-m1-apple-silicon', 'stockfish-macos-x86-64-modern']
+else:
+    STOCKFISH_NAMES = ['stockfish', 'stockfish-ubuntu-x86-64-avx2', 'stockfish-ubuntu-x86-64']
+    CONFIGURED_PATHS = CONFIGURED_PATHS + ['/usr/games/stockfish', '/usr/local/bin/stockfish']
+
+
+# Read the cached discovery result: {'path', 'mtime', 'size'} or None
+def load_engine_cache():
+    try:
+        with open(ENGINE_CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# Remember the resolved engine path, plus its uci id and option names once an engine has been started.
+# Written to a temp file and renamed so readers never see a partial file
+def save_engine_cache(path, engine_id=None, options=None):
+    try:
+        stat = os.stat(path)
+        entry = {'path': path, 'mtime': stat.st_mtime, 'size': stat.st_size}
+        if engine_id is not None:
+            entry['id'] = engine_id
+            entry['options'] = options
+        fd, temp_path = tempfile.mkstemp(prefix='.chess_stockfish_cache.', dir=os.path.dirname(ENGINE_CACHE_FILE))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f, indent=1)
+            os.replace(temp_path, ENGINE_CACHE_FILE)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    except OSError as e:
+        logger.warning("Could not write engine cache %s: %s", ENGINE_CACHE_FILE, e)
+
+
+# Cache entry for this executable if the file has not changed since it was written, else None
+def current_cache_entry(path):
+    entry = load_engine_cache()
+    if not entry or entry.get('path') != path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if stat.st_mtime == entry.get('mtime') and stat.st_size == entry.get('size'):
+        return entry
+    return None
+
+
+# Option names declared in 'option name <name> type ...' handshake lines
+def option_names(option_lines):
+    names = []
+    for line in option_lines:
+        start = line.find(' name ')
+        end = line.find(' type ', start + 6)
+        if start >= 0 and end > start:
+            names.append(line[start + 6:end])
+    return names
+
+
+# Check a live uci handshake against the cached one for the same binary, and cache it if it is new.
+# The file is only rewritten when the binary or its handshake changed
+def check_engine_handshake(path, engine_id, options):
+    path = os.path.abspath(path)
+    entry = current_cache_entry(path)
+    if entry and 'id' in entry:
+        if entry['id'] == engine_id and entry['options'] == options:
+            return
+        logger.warning("Stockfish at %s answered the uci handshake as %s, cached as %s",
+                       path, engine_id.get('name'), entry['id'].get('name'))
+    save_engine_cache(path, engine_id, options)
+
+
+# Path from the cache if that file is still the same executable
+def cached_stockfish_path():
+    entry = load_engine_cache()
+    if entry and current_cache_entry(entry.get('path')):
+        return entry['path']
+    return None
 
 
-# Search for Stockfish executable in common locations
-def find_stockfish():
-    print("\nSearching for Stockfish")
+# Search for Stockfish executable: environment variable, cache, configured paths, game folder and PATH
+def find_stockfish(use_cache=True):
+    logger.debug("Searching for Stockfish")
+
+    # An explicit path always wins over the cache
+    env_path = os.environ.get(STOCKFISH_ENV_VAR)
+    if env_path:
+        if os.path.isfile(env_path):
+            abs_path = os.path.abspath(env_path)
+            logger.info("Found Stockfish (%s): %s", STOCKFISH_ENV_VAR, abs_path)
+            return abs_path
+        logger.warning("%s=%s is not a file, searching elsewhere", STOCKFISH_ENV_VAR, env_path)
+
+    if use_cache:
+        path = cached_stockfish_path()
+        if path:
+            logger.info("Found Stockfish (cached): %s", path)
+            return path
 
     # Get current directory
     current_dir = os.getcwd()
-    print(f"Current directory: {current_dir}")
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    logger.debug("Current directory: %s", current_dir)
 
-    # List of paths to try finding stockfish.exe (common locations)
-    search_paths = ['stockfish.exe',]
+    # List of paths to try finding stockfish (common locations)
+    search_paths = list(CONFIGURED_PATHS)
+    for folder in (current_dir, script_dir, os.path.join(script_dir, 'stockfish')):
+        search_paths += [os.path.join(folder, name) for name in STOCKFISH_NAMES]
 
-    print("\nTrying paths:")
     for path in search_paths:
-        print(f"  Checking: {path}")
-        if os.path.exists(path):
+        logger.debug("Checking: %s", path)
+        if os.path.isfile(path):
             abs_path = os.path.abspath(path)
-            print(f"  Found: {abs_path}")
+            logger.info("Found Stockfish: %s", abs_path)
+            if not current_cache_entry(abs_path):
+                save_engine_cache(abs_path)
             return abs_path
         else:
-            print(f"  Not found")
+            logger.debug("Not found")
+
+    for name in STOCKFISH_NAMES:
+        path = shutil.which(name)
+        if path:
+            abs_path = os.path.abspath(path)
+            logger.info("Found Stockfish on PATH: %s", abs_path)
+            if not current_cache_entry(abs_path):
+                save_engine_cache(abs_path)
+            return abs_path
 
     return None
 
@@ -34,163 +168,415 @@ def find_stockfish():
 class StockfishAI:
 
     # Initialize Stockfish engine
-    def __init__(self, stockfish_path, skill_level=20):
+    def __init__(self, stockfish_path, skill_level=20, ponder=False):
         """ Input:
         stockfish_path: path to stockfish executable
-        skill_level: 0-20, where 20 is strongest """
+        skill_level: 0-20, where 20 is strongest
+        ponder: think on the expected reply while the opponent is to move """
         self.skill_level = skill_level
-        self.engine = None
+        self.engine = None  # UCIClient once the engine is ready
         self.stockfish_path = stockfish_path
+        self.ponder = ponder
+        self.ponder_key = None  # fen_position_key of the position being pondered, None when not pondering
+        self.session_moves = None  # UCI moves of the game last sent with 'position startpos moves', None if none
+        self.search_lock = threading.Lock()  # one get_best_move at a time (a cancelled one may still be draining)
+        self.stop_lock = threading.Lock()  # guards search_stop against stop_search from other threads
+        self.search_stop = None  # stop_event of the search the engine is running, None when idle
 
-        print(f"\n=== Initializing Stockfish ===")
-        print(f"Path: {stockfish_path}")
-        print(f"Skill Level: {skill_level}")
+        logger.info("Initializing Stockfish: path=%s skill level=%s", stockfish_path, skill_level)
 
+        client = UCIClient(stockfish_path)
         try:
-            # Start stockfish process
-            self.engine = subprocess.Popen(stockfish_path, universal_newlines=True,
-                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=1,
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-            )
-            time.sleep(0.1)  # Wait a moment for engine to start
-            print("* * Stockfish process started * *")
-
-            # Initialize UCI
-            print("StockfishAI: Sending: uci")
-            self._send_command('uci')
-
-            # Read response
-            print("StockfishAI: Waiting for: uciok")
-            if not self._wait_for('uciok', timeout=5):
-                print("StockfishAI Error: Did not receive uciok")
-                self.engine = None
-                return
-            print("StockfishAI: UCI initialized")
-
-            # Set skill level
-            print(f"StockfishAI: Setting skill level to {skill_level}")
-            self._send_command(f'setoption name Skill Level value {skill_level}')
+            # Start stockfish process and initialize UCI
+            logger.debug("Sending: uci")
+            client.start(timeout=5)
+            logger.debug("UCI initialized: %s", client.id.get('name'))
+            options = option_names(client.options)
+            check_engine_handshake(stockfish_path, client.id, options)
+
+            # Set skill level; options the engine does not declare are skipped
+            if 'Skill Level' in options:
+                logger.debug("Setting skill level to %s", skill_level)
+                client.set_option('Skill Level', skill_level)
+            else:
+                logger.warning("Engine has no 'Skill Level' option, playing at full strength")
+            if ponder:
+                if 'Ponder' in options:
+                    client.set_option('Ponder', 'true')
+                else:
+                    logger.warning("Engine has no 'Ponder' option, pondering anyway")
 
             # Wait for ready
-            print("Sending: isready")
-            self._send_command('isready')
-            if not self._wait_for('readyok', timeout=5):
-                print("StockfishAI Error: Did not receive readyok")
-                self.engine = None
-                return
-            print(f"StockfishAI: Stockfish ready! Using skill level={skill_level}\n")
-
-        except FileNotFoundError:
-            print(f"StockfishAI Error: Could not find file: {stockfish_path}")
-            self.engine = None
+            logger.debug("Sending: isready")
+            client.is_ready(timeout=5)
+            self.engine = client
+            logger.info("Stockfish ready, skill level=%s", skill_level)
+
+        except UCIEngineError as e:
+            logger.error("StockfishAI: %s", e)
+            client.close()
+        except TimeoutError:
+            logger.error("StockfishAI: engine did not complete the uci / isready handshake")
+            client.close()
         except Exception as e:
-            print(f"StockfishAI Error: Exception during initialization: {e}")
-            import traceback
-            traceback.print_exc()
-            self.engine = None
+            logger.exception("StockfishAI: exception during initialization: %s", e)
+            client.close()
 
     # Send a command to the engine
     def _send_command(self, command):
-        if self.engine and self.engine.stdin:
+        if self.engine:
             try:
-                self.engine.stdin.write(command + '\n')
-                self.engine.stdin.flush()
+                self.engine.send(command)
                 return True
             except Exception as e:
-                print(f"StockfishAI Error sending command '{command}': {e}")
-                return False
-        return False
-
-    # Wait for expected response from engine with timeout
-    def _wait_for(self, expected, timeout=10):
-        if not self.engine:
-            return False
-
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                line = self.engine.stdout.readline().strip()
-                print(f"  Stockfish: {line}")
-                if expected in line:
-                    return True
-            except Exception as e:
-                print(f"StockfishAI Error reading from engine: {e}")
+                logger.error("StockfishAI: error sending command '%s': %s", command, e)
                 return False
-
-        print(f"StockfishAI TIMEOUT waiting for '{expected}'")
         return False
 
     # Get best move from current position
-    def get_best_move(self, board_fen, move_time=1000):
+    def get_best_move(self, board_fen, move_time=1000, moves=None, stop_event=None):
         """ Input:
                 board_fen: FEN string of current position
                 move_time: time in milliseconds to think
-        Output: move in UCI format (e.g., 'e2e4') """
+                moves: optional UCI moves played from the start position (session mode, keeps the engine's
+                       hash table and repetition history between calls)
+                stop_event: optional threading.Event; once set (see stop_search) the search ends early
+        Output: move in UCI format (e.g., 'e2e4'), None if the search was cancelled before it started """
         if not self.engine:
-            print("StockfishAI Error: Engine not initialized")
+            logger.error("StockfishAI: engine not initialized")
             return None
 
-        print(f"\n=== Getting AI Move ===")
-        print(f"FEN: {board_fen}")
-        print(f"Think time: {move_time}ms")
+        logger.debug("Getting AI move: fen=%s think time=%sms", board_fen, move_time)
 
-        try:
-            # Set up position
-            cmd = f'position fen {board_fen}'
-            print(f"Sending: {cmd}")
-            if not self._send_command(cmd):
+        with self.search_lock:
+            try:
+                # If the engine was pondering on this exact position, let that search continue
+                result = self._finish_pondering(board_fen, move_time, stop_event) if self.ponder_key else None
+
+                if result is None:
+                    # Set up position
+                    cmd = self._session_position(moves) if moves is not None else f'position fen {board_fen}'
+                    logger.debug("Sending: %s", cmd)
+                    if not self._send_command(cmd):
+                        return None
+
+                    # Calculate best move; the deadline is move_time + 5 seconds buffer
+                    cmd = f'go movetime {move_time}'
+                    logger.debug("Sending: %s", cmd)
+                    if not self._begin_search(lambda: self.engine.start_go(cmd), stop_event):
+                        return None
+                    result = self._wait_search(move_time)
+                logger.debug("Best move: %s", result.best_move)
+
+                stopped = stop_event is not None and stop_event.is_set()
+                if self.ponder and result.best_move and result.ponder and not stopped:
+                    self._start_pondering(board_fen, result.best_move, result.ponder, move_time, moves)
+                return result.best_move
+
+            except TimeoutError:
+                logger.error("StockfishAI: no bestmove received")
                 return None
-            # Small delay
-            time.sleep(0.05)
-
-            # Calculate best move
-            cmd = f'go movetime {move_time}'
-            print(f"Sending: {cmd}")
-            if not self._send_command(cmd):
+            except Exception as e:
+                logger.exception("StockfishAI: error in get_best_move: %s", e)
                 return None
 
-            # Wait for bestmove response
-            best_move = None
-            start_time = time.time()
-            timeout = (move_time / 1000) + 5  # move_time + 5 seconds buffer
+    # Start a search (send_command sends 'go ...' or 'ponderhit') unless stop_event is already set;
+    # from then on stop_search(stop_event) can interrupt it
+    def _begin_search(self, send_command, stop_event):
+        with self.stop_lock:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            send_command()
+            self.search_stop = stop_event
+            return True
 
-            print("Waiting for bestmove...")
-            while time.time() - start_time < timeout:
-                try:
-                    line = self.engine.stdout.readline().strip()
-                    print(f"  Stockfish: {line}")
+    # Wait for the bestmove of the search started by _begin_search
+    def _wait_search(self, move_time):
+        try:
+            return self.engine.wait_bestmove((move_time / 1000) + 5)
+        finally:
+            with self.stop_lock:
+                self.search_stop = None
+
+    # Interrupt the running search that was started with stop_event (called from another thread, e.g. on undo).
+    # The engine answers 'stop' with its bestmove at once; the waiting get_best_move reads it and returns,
+    # so the engine is free for the next search within milliseconds. A search that already finished is left alone.
+    def stop_search(self, stop_event):
+        with self.stop_lock:
+            if stop_event is not None and self.search_stop is stop_event:
+                logger.debug("Stopping cancelled search")
+                self._send_command('stop')
+
+    # Search one position under depth / nodes / movetime limits and return the engine's final evaluation
+    def analyse(self, board_fen, depth=None, nodes=None, move_time=None, timeout=60):
+        """ Input:
+                board_fen: FEN string of the position
+                depth, nodes, move_time: search limits (move_time in milliseconds), at least one is needed
+                timeout: seconds to wait for bestmove when the search is limited by depth or nodes
+        Output: dict with bestmove, ponder and the fields of the final info line (see uci_client.parse_info),
+                or None if the engine failed """
+        if not self.engine:
+            logger.error("StockfishAI: engine not initialized")
+            return None
+        limits = [f'{name} {value}' for name, value in (('depth', depth), ('nodes', nodes), ('movetime', move_time))
+                  if value is not None]
+        if not limits:
+            raise ValueError("analyse needs a depth, nodes or move_time limit")
+        if depth is None and nodes is None:
+            timeout = move_time / 1000 + 5
+
+        self.stop_pondering()
+        try:
+            self.engine.send(f'position fen {board_fen}')
+            result = self.engine.go('go ' + ' '.join(limits), timeout=timeout)
+        except TimeoutError:
+            logger.error("StockfishAI: no bestmove received for %s", board_fen)
+            return None
+        except UCIEngineError as e:
+            logger.error("StockfishAI: error analysing %s: %s", board_fen, e)
+            return None
+        self.session_moves = None  # the engine no longer holds the game position
+        analysis = {'bestmove': result.best_move, 'ponder': result.ponder}
+        analysis.update(result.final_info())
+        return analysis
 
-                    if line.startswith('bestmove'):
-                        parts = line.split()
-                        if len(parts) >= 2:
-                            best_move = parts[1]
-                            print(f" Best move: {best_move}")
-                            break
-                except Exception as e:
-                    print(f"StockfishAI Error reading bestmove: {e}")
-                    break
+    # Change skill level / pondering of a running engine (e.g. one started before the level was chosen)
+    def configure(self, skill_level=None, ponder=None):
+        if not self.engine:
+            return False
+        self.stop_pondering()
+        try:
+            if skill_level is not None and skill_level != self.skill_level:
+                self.engine.set_option('Skill Level', skill_level)
+                self.skill_level = skill_level
+            if ponder is not None and ponder != self.ponder:
+                self.engine.set_option('Ponder', 'true' if ponder else 'false')
+                self.ponder = ponder
+            self.engine.is_ready(timeout=5)
+            return True
+        except (UCIEngineError, TimeoutError) as e:
+            logger.error("StockfishAI: error configuring engine: %s", e)
+            return False
 
-            if best_move is None:
-                print("StockfishAI Error: No bestmove received")
+    # 'position startpos moves ...' for the game so far; the engine is reset first unless the game only grew
+    # since the last call (a shorter or different move list means an undo or a new game)
+    def _session_position(self, moves):
+        previous = self.session_moves
+        if previous is None or len(moves) < len(previous) or moves[:len(previous)] != previous:
+            logger.debug("Game diverged from the engine session, sending ucinewgame")
+            self.engine.send('ucinewgame')
+            self.engine.is_ready(timeout=5)
+        self.session_moves = list(moves)
+        return ' '.join(['position startpos moves'] + self.session_moves) if moves else 'position startpos'
+
+    # Think on the position after our move and the expected reply, while the opponent is to move
+    def _start_pondering(self, board_fen, best_move, ponder_move, move_time, moves=None):
+        board = ChessBoard(board_fen, cache_size=0)
+        for uci in (best_move, ponder_move):
+            move = find_uci_move(board, uci)
+            if move is None:
+                return
+            board.make_move(move, uci[4].upper() if len(uci) == 5 else 'Q')
+        if moves is not None:
+            self.engine.send(' '.join(['position startpos moves'] + list(moves) + [best_move, ponder_move]))
+        else:
+            self.engine.send(f'position fen {board_fen} moves {best_move} {ponder_move}')
+        self.engine.start_go(f'go ponder movetime {move_time}')
+        self.ponder_key = fen_position_key(board.get_fen())
+        logger.debug("Pondering on %s", ponder_move)
+
+    # On ponderhit the running search continues as the real one; on a miss (or when the new search is already
+    # cancelled) it is stopped and None is returned
+    def _finish_pondering(self, board_fen, move_time, stop_event=None):
+        hit = fen_position_key(board_fen) == self.ponder_key
+        self.ponder_key = None
+        if hit:
+            logger.debug("Ponderhit")
+            if self._begin_search(lambda: self.engine.send('ponderhit'), stop_event):
+                return self._wait_search(move_time)
+        logger.debug("Ponder miss, stopping")
+        self.engine.wait_bestmove(1, command='stop')
+        return None
+
+    # Stop a ponder search that will not be used (undo, new game, close)
+    def stop_pondering(self):
+        if self.ponder_key is None or not self.engine:
+            return
+        self.ponder_key = None
+        try:
+            self.engine.wait_bestmove(1, command='stop')
+        except (UCIEngineError, TimeoutError) as e:
+            logger.error("StockfishAI: error stopping ponder search: %s", e)
 
-            return best_move
+    # Reset the engine for an unrelated game: clear hash and history, then wait until it is ready
+    def new_game(self):
+        if not self.engine:
+            return False
+        self.stop_pondering()
+        self.session_moves = None
+        try:
+            self.engine.send('ucinewgame')
+            self.engine.is_ready(timeout=5)
+            self.session_moves = []
+            return True
+        except (UCIEngineError, TimeoutError) as e:
+            logger.error("StockfishAI: error resetting engine: %s", e)
+            return False
 
-        except Exception as e:
-            print(f"StockfishAI Error in get_best_move: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+    # True while the engine process is running and initialized
+    def is_alive(self):
+        return self.engine is not None and self.engine.is_alive()
 
     # Close the engine
     def close(self):
         if self.engine:
-            print("\nClosing Stockfish...")
-            try:
-                self._send_command('quit')
-                self.engine.terminate()
-                self.engine.wait(timeout=2)
-            except:
-                self.engine.kill()
+            logger.info("Closing Stockfish")
+            self.stop_pondering()
+            self.engine.close()
             self.engine = None
-            print("Stockfish closed")
 
+
+# Pool of pre-initialised Stockfish engines shared by concurrent games and analysis jobs
+class EnginePool:
+
+    def __init__(self, stockfish_path, size=None, skill_level=20):
+        """ Input:
+        stockfish_path: path to stockfish executable
+        size: number of engines, defaults to the number of CPU cores
+        skill_level: 0-20, where 20 is strongest """
+        self.stockfish_path = stockfish_path
+        self.skill_level = skill_level
+        self.size = size or os.cpu_count() or 1
+        self.idle = queue.Queue()
+        self.engines = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+        # Start all engines in parallel: each one does its own uci / isready handshake
+        started = [None] * self.size
+
+        def start(index):
+            started[index] = StockfishAI(stockfish_path, skill_level=skill_level)
+
+        threads = [threading.Thread(target=start, args=(i,), daemon=True) for i in range(self.size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for ai in started:
+            if ai is not None and ai.engine is not None:
+                self.engines.append(ai)
+                self.idle.put(ai)
+        logger.info("EnginePool: %d/%d engines ready", len(self.engines), self.size)
+
+    # Take an idle engine, waiting up to timeout seconds (None waits forever).
+    # Waits in short slices so a caller notices when the last engine died and could not be replaced
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.closed:
+                raise RuntimeError("EnginePool is closed")
+            if not self.engines:
+                raise RuntimeError("EnginePool has no running engines")
+            wait = ACQUIRE_POLL_SECONDS
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return None
+            try:
+                return self.idle.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+    # Return an engine to the pool; it is reset with ucinewgame, or replaced if it died
+    def release(self, ai):
+        if self.closed:
+            ai.close()
+            return
+        if not ai.is_alive() or not ai.new_game():
+            logger.warning("EnginePool: replacing a dead engine")
+            ai.close()
+            replacement = StockfishAI(self.stockfish_path, skill_level=self.skill_level)
+            with self.lock:
+                self.engines.remove(ai)
+                if replacement.engine is None:
+                    return
+                self.engines.append(replacement)
+            ai = replacement
+        self.idle.put(ai)
+
+    # Lease an engine for the duration of a with-block
+    @contextmanager
+    def lease(self, timeout=None):
+        ai = self.acquire(timeout)
+        if ai is None:
+            raise TimeoutError("No idle engine in the pool")
+        try:
+            yield ai
+        finally:
+            self.release(ai)
+
+    # Convenience: search one position on any idle engine
+    def get_best_move(self, board_fen, move_time=1000):
+        with self.lease() as ai:
+            return ai.get_best_move(board_fen, move_time)
+
+    # Close every engine in the pool
+    def close(self):
+        self.closed = True
+        with self.lock:
+            engines, self.engines = self.engines, []
+        for ai in engines:
+            ai.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# Finds and starts Stockfish on a background thread (e.g. while the menu is shown) so it is ready when the game starts
+class EnginePrewarm:
+
+    def __init__(self, skill_level=20):
+        self.skill_level = skill_level
+        self.thread = None
+        self.ai = None
+
+    # Begin discovery and the uci / isready handshake; later calls do nothing
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='engine-prewarm', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        path = find_stockfish()
+        if path:
+            self.ai = StockfishAI(path, skill_level=self.skill_level)
+
+    # Wait for the engine (starting it now if start was never called); None if it is unavailable
+    def result(self, timeout=15):
+        self.start()
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            logger.warning("EnginePrewarm: engine still starting after timeout")
+            self.discard()
+            return None
+        if self.ai is None or self.ai.engine is None:
+            return None
+        return self.ai
+
+    # Close the engine in the background once it has started; used when it is not needed after all
+    def discard(self):
+        if self.thread is None:
+            return
+        thread = self.thread
+
+        def close_when_started():
+            thread.join()
+            if self.ai:
+                self.ai.close()
+
+        threading.Thread(target=close_when_started, daemon=True).start()
@@ -0,0 +1,34 @@
+# # test_analyze.py
+# Engine info parsing and resuming batch analysis output. Run with: python -m pytest
+import json
+from analyze import completed_indices
+from uci_client import parse_info
+
+
+# A centipawn score with a bound, and a mate score (negative: the side to move is mated)
+def test_parse_info_scores():
+    info = parse_info('info depth 20 seldepth 28 multipv 1 score cp 35 lowerbound nodes 123456 nps 987654 '
+                      'time 125 pv e2e4 e7e5 g1f3')
+    assert info['score'] == {'cp': 35}
+    assert info['bound'] == 'lowerbound'
+    assert info['depth'] == 20 and info['nodes'] == 123456 and info['time'] == 125
+    assert info['pv'] == ['e2e4', 'e7e5', 'g1f3']
+
+    info = parse_info('info depth 12 score mate -3 nodes 5000 pv h7h8q')
+    assert info['score'] == {'mate': -3}
+    assert 'bound' not in info
+    assert info['pv'] == ['h7h8q']
+
+
+# A cut-off last line is removed from the file; records with an error are not counted as done
+def test_completed_indices_partial_last_line(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    records = [{'index': 0, 'fen': 'a', 'bestmove': 'e2e4'},
+               {'index': 1, 'fen': 'b', 'error': 'engine failed'},
+               {'index': 3, 'fen': 'c', 'bestmove': 'd2d4'}]
+    complete = ''.join(json.dumps(record) + '\n' for record in records)
+    path.write_text(complete + '{"index": 4, "fen": "d", "best')
+
+    assert completed_indices(str(path)) == {0, 3}
+    assert path.read_text() == complete
+    assert completed_indices(str(tmp_path / 'missing.jsonl')) == set()
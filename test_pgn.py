@@ -0,0 +1,47 @@
+# # test_pgn.py
+# SAN parsing and PGN reading. Run with: python -m pytest
+from chess_board import ChessBoard
+from pgn import parse_movetext, read_games, replay_game, san_to_move
+
+
+# File and rank disambiguation pick the one matching piece; an ambiguous SAN is rejected
+def test_san_disambiguation():
+    board = ChessBoard('4k3/8/8/R7/8/8/8/RN2KN2 w - - 0 1')  # knights b1/f1 both reach d2, rooks a1/a5 reach a3
+    move, _ = san_to_move(board, 'Nbd2')
+    assert (move.start_row, move.start_col) == (7, 1)
+    move, _ = san_to_move(board, 'Nfd2')
+    assert (move.start_row, move.start_col) == (7, 5)
+    move, _ = san_to_move(board, 'R5a3')
+    assert (move.start_row, move.start_col) == (3, 0)
+    move, _ = san_to_move(board, 'R1a3+')
+    assert (move.start_row, move.start_col) == (7, 0)
+    assert san_to_move(board, 'Nd2') == (None, None)
+    assert san_to_move(board, 'Ra3') == (None, None)
+
+
+# Promotions with and without '=' and with a capture return the promotion piece
+def test_san_promotion():
+    board = ChessBoard('3r3k/4P3/8/8/8/8/8/4K3 w - - 0 1')
+    move, piece = san_to_move(board, 'e8=N')
+    assert move.is_pawn_promotion and (move.end_row, move.end_col) == (0, 4) and piece == 'N'
+    move, piece = san_to_move(board, 'exd8Q+')
+    assert move.is_pawn_promotion and move.piece_captured == 'bR' and piece == 'Q'
+    board.make_move(move, piece)
+    assert board.board[0][3] == 'wQ'
+
+
+# Two games: tags are unescaped, comments, variations, NAGs and move numbers are skipped
+def test_read_games():
+    lines = ['[Event "Test \\"one\\""]\n', '[White "A"]\n', '\n',
+             '1. e4 {best by test} e5 (1... c5 2. Nf3) 2. Nf3 $1 Nc6 1-0\n', '\n',
+             '% escape line\n',
+             '[Event "two"]\n', '[SetUp "1"]\n', '[FEN "4k3/4P3/8/8/8/8/8/4K3 w - - 0 1"]\n', '\n',
+             '1. Kf2 Kd7 2. e8=Q+ 1/2-1/2\n']
+    games = list(read_games(lines))
+    assert len(games) == 2
+    headers, movetext = games[0]
+    assert headers == {'Event': 'Test "one"', 'White': 'A'}
+    assert parse_movetext(movetext) == (['e4', 'e5', 'Nf3', 'Nc6'], '1-0')
+    record = replay_game(*games[1])
+    assert record['ok'] and record['plies'] == 3 and record['result'] == '1/2-1/2'
+    assert record['fen'].startswith('4Q3/3k4/')
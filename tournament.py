@@ -0,0 +1,186 @@
+# # tournament.py
+# Self-play tournament between engine configurations, played in parallel on a process pool (one game per worker
+# at a time). Finished games are appended to a PGN file as they complete; a score and Elo table is printed at the end.
+# Usage: python tournament.py stockfish:1 stockfish:5 stockfish:10@200 builtin:3 --games-per-pair 20
+#   engine spec: <builtin|stockfish>:<skill level>[@<movetime ms>]
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations
+from chess_board import START_FEN
+from headless import MAX_PLIES, PLAYER_KINDS, make_player, play_game
+from pgn import format_pgn, uci_moves_to_san
+
+# Short openings (UCI moves) that give self-play games different starts; each is played with both colors
+OPENINGS = [
+    ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1b5'],  # Ruy Lopez
+    ['e2e4', 'c7c5', 'g1f3', 'd7d6'],  # Sicilian
+    ['e2e4', 'e7e6', 'd2d4', 'd7d5'],  # French
+    ['e2e4', 'c7c6', 'd2d4', 'd7d5'],  # Caro-Kann
+    ['d2d4', 'd7d5', 'c2c4', 'e7e6'],  # Queen's Gambit Declined
+    ['d2d4', 'g8f6', 'c2c4', 'g7g6'],  # King's Indian
+    ['c2c4', 'e7e5', 'b1c3'],  # English
+    ['g1f3', 'd7d5', 'g2g3'],  # Reti
+]
+DEFAULT_MOVETIME = 100  # milliseconds per move when a spec has no @movetime
+
+WORKER_PLAYERS = {}  # per worker process: engine spec -> player, reused by every game of that process
+
+
+# Parse '<kind>:<level>[@<movetime>]' into (kind, level, movetime or None)
+def parse_engine_spec(spec):
+    kind, _, rest = spec.partition(':')
+    level, _, movetime = rest.partition('@')
+    if kind not in PLAYER_KINDS or not level.isdigit() or (movetime and not movetime.isdigit()):
+        raise ValueError(f"Bad engine spec '{spec}', expected <builtin|stockfish>:<level>[@<movetime ms>]")
+    return kind, int(level), int(movetime) if movetime else None
+
+
+# Openings from a file: one per line, either a FEN or UCI moves from the start position ('#' starts a comment)
+def load_openings(path):
+    openings = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            openings.append((line, []) if '/' in line else (START_FEN, line.split()))
+    return openings
+
+
+# Worker process: play one game and return its record (players stay open for the next game of this process;
+# Stockfish exits by itself when the worker process ends and its pipes close)
+def run_game(task):
+    number, white, black, fen, opening, default_movetime, max_plies, stockfish_path = task
+    record = {'number': number, 'white': white, 'black': black}
+    try:
+        players, move_times = {}, {}
+        for side, spec in (('w', white), ('b', black)):
+            kind, level, movetime = parse_engine_spec(spec)
+            if spec not in WORKER_PLAYERS:
+                WORKER_PLAYERS[spec] = make_player(kind, level, stockfish_path)
+            players[side] = WORKER_PLAYERS[spec]
+            move_times[side] = movetime or default_movetime
+
+        start_time = time.perf_counter()
+        result, reason, game = play_game(players, move_times, fen, opening, max_plies)
+        moves = game.uci_moves()
+        headers = {'Event': 'Self-play tournament', 'Site': 'local', 'Round': number,
+                   'White': white, 'Black': black, 'Termination': reason}
+        record.update(result=result, reason=reason, plies=len(moves), seconds=time.perf_counter() - start_time,
+                      pgn=format_pgn(headers, uci_moves_to_san(moves, fen), result, fen))
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    return record
+
+
+# Elo difference that corresponds to a score fraction (0..1), clamped to avoid infinities
+def elo_difference(score):
+    score = min(max(score, 0.001), 0.999)
+    return 400 * math.log10(score / (1 - score))
+
+
+# Elo performance and 95% error margin from wins / draws / losses
+def elo_estimate(wins, draws, losses):
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, 0.0
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    error = 1.96 * math.sqrt(variance / games)
+    margin = (elo_difference(score + error) - elo_difference(score - error)) / 2
+    return elo_difference(score), margin
+
+
+# Print the score table: every engine against the rest of the field, and each pairing
+def print_summary(engines, pair_stats):
+    print(f"\n{'Engine':<24} {'Games':>5} {'W':>4} {'D':>4} {'L':>4} {'Score':>7} {'Elo':>12}")
+    for engine in engines:
+        wins = draws = losses = 0
+        for (a, b), (a_wins, pair_draws, b_wins) in pair_stats.items():
+            if engine == a:
+                wins, draws, losses = wins + a_wins, draws + pair_draws, losses + b_wins
+            elif engine == b:
+                wins, draws, losses = wins + b_wins, draws + pair_draws, losses + a_wins
+        games = wins + draws + losses
+        score = (wins + 0.5 * draws) / games if games else 0.0
+        elo, margin = elo_estimate(wins, draws, losses)
+        print(f"{engine:<24} {games:>5} {wins:>4} {draws:>4} {losses:>4} {score:>7.1%} {elo:>+6.0f} ±{margin:.0f}")
+
+    print(f"\n{'Pairing':<50} {'W-D-L':>10} {'Elo diff':>12}")
+    for (a, b), (a_wins, draws, b_wins) in pair_stats.items():
+        elo, margin = elo_estimate(a_wins, draws, b_wins)
+        print(f"{a + ' vs ' + b:<50} {f'{a_wins}-{draws}-{b_wins}':>10} {elo:>+6.0f} ±{margin:.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parallel self-play tournament between engine configurations')
+    parser.add_argument('engines', nargs='+', help='engine specs, e.g. stockfish:5 stockfish:10@200 builtin:3')
+    parser.add_argument('--games-per-pair', type=int, default=16, help='games played by every pair of engines')
+    parser.add_argument('--movetime', type=int, default=DEFAULT_MOVETIME, help='default milliseconds per move')
+    parser.add_argument('--openings', help='file with one opening per line (FEN or UCI moves)')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES, help='adjudicate as a draw after this many plies')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='parallel games (default: CPU count)')
+    parser.add_argument('--pgn', default='tournament.pgn', help='PGN output file (appended to)')
+    parser.add_argument('--stockfish', help='path to the Stockfish executable')
+    args = parser.parse_args(argv)
+
+    try:
+        for spec in args.engines:
+            parse_engine_spec(spec)
+    except ValueError as e:
+        parser.error(str(e))
+    if len(set(args.engines)) < 2:
+        parser.error('at least two different engine specs are needed')
+    engines = list(dict.fromkeys(args.engines))
+    openings = load_openings(args.openings) if args.openings else [(START_FEN, moves) for moves in OPENINGS]
+
+    # Every pair plays each opening twice in a row, with colors swapped
+    tasks = []
+    for a, b in combinations(engines, 2):
+        for game in range(args.games_per_pair):
+            fen, opening = openings[(game // 2) % len(openings)]
+            white, black = (a, b) if game % 2 == 0 else (b, a)
+            tasks.append((len(tasks) + 1, white, black, fen, opening, args.movetime, args.max_plies, args.stockfish))
+
+    pair_stats = {pair: [0, 0, 0] for pair in combinations(engines, 2)}  # first wins, draws, second wins
+    print(f"{len(tasks)} games between {len(engines)} engines on {args.workers} workers, PGN to {args.pgn}")
+    start_time = time.perf_counter()
+    completed = failed = 0
+    with open(args.pgn, 'a') as pgn_file, ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for future in as_completed(pool.submit(run_game, task) for task in tasks):
+            record = future.result()
+            completed += 1
+            if 'error' in record:
+                failed += 1
+                print(f"[{completed}/{len(tasks)}] game {record['number']} {record['white']} vs {record['black']}: "
+                      f"failed: {record['error']}")
+                continue
+            pgn_file.write(record['pgn'])
+            pgn_file.flush()
+
+            if (record['white'], record['black']) in pair_stats:
+                stats, first_is_white = pair_stats[(record['white'], record['black'])], True
+            else:
+                stats, first_is_white = pair_stats[(record['black'], record['white'])], False
+            if record['result'] == '1/2-1/2':
+                stats[1] += 1
+            elif (record['result'] == '1-0') == first_is_white:
+                stats[0] += 1
+            else:
+                stats[2] += 1
+            print(f"[{completed}/{len(tasks)}] {record['white']} vs {record['black']}: {record['result']} "
+                  f"({record['reason']}, {record['plies']} plies, {record['seconds']:.1f}s)")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"\n{completed - failed} games in {elapsed:.1f}s ({(completed - failed) / elapsed * 3600:.0f} games/hour)"
+          + (f", {failed} failed" if failed else ''))
+    print_summary(engines, pair_stats)
+    return 0 if not failed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+# # uci_client.py
+# Asyncio client for UCI engines (Stockfish). Background tasks drain the engine's stdout and stderr,
+# and every command that waits for a reply has its own deadline, so a silent engine can never block a caller.
+# UCIClient runs the asyncio engine on a private event-loop thread for synchronous callers (StockfishAI).
+import asyncio
+import concurrent.futures
+import logging
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+STDERR_LINES_KEPT = 50
+TRAFFIC_LINES_KEPT = 200  # recent commands and engine lines kept in memory for error reports
+INFO_INT_FIELDS = ('depth', 'seldepth', 'multipv', 'nodes', 'nps', 'time', 'hashfull', 'tbhits', 'currmovenumber')
+
+logger = logging.getLogger(__name__)
+
+
+# Raised when the engine process exits or cannot be started
+class UCIEngineError(Exception):
+    pass
+
+
+# Fields of an 'info ...' line as a dict, e.g. {'depth': 20, 'score': {'cp': 31}, 'nodes': 123456, 'pv': [...]}
+# (score is {'cp': n} or {'mate': n}; a 'lowerbound' / 'upperbound' score adds 'bound')
+def parse_info(line):
+    tokens = line.split()[1:]
+    info = {}
+    i = 0
+    try:
+        while i < len(tokens):
+            token = tokens[i]
+            if token in INFO_INT_FIELDS:
+                info[token] = int(tokens[i + 1])
+                i += 2
+            elif token == 'score':
+                info['score'] = {tokens[i + 1]: int(tokens[i + 2])}
+                i += 3
+                if i < len(tokens) and tokens[i] in ('lowerbound', 'upperbound'):
+                    info['bound'] = tokens[i]
+                    i += 1
+            elif token == 'wdl':
+                info['wdl'] = [int(value) for value in tokens[i + 1:i + 4]]
+                i += 4
+            elif token == 'currmove':
+                info['currmove'] = tokens[i + 1]
+                i += 2
+            elif token == 'pv':
+                info['pv'] = tokens[i + 1:]
+                break
+            elif token == 'string':
+                info['string'] = ' '.join(tokens[i + 1:])
+                break
+            elif token in ('refutation', 'currline'):
+                break
+            else:
+                i += 1
+    except (IndexError, ValueError):
+        logger.warning("Could not parse engine line: %s", line)
+    return info
+
+
+# Result of a 'go' command
+class SearchResult:
+    __slots__ = ['best_move', 'ponder', 'info_lines']
+
+    def __init__(self, best_move, ponder, info_lines):
+        self.best_move = best_move  # UCI move, or None for '(none)'
+        self.ponder = ponder  # expected reply, if the engine sent one
+        self.info_lines = info_lines  # every 'info ...' line of this search
+
+    # The engine's final evaluation: the last scored info line of the main line (multipv 1), parsed; {} if none
+    def final_info(self):
+        for line in reversed(self.info_lines):
+            info = parse_info(line)
+            if 'score' in info and info.get('multipv', 1) == 1:
+                return info
+        return {}
+
+
+class AsyncUCIEngine:
+
+    def __init__(self, path):
+        self.path = path
+        self.process = None
+        self.lines = None  # asyncio.Queue of stdout lines, None marks end of output
+        self.stderr_lines = deque(maxlen=STDERR_LINES_KEPT)
+        self.traffic = deque(maxlen=TRAFFIC_LINES_KEPT)  # (time, '>' sent / '<' received, line)
+        self.reader_tasks = []
+        self.id = {}  # 'name' / 'author' from the uci handshake
+        self.options = []  # raw 'option name ...' lines from the uci handshake
+
+    # Start the process and perform the uci / uciok handshake
+    async def start(self, timeout=5):
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                self.path, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0)
+        except OSError as e:
+            raise UCIEngineError(f"Could not start engine {self.path}: {e}") from e
+        self.lines = asyncio.Queue()
+        self.reader_tasks = [asyncio.create_task(self._read_stdout()), asyncio.create_task(self._read_stderr())]
+
+        await self.send('uci')
+        for line in await self.read_until(lambda l: l == 'uciok', timeout):
+            if line.startswith('id '):
+                parts = line.split(None, 2)
+                if len(parts) == 3:
+                    self.id[parts[1]] = parts[2]
+            elif line.startswith('option '):
+                self.options.append(line)
+
+    async def _read_stdout(self):
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                self.lines.put_nowait(None)
+                return
+            line = line.decode(errors='replace').strip()
+            self.traffic.append((time.time(), '<', line))
+            logger.debug("<< %s", line)
+            self.lines.put_nowait(line)
+
+    async def _read_stderr(self):
+        while True:
+            line = await self.process.stderr.readline()
+            if not line:
+                return
+            self.stderr_lines.append(line.decode(errors='replace').rstrip())
+
+    async def send(self, command):
+        if self.process is None or self.process.returncode is not None:
+            raise UCIEngineError("Engine is not running")
+        self.traffic.append((time.time(), '>', command))
+        logger.debug(">> %s", command)
+        self.process.stdin.write((command + '\n').encode())
+        try:
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise UCIEngineError(f"Engine pipe closed while sending '{command}'") from e
+
+    # Collect lines until predicate(line) is true; raises TimeoutError after timeout seconds
+    # (logging the recent traffic unless report_timeout is False because the caller recovers from it)
+    async def read_until(self, predicate, timeout, report_timeout=True):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        lines = []
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise self._timed_out(timeout, report_timeout)
+            try:
+                line = await asyncio.wait_for(self.lines.get(), remaining)
+            except asyncio.TimeoutError:  # not the builtin TimeoutError before Python 3.11
+                raise self._timed_out(timeout, report_timeout) from None
+            if line is None:
+                self.dump_traffic("engine exited")
+                raise UCIEngineError("Engine exited")
+            lines.append(line)
+            if predicate(line):
+                return lines
+
+    def _timed_out(self, timeout, report):
+        if report:
+            self.dump_traffic(f"no answer within {timeout}s")
+        return TimeoutError(f"Engine did not answer within {timeout}s")
+
+    # Drop any output still queued from earlier commands
+    def discard_pending(self):
+        while not self.lines.empty():
+            if self.lines.get_nowait() is None:
+                self.lines.put_nowait(None)
+                return
+
+    async def set_option(self, name, value):
+        await self.send(f'setoption name {name} value {value}')
+
+    async def is_ready(self, timeout=5):
+        await self.send('isready')
+        await self.read_until(lambda l: l == 'readyok', timeout)
+
+    # Send a go command and wait for bestmove; on timeout the engine is told to stop and given grace seconds
+    async def go(self, go_command, timeout, grace=1.0):
+        await self.start_go(go_command)
+        return await self.wait_bestmove(timeout, grace=grace)
+
+    # Start a search without waiting for its result (e.g. 'go ponder ...')
+    async def start_go(self, go_command):
+        self.discard_pending()
+        await self.send(go_command)
+
+    # Wait for the bestmove of the running search, first sending command ('ponderhit' or 'stop') if given
+    async def wait_bestmove(self, timeout, command=None, grace=1.0):
+        if command:
+            await self.send(command)
+        try:
+            lines = await self.read_until(lambda l: l.startswith('bestmove'), timeout, report_timeout=False)
+        except TimeoutError:
+            logger.warning("UCI engine %s: search overran %ss, sending stop", self.path, timeout)
+            await self.send('stop')
+            lines = await self.read_until(lambda l: l.startswith('bestmove'), grace)
+        parts = lines[-1].split()
+        best_move = parts[1] if len(parts) >= 2 and parts[1] != '(none)' else None
+        ponder = parts[3] if len(parts) >= 4 and parts[2] == 'ponder' else None
+        return SearchResult(best_move, ponder, [line for line in lines if line.startswith('info')])
+
+    # Ask the engine to quit, killing it if it does not exit within timeout seconds
+    async def quit(self, timeout=2):
+        if self.process is None:
+            return
+        if self.process.returncode is None:
+            try:
+                await self.send('quit')
+                await asyncio.wait_for(self.process.wait(), timeout)
+            except (UCIEngineError, asyncio.TimeoutError):
+                self.process.kill()
+                await self.process.wait()
+        for task in self.reader_tasks:
+            task.cancel()
+        self.process = None
+
+    def is_alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    # Recent UCI traffic and stderr as text
+    def format_traffic(self):
+        rows = [f"{time.strftime('%H:%M:%S', time.localtime(t))}.{int(t % 1 * 1000):03d} {direction} {line}"
+                for t, direction, line in list(self.traffic)]
+        rows += [f"stderr: {line}" for line in list(self.stderr_lines)]
+        return '\n'.join(rows)
+
+    # Log the recent UCI traffic at error level, e.g. when the engine stops answering
+    def dump_traffic(self, reason):
+        logger.error("UCI engine %s: %s. Recent traffic:\n%s", self.path, reason, self.format_traffic())
+
+
+# Synchronous facade: runs an AsyncUCIEngine on its own event-loop thread
+class UCIClient:
+
+    def __init__(self, path):
+        self.path = path
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='uci-client', daemon=True)
+        self.thread.start()
+        self.engine = AsyncUCIEngine(path)
+
+    # Run a coroutine on the client loop; the extra second covers scheduling on top of the command's own deadline.
+    # Timeouts always surface as the builtin TimeoutError, whatever the Python version
+    def _call(self, coro, timeout):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout + 1)
+        except concurrent.futures.TimeoutError:
+            if future.done():  # the command's own TimeoutError (the same class from Python 3.11)
+                raise
+            future.cancel()
+            raise TimeoutError(f"Engine thread did not answer within {timeout + 1}s") from None
+
+    @property
+    def id(self):
+        return self.engine.id
+
+    @property
+    def options(self):
+        return self.engine.options
+
+    def start(self, timeout=5):
+        self._call(self.engine.start(timeout), timeout)
+
+    def send(self, command, timeout=2):
+        self._call(self.engine.send(command), timeout)
+
+    def set_option(self, name, value, timeout=2):
+        self._call(self.engine.set_option(name, value), timeout)
+
+    def is_ready(self, timeout=5):
+        self._call(self.engine.is_ready(timeout), timeout)
+
+    def go(self, go_command, timeout, grace=1.0):
+        return self._call(self.engine.go(go_command, timeout, grace), timeout + grace)
+
+    def start_go(self, go_command, timeout=2):
+        self._call(self.engine.start_go(go_command), timeout)
+
+    def wait_bestmove(self, timeout, command=None, grace=1.0):
+        return self._call(self.engine.wait_bestmove(timeout, command, grace), timeout + grace)
+
+    def is_alive(self):
+        return self.engine.is_alive()
+
+    def format_traffic(self):
+        return self.engine.format_traffic()
+
+    # Quit the engine and stop the event-loop thread
+    def close(self, timeout=2):
+        try:
+            self._call(self.engine.quit(timeout), timeout)
+        except Exception as e:
+            logger.error("UCIClient: error while closing engine: %s", e)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        if not self.thread.is_alive():
+            self.loop.close()
@@ -0,0 +1,55 @@
+# # ui_cache.py
+# Shared pygame resources for all UI modules: fonts, prerendered text, alpha highlight surfaces and the board
+# background are created once and reused, so the render loops do not allocate on every frame.
+# Everything here needs pygame to be initialised (pygame.init()) before the first call.
+import pygame
+
+FONTS = {}  # (family, size, bold, italic) -> pygame.font.Font
+TEXTS = {}  # (text, family, size, bold, italic, color) -> rendered surface
+HIGHLIGHTS = {}  # (width, height, color, alpha) -> filled semi-transparent surface
+BOARDS = {}  # (square size, dimension, light color, dark color) -> board background surface
+TEXT_CACHE_SIZE = 512  # rendered texts kept; the cache is emptied when it grows past this
+
+
+# Font for a family/size/style, loaded once
+def get_font(family, size, bold=False, italic=False):
+    key = (family, size, bold, italic)
+    font = FONTS.get(key)
+    if font is None:
+        font = FONTS[key] = pygame.font.SysFont(family, size, bold, italic)
+    return font
+
+
+# Rendered (antialiased) text; color is a color name or an RGB tuple
+def get_text(text, color, family='Arial', size=24, bold=False, italic=False):
+    key = (text, family, size, bold, italic, color)
+    surface = TEXTS.get(key)
+    if surface is None:
+        if len(TEXTS) >= TEXT_CACHE_SIZE:
+            TEXTS.clear()
+        surface = TEXTS[key] = get_font(family, size, bold, italic).render(text, True, pygame.Color(color))
+    return surface
+
+
+# Surface filled with a semi-transparent color, e.g. a square highlight
+def get_highlight(width, height, color, alpha):
+    key = (width, height, color, alpha)
+    surface = HIGHLIGHTS.get(key)
+    if surface is None:
+        surface = HIGHLIGHTS[key] = pygame.Surface((width, height))
+        surface.set_alpha(alpha)
+        surface.fill(color)
+    return surface
+
+
+# Empty checkered board, drawn once per size and colors
+def get_board_background(sq_size, dimension, light, dark):
+    key = (sq_size, dimension, light, dark)
+    surface = BOARDS.get(key)
+    if surface is None:
+        surface = BOARDS[key] = pygame.Surface((sq_size * dimension, sq_size * dimension))
+        colors = [light, dark]
+        for r in range(dimension):
+            for c in range(dimension):
+                pygame.draw.rect(surface, colors[(r + c) % 2], pygame.Rect(c * sq_size, r * sq_size, sq_size, sq_size))
+    return surface